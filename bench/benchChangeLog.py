@@ -0,0 +1,79 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""作業時間を記録する同期の時間を、プロファイルへの書き込みと比較する
+put_many : 数件のタスクトリに作業時間を追加して put_many する時間
+sync     : get_tree から、読み込み時との差分を求めて変更のあったタスクトリ
+           だけを put_many するまでの時間（winMain の同期と同じ手順）
+python bench/benchChangeLog.py [ディレクトリ数]
+"""
+
+import sys, os, time, shutil, tempfile
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.FileStorage import FileStorage
+from lib.core.LoggedStorage import LoggedStorage
+from lib.core.Diff import Diff
+from bench.synthetic import build
+
+PROFILE = '.tasktory'
+MEMO = 'memo.txt'
+
+def measure(storage, rounds, touched):
+    tree = build(nodes=int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+            times=20)
+    storage.put_many(n for n, _ in tree.paths())
+    tree = storage.get_tree()
+    nodes = [n for n, _ in tree.paths()][1:touched+1]
+
+    sec = 0
+    for i in range(rounds):
+        loaded = dict((p, n.copy()) for n, p in tree.paths())
+        for node in nodes: node.add_time(2000000000 + i * 60, 60)
+        start = time.perf_counter()
+        storage.put_many((n for n, _ in tree.paths()), loaded)
+        sec += time.perf_counter() - start
+    return sec / rounds
+
+def measure_sync(storage, rounds, touched):
+    tree = storage.get_tree()
+    paths = [p for _, p in tree.paths()][1:touched+1]
+
+    sec = 0
+    for i in range(rounds):
+        start = time.perf_counter()
+        tree = storage.get_tree()
+        old_tree = tree.deepcopy()
+        for path in paths:
+            tree.find(Diff.names(tree, path)).add_time(2100000000 + i * 60, 60)
+        changed = Diff.paths(Diff.diff(old_tree, tree))
+        loaded = dict((p, old_tree.find(Diff.names(old_tree, p)))
+                for p in changed)
+        storage.put_many((tree.find(Diff.names(tree, p))
+                for p in sorted(changed)), loaded)
+        sec += time.perf_counter() - start
+    return sec / rounds
+
+def main():
+    rounds, touched = 20, 3
+    print('{:<12}{:>12}{:>12}'.format('storage', 'put_many', 'sync'))
+    for name in ('profile', 'changelog'):
+        root = tempfile.mkdtemp()
+        try:
+            storage = FileStorage(root, PROFILE, MEMO, binary=True)
+            if name == 'changelog':
+                storage = LoggedStorage(storage,
+                        os.path.join(root, '.changelog'), compact_size=1<<30)
+            sec = measure(storage, rounds, touched)
+            sync = measure_sync(storage, rounds, touched)
+            storage.close()
+        finally:
+            shutil.rmtree(root)
+        print('{:<12}{:>10.2f}ms{:>10.2f}ms'.format(
+            name, sec * 1000, sync * 1000))
+    return
+
+if __name__ == '__main__':
+    main()
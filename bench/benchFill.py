@@ -0,0 +1,50 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""未設定項目の補完の時間を、ノード毎に部分木を走査する従来のループと
+後順の１回の走査（Tasktory.fill_defaults）で比較する
+（葉以外のノードの期日を未設定にする）
+python bench/benchFill.py [ノード数] [幅]
+"""
+
+import sys, os, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from bench.synthetic import build
+
+def legacy_fill(tree):
+    """従来のupdate_filesystemの補完"""
+    for node in tree:
+        if node.deadline is None:
+            node.deadline = max([n.deadline for n in node
+                if n.deadline is not None])
+        if node.status is None:
+            node.status = Tasktory.OPEN
+        if node.comments is None:
+            node.comments = ''
+    return tree
+
+def tree_without_deadlines(nodes, fanout):
+    tree = build(nodes=nodes, fanout=fanout)
+    for node in tree:
+        if node.children: node.deadline = None
+    return tree
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    for name, func in (
+            ('legacy', legacy_fill),
+            ('fill', lambda t:t.fill_defaults())):
+        # 補完するとツリーが変わるので、計測毎に作成したツリーを使う
+        trees = [tree_without_deadlines(nodes, fanout) for _ in range(3)]
+        sec = min(timeit.repeat(lambda:func(trees.pop()), number=1, repeat=3))
+        print('{:<10}{:>12.3f} s'.format(name, sec))
+    return
+
+if __name__ == '__main__':
+    main()
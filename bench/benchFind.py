@@ -0,0 +1,40 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""Tasktory.find のパス検索時間を計測する
+python bench/benchFind.py [ノード数]
+"""
+
+import sys, os, random, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from bench.synthetic import build
+
+def legacy_find(node, path):
+    """名前索引を使わない従来の再帰検索"""
+    if isinstance(path, str): path = path.rstrip('/').split('/')
+    if node.name != path[0]: return None
+    if len(path) == 1: return node
+    for child in node.children:
+        ret = legacy_find(child, path[1:])
+        if ret is not None: return ret
+    return None
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tree = build(nodes=nodes)
+    paths = [n.path() for n in tree]
+    random.seed(0)
+    sample = random.sample(paths, 200)
+
+    for name, find in (('legacy', lambda p:legacy_find(tree, p)),
+            ('indexed', tree.find)):
+        sec = min(timeit.repeat(lambda:[find(p) for p in sample],
+            number=1, repeat=3))
+        print('{:<10}{:>12.2f} us/find'.format(name, sec / len(sample) * 1e6))
+    return
+
+if __name__ == '__main__':
+    main()
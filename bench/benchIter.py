@@ -0,0 +1,56 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""ツリーの深さに対する走査コストを、従来の再帰ジェネレータと比較する
+python bench/benchIter.py [ノード数]
+"""
+
+import sys, os, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+
+def legacy_iter(node):
+    """従来の再帰ジェネレータによる前順走査"""
+    yield node
+    for child in node.children:
+        for c in legacy_iter(child): yield c
+
+def chains(nodes, depth):
+    """深さdepthの直列ツリーをルートの下に並べたツリーを作成する"""
+    root = Tasktory('', 0)
+    made = 1
+    while made < nodes:
+        node = root
+        for i in range(min(depth, nodes - made)):
+            child = Tasktory(str(made), 0)
+            node.append(child)
+            node = child
+            made += 1
+    return root
+
+def measure(func):
+    try:
+        return '{:>12.2f}'.format(min(timeit.repeat(func, number=1, repeat=3))
+                * 1e3)
+    except RecursionError:
+        return '{:>12}'.format('overflow')
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print('nodes={} (ms)'.format(nodes))
+    print('{:>8}{:>12}{:>12}{:>12}{:>12}'.format(
+        'depth', 'recursive', 'preorder', 'postorder', 'bfs'))
+    for depth in (1, 10, 100, 500, 2000, 10000):
+        tree = chains(nodes, depth)
+        print('{:>8}'.format(depth) + ''.join([
+            measure(lambda:sum(1 for _ in legacy_iter(tree))),
+            measure(lambda:sum(1 for _ in tree.preorder())),
+            measure(lambda:sum(1 for _ in tree.postorder())),
+            measure(lambda:sum(1 for _ in tree.breadth_first()))]))
+    return
+
+if __name__ == '__main__':
+    main()
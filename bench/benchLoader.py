@@ -0,0 +1,56 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""ツリー読み込み時間を従来のget_tree + listtaskと比較する
+一時ディレクトリに合成ツリーを書き出して計測する
+python bench/benchLoader.py [ディレクトリ数]
+"""
+
+import sys, os, time, shutil, tempfile
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Manager import Manager
+from lib.core.TreeLoader import TreeLoader
+from bench.synthetic import build
+
+PROFILE = '.tasktory'
+
+def measure(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    root = tempfile.mkdtemp()
+    try:
+        tree = build(nodes=nodes)
+        for node, _ in tree.paths(root):
+            Manager.put(root, node, PROFILE)
+        leaf = [n for n in tree if not n.children][0]
+
+        # 書き出した直後のプロファイルもキャッシュを信用する
+        Manager.MANIFEST_RACY = -1
+        loader = TreeLoader(root, PROFILE)
+
+        results = [
+            ('get_tree+listtask', measure(lambda:(
+                Manager.get_tree(root, PROFILE),
+                Manager.listtask(root, PROFILE)))),
+            ('loader first', measure(loader.load)),
+            ('loader unchanged', measure(loader.load)),
+        ]
+        Manager.put(root, leaf, PROFILE)
+        results.append(('loader 1 changed', measure(loader.load)))
+
+        print('directories={}'.format(nodes))
+        for name, sec in results:
+            print('{:<20}{:>10.2f} s'.format(name, sec))
+    finally:
+        shutil.rmtree(root)
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""タスクトリツリーのメモリ使用量を旧レイアウトと比較する
+python bench/benchMemory.py [ノード数] [ノード当たりの作業時間数]
+"""
+
+import sys, os, uuid, pickle, tracemalloc
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from bench.synthetic import build
+
+class LegacyTasktory(object):
+    """旧レイアウト（__dict__、文字列UUID、タプルのリスト）の再現"""
+
+    def __init__(self, name, deadline, status='open'):
+        self.ID = str(uuid.uuid4())
+        self.name = name
+        self.deadline = deadline
+        self.status = status
+        self.timetable = []
+        self.parent = None
+        self.children = []
+        self.category = None
+        self.comments = ''
+        return
+
+    def add_time(self, start, sec):
+        self.timetable.append((start, sec))
+        return self
+
+    def append(self, child):
+        self.children.append(child)
+        child.parent = self
+        return self
+
+def measure(cls, nodes, times):
+    tracemalloc.start()
+    tree = build(cls, nodes, times)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, tree
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    times = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    legacy, _ = measure(LegacyTasktory, nodes, times)
+    compact, _ = measure(Tasktory, nodes, times)
+
+    print('nodes={} times/node={}'.format(nodes, times))
+    print('{:<10}{:>14}{:>14}{:>14}'.format('layout', 'resident', 'per node',
+        'pickle/node'))
+    for name, size, cls in (('legacy', legacy, LegacyTasktory),
+            ('compact', compact, Tasktory)):
+        # プロファイル相当（親子を含まない単一ノード）のサイズ
+        node = build(cls, 2, times).children[0]
+        node.parent = None
+        dump = len(pickle.dumps(node))
+        print('{:<10}{:>14,}{:>14,}{:>14,}'.format(
+            name, size, size // nodes, dump))
+    print('ratio: {:.2f}'.format(compact / legacy))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""作業時間の重複検出の時間を従来の Manager.overlap と比較する
+python bench/benchOverlap.py [ノード数]
+"""
+
+import sys, os, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Overlap import Overlap
+from bench.synthetic import build
+
+def legacy_overlap(tree):
+    """従来のManager.overlap（全作業時間を連結して整列し、真偽だけを返す）"""
+    table = sorted(sum([list(n.timetable) for n in tree], []),
+            key=lambda t:t[0])
+    last = 0
+    for s,t in table:
+        if s < last: return True
+        last = s + t
+    return False
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tree = build(nodes=nodes, times=20)
+    start = 1400000000 + nodes // 2 * 100000
+    end = start + 86400
+
+    for name, func in (
+            ('legacy', lambda:legacy_overlap(tree)),
+            ('all', lambda:list(Overlap.conflicts(tree))),
+            ('window', lambda:list(Overlap.conflicts(tree, start, end)))):
+        sec = min(timeit.repeat(func, number=1, repeat=3))
+        print('{:<10}{:>12.3f} s'.format(name, sec))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""プロファイルの並列読み込み時間をワーカー数毎に比較する
+tmpfs上のルートと、openに遅延を入れたファイルシステム（SMB共有の模擬）で計測する
+python bench/benchParallel.py [ディレクトリ数] [遅延ミリ秒]
+"""
+
+import sys, os, time, shutil, tempfile, builtins
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+import lib.core.Manager
+from lib.core.Manager import Manager
+from bench.synthetic import build
+
+PROFILE = '.tasktory'
+
+def slow_open(delay):
+    """openの度に遅延を入れるラッパーを返す"""
+    def wrapper(*args, **kwargs):
+        time.sleep(delay)
+        return builtins.open(*args, **kwargs)
+    return wrapper
+
+def measure(root, workers):
+    start = time.perf_counter()
+    Manager.get_tree(root, PROFILE, workers=workers)
+    return time.perf_counter() - start
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    tmpfs = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    root = tempfile.mkdtemp(dir=tmpfs)
+    try:
+        tree = build(nodes=nodes)
+        for node, _ in tree.paths(root):
+            Manager.put(root, node, PROFILE)
+
+        print('directories={} delay={}ms'.format(nodes, delay))
+        print('{:<10}{:>12}{:>12}'.format('workers', 'tmpfs', 'latency'))
+        for workers in (1, 4, 16):
+            local = measure(root, workers)
+            lib.core.Manager.open = slow_open(delay / 1000)
+            try:
+                remote = measure(root, workers)
+            finally:
+                del lib.core.Manager.open
+            print('{:<10}{:>11.2f}s{:>11.2f}s'.format(workers, local, remote))
+    finally:
+        shutil.rmtree(root)
+    return
+
+if __name__ == '__main__':
+    main()
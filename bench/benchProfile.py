@@ -0,0 +1,48 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""プロファイルの読み込み時間とサイズをpickleとバイナリ形式で比較する
+python bench/benchProfile.py [プロファイル数] [プロファイル当たりの作業時間数]
+"""
+
+import sys, os, pickle, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Profile import Profile
+from bench.synthetic import build
+from bench.benchMemory import LegacyTasktory
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    times = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    tree = build(nodes=nodes, times=times)
+    tasks = list(tree)[1:]
+
+    # 旧レイアウト（タプルのリスト）のpickle
+    legacy = build(LegacyTasktory, nodes, times)
+    legacy_tasks = []
+    stack = list(legacy.children)
+    while stack:
+        node = stack.pop()
+        stack.extend(node.children)
+        node.parent, node.children = None, []
+        legacy_tasks.append(node)
+
+    print('profiles={} times/profile={}'.format(len(tasks), times))
+    print('{:<10}{:>14}{:>14}'.format('format', 'bytes/file', 'us/load'))
+    for name, dumps, loads, tasks_ in (
+            ('legacy', pickle.dumps, pickle.loads, legacy_tasks),
+            ('pickle', lambda t:pickle.dumps(t.copy()), pickle.loads, tasks),
+            ('binary', Profile.dumps, Profile.loads, tasks)):
+        blobs = [dumps(t) for t in tasks_]
+        size = sum(len(b) for b in blobs) // len(blobs)
+        sec = min(timeit.repeat(lambda:[loads(b) for b in blobs],
+            number=1, repeat=3))
+        print('{:<10}{:>14,}{:>14.1f}'.format(name, size,
+            sec / len(blobs) * 1e6))
+    return
+
+if __name__ == '__main__':
+    main()
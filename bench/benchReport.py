@@ -0,0 +1,35 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""サンプルレポートの作成時間がツリーの大きさに比例する事を確認する
+python bench/benchReport.py [最大ノード数]
+"""
+
+import sys, os, datetime, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from bench.synthetic import build
+from lib.ui.reports import sample
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 32000
+    date = datetime.date(2014, 4, 1)
+    stamp = int(datetime.datetime(2014, 3, 30, 9, 0, 0).timestamp())
+
+    print('{:>8}{:>12}{:>14}'.format('nodes', 'sec', 'us/node'))
+    nodes = 1000
+    while nodes <= largest:
+        tree = build(nodes=nodes)
+        for i, node in enumerate(tree):
+            node.deadline = date.toordinal() + 30
+            if i % 3 == 0: node.add_time(stamp + i * 60, 60)
+        sec = min(timeit.repeat(lambda:sample.report(date, tree),
+            number=1, repeat=3))
+        print('{:>8}{:>12.3f}{:>14.2f}'.format(nodes, sec, sec / nodes * 1e6))
+        nodes *= 2
+    return
+
+if __name__ == '__main__':
+    main()
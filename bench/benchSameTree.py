@@ -0,0 +1,56 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""Manager.same_tree の比較時間を従来の全ノード比較と比較する
+（片方のツリーのノードを１つ変更してから比較する）
+python bench/benchSameTree.py [ノード数]
+"""
+
+import sys, os, time, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Manager import Manager
+from bench.synthetic import build
+
+def legacy_same_tree(tree1, tree2):
+    """従来のsame_tree（ノード数を数えてから前順に全ノードを比較する）"""
+    if len(list(tree1)) != len(list(tree2)): return False
+    for node1, node2 in zip(tree1, tree2):
+        if not Manager.same(node1, node2): return False
+    return True
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tree1 = build(nodes=nodes, times=5)
+    tree2 = build(nodes=nodes, times=5)
+    leaf = list(tree2)[-1]
+    tree1.digest()
+    tree2.digest()
+
+    def change():
+        leaf.add_time(2000000000, 1)
+        leaf.remove_time(2000000000, 1)
+        return
+
+    for name, same in (('legacy', legacy_same_tree),
+            ('digest', Manager.same_tree)):
+        sec = min(timeit.repeat(lambda:(change(), same(tree1, tree2)),
+            number=10, repeat=3)) / 10
+        print('{:<10}{:>12.3f} ms/compare'.format(name, sec * 1000))
+
+    # ハッシュの無い（読み込んだ直後の）ツリーとの比較
+    # ツリーの作成は計測に含めず、比較だけを計測する
+    secs = []
+    for _ in range(3):
+        fresh = build(nodes=nodes, times=5)
+        start = time.perf_counter()
+        Manager.same_tree(tree1, fresh)
+        secs.append(time.perf_counter() - start)
+    sec = min(secs)
+    print('{:<10}{:>12.3f} ms/compare'.format('fresh', sec * 1000))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""作業時間の集計時間を、タイムテーブルを走査するPythonのループと
+列指向のスナップショット（numpy）で比較する
+python bench/benchSnapshot.py [ノード数]
+"""
+
+import sys, os, timeit
+from collections import defaultdict
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Snapshot import Snapshot
+from bench.synthetic import build
+
+def loop_daily(tree, offset):
+    """日とタスクトリ毎の合計作業時間"""
+    ret = defaultdict(int)
+    for i, node in enumerate(tree):
+        for s, t in node.timetable:
+            ret[((s + offset) // 86400, i)] += t
+    return ret
+
+def loop_rollup(tree):
+    """部分木毎の合計作業時間"""
+    ret = {}
+    for node in tree:
+        ret[id(node)] = sum(n.timetable.total() for n in node)
+    return ret
+
+def loop_hours(tree, offset):
+    """時刻毎の作業時間（時をまたぐ作業時間は分割する）"""
+    ret = [0] * 24
+    for node in tree:
+        for s, t in node.timetable:
+            s += offset
+            e = s + t
+            while s < e:
+                h = min(e, (s // 3600 + 1) * 3600)
+                ret[s // 3600 % 24] += h - s
+                s = h
+    return ret
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tree = build(nodes=nodes, times=20)
+    snap = Snapshot(tree)
+    offset = Snapshot.utcoffset()
+
+    for name, func in (
+            ('snapshot', lambda:Snapshot(tree)),
+            ('daily', lambda:loop_daily(tree, offset)),
+            ('daily(np)', lambda:snap.buckets('day', offset)),
+            ('monthly(np)', lambda:snap.buckets('month', offset, True)),
+            ('rollup', lambda:loop_rollup(tree)),
+            ('rollup(np)', lambda:snap.totals(rollup=True)),
+            ('hours', lambda:loop_hours(tree, offset)),
+            ('hours(np)', lambda:snap.hours(offset))):
+        sec = min(timeit.repeat(func, number=1, repeat=3))
+        print('{:<12}{:>12.3f} s'.format(name, sec))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""RWTemplateの作成と読み込みの時間を、正規表現による従来の読み込みと
+固定文字列（アンカー）による分割で比較する
+・作成 : テンプレート文字列の解析のキャッシュの有無
+・ジャーナル : 大きなジャーナル（タスクライン数 = 引数）の読み込み
+・敵対的入力 : プレースホルダー間の固定文字列だけから成り、末尾だけが
+  一致しない文字列（正規表現は長さの累乗でバックトラックする）
+・ファズ : 先頭と末尾の固定文字列の間に固定文字列の文字を無作為に並べた
+  文字列の最悪時間
+  （長さを倍にした時にアンカーによる分割の時間が倍程度で済む事を見る）
+python bench/benchTemplate.py [タスクライン数]
+"""
+
+import sys, os, random, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.common.RWTemplate import RWTemplate
+
+JOURNAL_TMPL = os.path.join(HOME_DIR, 'template', 'journal.read.tmpl')
+
+def regex_parse(tmpl, string):
+    """従来の読み込み"""
+    m = tmpl.tmpl_reg.match(string)
+    if not m: raise ValueError()
+    return m.groupdict()
+
+def worst(func, strings):
+    """文字列毎の時間の最大値"""
+    ret = 0
+    for s in strings:
+        sec = min(timeit.repeat(lambda:func(s), number=1, repeat=3))
+        ret = max(ret, sec)
+    return ret
+
+def attempt(func, tmpl, string):
+    try:
+        func(tmpl, string)
+    except ValueError:
+        pass
+    return
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with open(JOURNAL_TMPL, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+
+    # 作成
+    def build():
+        RWTemplate._compile.cache_clear()
+        return RWTemplate(text)
+    for name, func in (('build', build), ('cached', lambda:RWTemplate(text))):
+        sec = min(timeit.repeat(func, number=100, repeat=3)) / 100
+        print('{:<28}{:>12.6f} s'.format(name, sec))
+
+    # ジャーナル
+    tmpl = RWTemplate(text)
+    tasks = '\n'.join('/proj{0}/task{0} 10:00-11:00 ◆'.format(i)
+            for i in range(lines))
+    journal = tmpl.substitute({'YEAR': 2015, 'MONTH': 1, 'DAY': 5,
+        'OPENTASKS': tasks, 'WAITTASKS': tasks, 'CLOSETASKS': tasks,
+        'CONSTTASKS': tasks, 'MEMO': tasks})
+    for name, func in (('journal(regex)', regex_parse),
+            ('journal(anchor)', RWTemplate.parse)):
+        sec = min(timeit.repeat(lambda:func(tmpl, journal), number=1,
+            repeat=3))
+        print('{:<28}{:>12.6f} s'.format(name, sec))
+
+    # 敵対的入力
+    tmpl = RWTemplate('%A,%B,%C,%D;')
+    for n in (50, 100, 200):
+        string = ',' * n
+        for name, func in (('regex', regex_parse), ('anchor', RWTemplate.parse)):
+            sec = min(timeit.repeat(lambda:attempt(func, tmpl, string),
+                number=1, repeat=3))
+            print('{:<28}{:>12.6f} s'.format(
+                'adversarial({}) n={}'.format(name, n), sec))
+
+    # ファズ
+    rand = random.Random(0)
+    tmpl = RWTemplate('◆%A\n◆%B\n%C;')
+    for n in (1000, 2000, 4000, 8000):
+        # 固定文字列が見つからず最後まで検索するものも含める
+        strings = []
+        for _ in range(20):
+            chars = rand.choice(['◆\n;x', '\n;x'])
+            strings.append('◆' + ''.join(rand.choice(chars)
+                for _ in range(n)) + rand.choice([';', '']))
+        sec = worst(lambda s:attempt(RWTemplate.parse, tmpl, s), strings)
+        print('{:<28}{:>12.6f} s'.format('fuzz(anchor) n={}'.format(n), sec))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""期間内に作業したタスクトリの判定時間を、ノード毎のタイムテーブルの
+検索と作業時間索引で比較する（全ノードを１週間の期間で判定する）
+python bench/benchTimeIndex.py [ノード数]
+"""
+
+import sys, os, timeit
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.TimeIndex import TimeIndex
+from lib.ui.reports import sample
+from bench.synthetic import build
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tree = build(nodes=nodes, times=20)
+    start = 1400000000 + nodes // 2 * 100000
+    end = start + 7 * 86400
+
+    sec = min(timeit.repeat(lambda:TimeIndex(tree), number=1, repeat=3))
+    print('{:<10}{:>12.3f} s'.format('build', sec))
+
+    for name, func in (
+            ('timetable', lambda:[bool(n.timetable.overlapping(start, end))
+                for n in tree]),
+            ('index', lambda:[sample.at(n, start, end) for n in tree]),
+            ('seconds', lambda:tree.time_index().seconds(start, end))):
+        tree.time_index()
+        sec = min(timeit.repeat(func, number=1, repeat=3))
+        print('{:<10}{:>12.3f} s'.format(name, sec))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!python3
+#-*- encoding:utf-8 -*-
+"""プロファイル書き出し時間を従来の１ファイルずつの書き出しと比較する
+python bench/benchWriter.py [ディレクトリ数]
+"""
+
+import sys, os, time, pickle, shutil, tempfile
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.ProfileWriter import ProfileWriter
+from bench.synthetic import build
+
+PROFILE = '.tasktory'
+
+def legacy_put(root, task, profile_name):
+    """従来のManager.put（isdirの確認とプロファイルへの直接書き込み）"""
+    path = task.path(root)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    with open(os.path.join(path, profile_name), 'wb') as f:
+        pickle.dump(task.copy(), f)
+    return
+
+def writer_put(tree, root, fsync):
+    with ProfileWriter(root, PROFILE, fsync=fsync) as writer:
+        for node, _ in tree.paths(root): writer.put(node)
+    return
+
+def measure(func, tree):
+    root = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        func(tree, root)
+        first = time.perf_counter() - start
+
+        # 既存のディレクトリへの書き直し
+        start = time.perf_counter()
+        func(tree, root)
+        second = time.perf_counter() - start
+    finally:
+        shutil.rmtree(root)
+    return first, second
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tree = build(nodes=nodes, times=20)
+
+    print('directories={}'.format(nodes))
+    print('{:<18}{:>10}{:>10}'.format('writer', 'create', 'rewrite'))
+    for name, func in (
+            ('legacy', lambda t, r:[legacy_put(r, n, PROFILE)
+                for n, _ in t.paths(r)]),
+            ('batch', lambda t, r:writer_put(t, r, False)),
+            ('batch+fsync', lambda t, r:writer_put(t, r, True))):
+        first, second = measure(func, tree)
+        print('{:<18}{:>9.2f}s{:>9.2f}s'.format(name, first, second))
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+# -*- encoding:utf-8 -*-
+"""ベンチマーク用の合成タスクトリツリー"""
+
+from lib.core.Tasktory import Tasktory
+
+def build(cls=Tasktory, nodes=50000, times=0, fanout=10):
+    """幅fanoutでnodes個のノードを持つツリーを作成する
+    各ノード（ルートを除く）にtimes個の作業時間を登録する
+    """
+    root = cls('', 0)
+    queue = [root]
+    head = 0
+    made = 1
+    while made < nodes:
+        parent = queue[head]
+        head += 1
+        for i in range(fanout):
+            if made >= nodes: break
+            child = cls('task{:06}'.format(made), 735000 + made)
+            for j in range(times):
+                child.add_time(1400000000 + made * 100000 + j * 3600, 1800)
+            parent.append(child)
+            queue.append(child)
+            made += 1
+    return root
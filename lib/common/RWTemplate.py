@@ -1,6 +1,7 @@
 # -*- encoding:utf-8 -*-
 
 import re
+from functools import lru_cache
 from string import Template
 
 class RWTemplate(Template):
@@ -11,26 +12,40 @@ class RWTemplate(Template):
     tmpl.parse('年4月1日') -> {'YEAR':'', 'MONTH':'4', 'DAY':'1'}
     tmpl.substitute({'YEAR':'2014', 'MONTH':'4', 'DAY':'1'}) -> '2014年4月1日'
     ※ デリミタの変更は禁止
+    テンプレート文字列の解析結果はプロセス全体でキャッシュする（LRU）ので、
+    同じテンプレート文字列から何度作成しても解析は１回で済む。
+    読み込みは正規表現ではなく、プレースホルダー間の固定文字列（アンカー）を
+    左から順に検索して分割する（各プレースホルダーは最短一致になり、
+    正規表現の (?P<X>.*?) の連鎖と同じ結果になる）。
+    バックトラックしないので、一致しない入力でも文字列長に比例する時間で済む。
     """
 
     delimiter = '%'
 
     __esc_reg = re.compile('([.^$*+?{}\\\[\]|()])')
     __hold_reg = re.compile(r'%(\\\{)?([A-Za-z_][A-Za-z0-9_]*)(?(1)\\\})')
+    __token_reg = re.compile(
+            r'%(?:(%)|\{([A-Za-z_][A-Za-z0-9_]*)\}|([A-Za-z_][A-Za-z0-9_]*))')
 
     def __init__(self, template):
         super().__init__(template)
+        self.tmpl_reg, self.anchors = RWTemplate._compile(template)
+        return
 
-        pattern = template
-
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _compile(template):
+        """テンプレート文字列を解析し、(正規表現, アンカー) を返す
+        アンカーは (先頭の固定文字列, ((名前, 後続の固定文字列), ...))
+        """
         # 特殊な文字をエスケープする
-        pattern = self.__esc_reg.sub(r'\\\1', template)
+        pattern = RWTemplate.__esc_reg.sub(r'\\\1', template)
 
         # %% をを退避する
         pattern_list = pattern.split('%%')
 
         # プレースホルダーを正規表現に変換する
-        pattern_list = [self.__hold_reg.sub(r'(?P<\2>.*?)', s)
+        pattern_list = [RWTemplate.__hold_reg.sub(r'(?P<\2>.*?)', s)
                 for s in pattern_list]
 
         # % を復帰させる
@@ -40,11 +55,46 @@ class RWTemplate(Template):
         pattern = r'\A' + pattern + r'\Z'
 
         # コンパイルする
-        self.tmpl_reg = re.compile(pattern, re.DOTALL)
+        tmpl_reg = re.compile(pattern, re.DOTALL)
 
-        return
+        # プレースホルダーと固定文字列に分ける
+        literals = ['']
+        names = []
+        pos = 0
+        for m in RWTemplate.__token_reg.finditer(template):
+            literals[-1] += template[pos:m.start()]
+            if m.group(1):
+                literals[-1] += '%'
+            else:
+                names.append(m.group(2) or m.group(3))
+                literals.append('')
+            pos = m.end()
+        literals[-1] += template[pos:]
+        return tmpl_reg, (literals[0], tuple(zip(names, literals[1:])))
 
     def parse(self, string):
-        m = self.tmpl_reg.match(string)
-        if not m: raise ValueError()
-        return m.groupdict()
+        """テンプレートに従って文字列を読み込み、{名前: 文字列} を返す
+        一致しない場合は ValueError を送出する
+        """
+        head, fields = self.anchors
+        if not string.startswith(head): raise ValueError()
+        if not fields:
+            if len(string) != len(head): raise ValueError()
+            return {}
+
+        ret = {}
+        pos = len(head)
+        last = len(fields) - 1
+        for i, (name, anchor) in enumerate(fields):
+            if i < last:
+                # 次の固定文字列の最初の出現までを値とする
+                end = string.find(anchor, pos)
+                if end < 0: raise ValueError()
+            else:
+                # 最後の固定文字列は末尾に一致させる
+                end = len(string) - len(anchor)
+                if end < pos or not string.endswith(anchor):
+                    raise ValueError()
+            ret[name] = string[pos:end]
+            pos = end + len(anchor)
+        return ret
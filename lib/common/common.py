@@ -21,6 +21,9 @@ JOURNAL_WRITE_TMPL_FILE = os.path.join(TMPL_DIR, 'journal.write.tmpl')
 SUMMARY_TMPL_FILE_NAME = 'summary.tmpl'
 SUMMARY_HTML_FILE_NAME = 'summary.html'
 
+# エラーログ（エラーの詳細を追記する）
+ERROR_LOG_FILE = os.path.join(HOME_DIR, 'error.log')
+
 # トレイアイコン関連ファイル
 ICON_PATH = os.path.join(RSRC_DIR, 'tasktory.ico')
 
@@ -70,7 +70,7 @@ class JournalDuplicateTasktoryError(TasktoryError):
     MSG = 'ジャーナル中のタスクトリに重複があります'
 
 class JournalOverlapTimetableError(TasktoryError):
-    MSG = 'ジャーナル中の作業時間に重複があります'
+    MSG = 'ジャーナル中の作業時間に重複があります（詳細はエラーログ）'
 
 #==============================================================================
 # レポート関連の例外
@@ -90,6 +90,10 @@ class FSReadTreeFailedError(TasktoryError):
 class FSWriteTreeFailedError(TasktoryError):
     MSG = 'タスクトリツリーの書き込みに失敗しました'
 
+class FSRootProfileUnreadableError(TasktoryError):
+    MSG = ('ルートタスクトリのプロファイルを読み込めません'
+            '（ALLOW_PICKLEを確認してください）')
+
 #==============================================================================
 # タスクトリ関連の例外
 #==============================================================================
@@ -97,7 +101,7 @@ class TasktoryMargeFailedError(TasktoryError):
     MSG = 'タスクトリのマージに失敗しました'
 
 class TasktoryOverlapTimetableError(TasktoryError):
-    MSG = 'タスクトリツリー中の作業時間に重複があります'
+    MSG = 'タスクトリツリー中の作業時間に重複があります（詳細はエラーログ）'
 
 #==============================================================================
 # メモ関連の例外
@@ -0,0 +1,218 @@
+# -*- encoding:utf-8 -*-
+
+import os, struct, zlib
+
+from lib.core.Tasktory import Tasktory
+
+class ChangeLog(object):
+    """タスクトリの変更ログ（追記専用）
+    作業時間の追加・削除、ステータス、期日の変更を、タスクトリのIDをキーに
+    １件ずつ記録する。記録は末尾への追記だけなので、ツリーの大きさに関わらず
+    変更の件数分の書き込みで済む。読み込んだツリー（チェックポイント）に
+    replayで記録を適用すると、最新の状態になる。
+    記録は「長さ(4) CRC32(4) 本体」の形式で、本体は
+    種別(1) ID(16) 値 とする。書きかけの記録（長さ不足、CRC不一致）は
+    開く時に切り詰め、最後に完全に書き込めた記録までを有効とする。
+    各記録は対象の項目を特定の値にするだけなので、同じ記録を何度適用しても
+    結果は変わらない（チェックポイントに反映済みの記録を適用しても良い）
+    log = ChangeLog('/path/to/changelog')
+    log.append(ChangeLog.diff(old, new))
+    log.replay(tree)
+    """
+
+    # 記録の種別
+    ADD_TIME = 1
+    REMOVE_TIME = 2
+    STATUS = 3
+    DEADLINE = 4
+
+    HEADER = struct.Struct('<II')
+    BODY = struct.Struct('<B16s')
+    TIME = struct.Struct('<qq')
+    DEADLINE_VALUE = struct.Struct('<?q')
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+
+        # fsyncするかどうか
+        self.fsync = fsync
+
+        self._recover()
+        return
+
+    #==========================================================================
+    # 記録の作成
+    #==========================================================================
+    @staticmethod
+    def covers(old, new):
+        """old から new への変更が、全て記録できる項目だけかどうかを返す
+        """
+        return old.ID == new.ID and old.name == new.name and\
+                old.category == new.category and old.comments == new.comments
+
+    @staticmethod
+    def diff(old, new):
+        """old を new にするための記録 (種別, ID, 値) のリストを返す
+        記録できない項目（名前など）の変更は無視する
+        """
+        ID = new.ID
+        records = []
+        if old.timetable is not new.timetable and\
+                old.timetable != new.timetable:
+            before, after = set(old.timetable), set(new.timetable)
+            records.extend((ChangeLog.REMOVE_TIME, ID, item)
+                    for item in sorted(before - after))
+            records.extend((ChangeLog.ADD_TIME, ID, item)
+                    for item in sorted(after - before))
+        if old.status != new.status and new.status is not None:
+            records.append((ChangeLog.STATUS, ID, new.status))
+        if old.deadline != new.deadline:
+            records.append((ChangeLog.DEADLINE, ID, new.deadline))
+        return records
+
+    @staticmethod
+    def apply(task, op, value):
+        """記録を１件タスクトリに適用する"""
+        if op == ChangeLog.ADD_TIME: task.add_time(*value)
+        elif op == ChangeLog.REMOVE_TIME: task.remove_time(*value)
+        elif op == ChangeLog.STATUS:
+            task.status = Tasktory.STATUSES.get(value, value)
+        elif op == ChangeLog.DEADLINE: task.deadline = value
+        return task
+
+    #==========================================================================
+    # 変換
+    #==========================================================================
+    @staticmethod
+    def dumps(op, ID, value):
+        """記録をバイト列に変換する"""
+        if op in (ChangeLog.ADD_TIME, ChangeLog.REMOVE_TIME):
+            data = ChangeLog.TIME.pack(*value)
+        elif op == ChangeLog.STATUS:
+            data = value.encode('utf-8')
+        elif op == ChangeLog.DEADLINE:
+            data = ChangeLog.DEADLINE_VALUE.pack(
+                    value is None, 0 if value is None else value)
+        else:
+            raise ValueError('unknown record {}'.format(op))
+        body = ChangeLog.BODY.pack(op, ID.to_bytes(16, 'big')) + data
+        return ChangeLog.HEADER.pack(len(body), zlib.crc32(body)) + body
+
+    @staticmethod
+    def loads(body):
+        """バイト列から記録 (種別, ID, 値) を復元する"""
+        op, ID = ChangeLog.BODY.unpack_from(body)
+        data = body[ChangeLog.BODY.size:]
+        if op in (ChangeLog.ADD_TIME, ChangeLog.REMOVE_TIME):
+            value = ChangeLog.TIME.unpack(data)
+        elif op == ChangeLog.STATUS:
+            value = data.decode('utf-8')
+        elif op == ChangeLog.DEADLINE:
+            none, value = ChangeLog.DEADLINE_VALUE.unpack(data)
+            if none: value = None
+        else:
+            raise ValueError('unknown record {}'.format(op))
+        return op, int.from_bytes(ID, 'big'), value
+
+    @staticmethod
+    def _scan(data):
+        """バイト列を先頭から読み、(記録のリスト, 有効な長さ) を返す
+        書きかけ、または壊れた記録があれば、その手前までを有効とする
+        """
+        records = []
+        offset = 0
+        while offset + ChangeLog.HEADER.size <= len(data):
+            n, crc = ChangeLog.HEADER.unpack_from(data, offset)
+            start = offset + ChangeLog.HEADER.size
+            body = data[start:start+n]
+            if len(body) != n or zlib.crc32(body) != crc: break
+            try:
+                records.append(ChangeLog.loads(body))
+            except (struct.error, ValueError):
+                break
+            offset = start + n
+        return records, offset
+
+    #==========================================================================
+    # ファイル操作
+    #==========================================================================
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return b''
+
+    def _recover(self):
+        """書きかけの記録を切り詰める"""
+        data = self._read()
+        _, offset = ChangeLog._scan(data)
+        if offset < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+                f.flush()
+                if self.fsync: os.fsync(f.fileno())
+        return
+
+    def records(self):
+        """記録 (種別, ID, 値) のリストを記録順に返す"""
+        return ChangeLog._scan(self._read())[0]
+
+    def snapshot(self):
+        """(記録のリスト, そこまでのバイト数) を返す
+        バイト数は drop に渡して、この記録だけを消すのに使う
+        """
+        return ChangeLog._scan(self._read())
+
+    def append(self, records):
+        """記録をまとめて追記する（fsyncは１回だけ行う）
+        追記した記録の数を返す
+        """
+        records = list(records)
+        if not records: return 0
+        data = b''.join(ChangeLog.dumps(*r) for r in records)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            if self.fsync: os.fsync(f.fileno())
+        return len(records)
+
+    def replay(self, tree, records=None):
+        """記録をツリーに適用して返す
+        records を省略すると、ログの全ての記録を適用する
+        ツリーに無いIDの記録は無視する
+        """
+        if records is None: records = self.records()
+        for op, ID, value in records:
+            task = tree.by_id(ID)
+            if task is not None: ChangeLog.apply(task, op, value)
+        return tree
+
+    def size(self):
+        """ログのバイト数を返す"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def clear(self):
+        """全ての記録を消す"""
+        with open(self.path, 'wb') as f:
+            f.flush()
+            if self.fsync: os.fsync(f.fileno())
+        return
+
+    def drop(self, size):
+        """先頭から size バイトの記録を消す
+        それ以降に追記された記録は残す（一時ファイルに書いて置き換えるので、
+        途中で落ちても、元のログか消した後のログのどちらかが残る）
+        """
+        rest = self._read()[size:]
+        if not rest: return self.clear()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(rest)
+            f.flush()
+            if self.fsync: os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        return
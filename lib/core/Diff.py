@@ -0,0 +1,118 @@
+# -*- encoding:utf-8 -*-
+
+import os
+
+class Diff:
+    """タスクトリツリーの差分
+    ２つのツリーの差分を、種別毎の変更 (種別, パス, 値) のリストで表す。
+    パスはツリーのルートを'/'とする相対パスで、子タスクトリは名前で
+    対応付ける（名前の変更は削除と追加になる）。
+    部分木のハッシュが一致する部分木には降りないので、変更の少ない大きな
+    ツリー同士でも変更のあった経路だけを調べる。
+    変更は pickle でき、patch で別のツリー（別のプロセス）にも適用できる。
+    changes = Diff.diff(old, new)
+    Diff.patch(old, changes)    # old が new と同じ内容になる
+    """
+
+    # 変更の種別と値
+    ADD_NODE = 'add_node'           # 追加したタスクトリのコピー（前順に並ぶ）
+    REMOVE_NODE = 'remove_node'     # None（部分木ごと削除する）
+    ADD_TIME = 'add_time'           # (開始エポック秒, 作業時間)
+    REMOVE_TIME = 'remove_time'     # (開始エポック秒, 作業時間)
+    STATUS = 'status'               # 新しいステータス
+    DEADLINE = 'deadline'           # 新しい期日
+    CATEGORY = 'category'           # 新しい種別
+    COMMENTS = 'comments'           # 新しいコメント
+
+    # 値をそのまま設定する種別
+    ATTRIBUTES = (STATUS, DEADLINE, CATEGORY, COMMENTS)
+
+    @staticmethod
+    def join(path, name):
+        """パスに子タスクトリの名前を結合する"""
+        return os.path.join(path, name).replace('\\', '/')
+
+    @staticmethod
+    def names(tree, path):
+        """ツリーのルートを'/'とする相対パスを、Tasktory.find に渡す名前の
+        リストにする
+        tree.find(Diff.names(tree, path))
+        """
+        return [tree.name] + [n for n in path.split('/') if n]
+
+    @staticmethod
+    def node(old, new, path):
+        """同じパスの２つのタスクトリ自身の変更のリストを返す"""
+        changes = []
+        if old.timetable is not new.timetable and\
+                old.timetable != new.timetable:
+            before, after = set(old.timetable), set(new.timetable)
+            changes.extend((Diff.REMOVE_TIME, path, item)
+                    for item in sorted(before - after))
+            changes.extend((Diff.ADD_TIME, path, item)
+                    for item in sorted(after - before))
+        for attr in Diff.ATTRIBUTES:
+            value = getattr(new, attr)
+            if getattr(old, attr) != value: changes.append((attr, path, value))
+        return changes
+
+    @staticmethod
+    def diff(old, new):
+        """old を new にする変更のリストを返す
+        ルートの名前は比較しない
+        """
+        changes = []
+        stack = [('/', old, new)]
+        while stack:
+            path, node1, node2 = stack.pop()
+            if node1 is None:
+                # 追加した部分木は前順に１ノードずつ追加する
+                added = [(path, node2)]
+                while added:
+                    sub, node = added.pop()
+                    changes.append((Diff.ADD_NODE, sub, node.copy()))
+                    added.extend((Diff.join(sub, c.name), c)
+                            for c in reversed(node.children))
+                continue
+            if node2 is None:
+                changes.append((Diff.REMOVE_NODE, path, None))
+                continue
+            if node1.digest() == node2.digest(): continue
+            if node1.content_digest() != node2.content_digest():
+                changes.extend(Diff.node(node1, node2, path))
+
+            pairs = [(c.name, c, node2.get(c.name)) for c in node1.children]
+            pairs.extend((c.name, None, c) for c in node2.children
+                    if node1.get(c.name) is None)
+            stack.extend((Diff.join(path, name), c1, c2)
+                    for name, c1, c2 in reversed(pairs))
+        return changes
+
+    @staticmethod
+    def patch(tree, changes):
+        """変更をツリーにその場で適用して返す
+        対象のタスクトリが無い変更は無視する
+        """
+        for op, path, value in changes:
+            if op == Diff.ADD_NODE:
+                parent = tree.find(Diff.names(tree, os.path.dirname(path)))
+                if parent is None: continue
+                name = os.path.basename(path)
+                if parent.get(name) is not None: continue
+                parent.append(value.copy())
+                continue
+
+            node = tree.find(Diff.names(tree, path))
+            if node is None: continue
+            if op == Diff.REMOVE_NODE:
+                if node is not tree: node.parent.remove(node)
+            elif op == Diff.ADD_TIME: node.add_time(*value)
+            elif op == Diff.REMOVE_TIME: node.remove_time(*value)
+            elif op in Diff.ATTRIBUTES: setattr(node, op, value)
+            else: raise ValueError('unknown change {}'.format(op))
+        return tree
+
+    @staticmethod
+    def paths(changes):
+        """変更、追加したタスクトリのパスの集合を返す（削除したものを除く）"""
+        return set(p for op, p, _ in changes if op != Diff.REMOVE_NODE)
@@ -0,0 +1,60 @@
+# -*- encoding:utf-8 -*-
+
+import os
+
+from lib.core.Storage import Storage
+from lib.core.Manager import Manager
+from lib.core.TreeLoader import TreeLoader
+
+class FileStorage(Storage):
+    """ディレクトリをタスクトリとして保存する（従来の形式）
+    タスクトリ毎にディレクトリを作り、プロファイルとメモをその中に置く
+    listtaskは直前のget_treeでツリーと同時に集めたパスを返す（ディレクトリ
+    を走査し直さない）。外部での変更を調べる場合は、get_treeを先に呼ぶ
+    """
+
+    def __init__(self, root, profile_name, memo_name, manifest_name=None,
+            workers=1, binary=False, fsync=False, allow_pickle=True):
+        self.root = root
+        self.profile_name = profile_name
+        self.memo_name = memo_name
+        self.binary = binary
+        self.fsync = fsync
+        self.allow_pickle = allow_pickle
+        self.loader = TreeLoader(root, profile_name, manifest_name, workers,
+                allow_pickle)
+        self._loaded = False
+        return
+
+    def fspath(self, path):
+        """タスクトリのパスをファイルシステムのパスに変換する
+        Tasktory.path(root)と同じ文字列になる
+        """
+        return os.path.join(self.root, path.lstrip('/')).replace('\\', '/')
+
+    def get_tree(self):
+        tree = self.loader.load()
+        self._loaded = True
+        return tree
+
+    def get(self, path):
+        return Manager.get(self.fspath(path), self.profile_name, path != '/',
+                self.allow_pickle)
+
+    def put_many(self, tasks, loaded=None):
+        if loaded is not None:
+            loaded = dict((self.fspath(p), t) for p, t in loaded.items())
+        return Manager.put_many(self.root, tasks, self.profile_name, loaded,
+                self.binary, self.fsync)
+
+    def listtask(self):
+        # 直前に読み込んだパス（まだ読み込んでいなければ読み込む）
+        if not self._loaded: self.get_tree()
+        prefix = self.fspath('/')
+        return set('/' + p[len(prefix):] for p in self.loader.paths)
+
+    def get_memo(self, path):
+        return Manager.get_memo(self.fspath(path), self.memo_name)
+
+    def put_memo(self, dttm, path, text):
+        return Manager.put_memo(dttm, self.fspath(path), text, self.memo_name)
@@ -0,0 +1,196 @@
+# -*- encoding:utf-8 -*-
+
+import threading
+
+from lib.core.Storage import Storage
+from lib.core.ChangeLog import ChangeLog
+from lib.core.Diff import Diff
+
+class LoggedStorage(Storage):
+    """変更ログ付きの保存先
+    作業時間、ステータス、期日だけの変更は、保存先に書き込まずに変更ログへ
+    追記する。読み込み時は保存先のツリー（チェックポイント）に変更ログを
+    適用して返す。変更ログが compact_size バイトを超えると、バックグラウンドの
+    スレッドで保存先に反映し、反映した記録を変更ログから消す（compact）。
+    適用済みのツリーは保持しておき、書き込んだ内容をそのツリーにも反映する
+    ので、２回目以降の読み込みでは保存先を読み直さない（ツリーは遅延コピー
+    で返すので、大きさに関わらず一定時間で済む）。保存先が外部で変更された
+    時は refresh で破棄する。
+    storage = LoggedStorage(FileStorage(...), '/path/to/changelog')
+    """
+
+    def __init__(self, storage, log_path, compact_size=1<<20, fsync=True):
+        self.storage = storage
+        self.log = ChangeLog(log_path, fsync)
+        self.compact_size = compact_size
+
+        # 保持しているツリーと変更ログへのアクセスを直列化する
+        self._lock = threading.RLock()
+
+        # 保存先へのアクセスを直列化する
+        # （compactは保存先への書き込み中に _lock を持たないので、その間も
+        #   変更ログだけで済む書き込みや、保持しているツリーの読み込みは待たない）
+        self._storage_lock = threading.Lock()
+        self._compactor = None
+
+        # 変更ログを適用済みのツリー（最初の読み込みまで作成しない）
+        self._tree = None
+        return
+
+    def close(self):
+        compactor = self._compactor
+        if compactor is not None: compactor.join()
+        with self._storage_lock:
+            self.storage.close()
+            return
+
+    def refresh(self):
+        with self._lock, self._storage_lock:
+            self._tree = None
+            self.storage.refresh()
+            return
+
+    #==========================================================================
+    # タスクトリ
+    #==========================================================================
+    def get_tree(self):
+        with self._lock:
+            if self._tree is None:
+                with self._storage_lock: tree = self.storage.get_tree()
+                if tree is None: return None
+                self._tree = self.log.replay(tree)
+
+            # 部分木のハッシュを計算しておき、コピーに引き継ぐ
+            # （返したツリー同士の差分を求める時に、変更の無い部分木の子を
+            #   参照しない。変更のあった経路以外はキャッシュを返すだけで済む）
+            self._tree.digest()
+            return self._tree.deepcopy()
+
+    def get(self, path):
+        with self._lock:
+            if self._tree is not None:
+                task = self._tree.find(Diff.names(self._tree, path))
+                return None if task is None else task.copy()
+            with self._storage_lock: task = self.storage.get(path)
+            if task is not None:
+                for op, ID, value in self.log.records():
+                    if ID == task.ID: ChangeLog.apply(task, op, value)
+            return task
+
+    def put_many(self, tasks, loaded=None):
+        with self._lock:
+            # 読み込み時から変わった項目を変更ログに記録する
+            # 記録できない項目も変わったタスクトリは、保存先にも書き込む
+            # （以前の記録が保存先の新しい値を上書きしないように、
+            #   記録できる項目の変更は常に変更ログにも残す）
+            records = []
+            rest = []
+            changed = []
+            logged = 0
+            for task in tasks:
+                path = task.path()
+                old = None if loaded is None else loaded.get(path)
+                if old is None or old.ID != task.ID:
+                    rest.append(task)
+                    changed.append((path, task))
+                    continue
+                diff = ChangeLog.diff(old, task)
+                covered = ChangeLog.covers(old, task)
+                records.extend(diff)
+                if not covered: rest.append(task)
+                elif diff: logged += 1
+                if diff or not covered: changed.append((path, task))
+
+            # 変更ログを先に書き込む
+            self.log.append(records)
+            count = logged
+            try:
+                if rest:
+                    with self._storage_lock:
+                        count += self.storage.put_many(rest, loaded)
+            except:
+                self._tree = None
+                raise
+
+            for path, task in changed: self._update(path, task)
+
+            if self.log.size() > self.compact_size: self._start_compaction()
+            return count
+
+    def _update(self, path, task):
+        """保持しているツリーに、書き込んだタスクトリの内容を反映する
+        同じパスに同じIDのタスクトリが無ければ（追加や付け替え）、ツリーを
+        破棄して次の読み込みで作り直す
+        """
+        if self._tree is None: return
+        node = self._tree.find(Diff.names(self._tree, path))
+        if node is None or node.ID != task.ID:
+            self._tree = None
+            return
+        if node.timetable is not task.timetable and\
+                node.timetable != task.timetable:
+            node.timetable = task.timetable.share()
+        if node.status != task.status: node.status = task.status
+        if node.deadline != task.deadline: node.deadline = task.deadline
+        if node.category != task.category: node.category = task.category
+        if node.comments != task.comments: node.comments = task.comments
+        return
+
+    def listtask(self):
+        with self._lock, self._storage_lock:
+            return self.storage.listtask()
+
+    #==========================================================================
+    # メモ
+    #==========================================================================
+    def get_memo(self, path):
+        with self._lock, self._storage_lock:
+            return self.storage.get_memo(path)
+
+    def put_memo(self, dttm, path, text):
+        with self._lock, self._storage_lock:
+            return self.storage.put_memo(dttm, path, text)
+
+    #==========================================================================
+    # 変更ログの反映
+    #==========================================================================
+    def compact(self):
+        """変更ログを保存先に反映し、反映した記録を変更ログから消す
+        保存先のツリーと変更ログの記録は _lock を持って読むが、保存先への
+        書き込みは _lock を放してから行う。書き込み中に追記された記録は
+        反映していないので消さずに残す。
+        変更ログの記録は何度適用しても同じ結果になるので、反映後、消す前に
+        落ちても、次回の読み込み結果は変わらない
+        反映したタスクトリの数を返す
+        """
+        with self._lock:
+            # 保存先のロックは書き込み終わるまで持ち続ける
+            # （読んだ後に他の書き込みが入ると、古い内容で上書きしてしまう）
+            self._storage_lock.acquire()
+            try:
+                tree = self.storage.get_tree()
+                records, size = self.log.snapshot()
+            except:
+                self._storage_lock.release()
+                raise
+
+        try:
+            if tree is None or not records: return 0
+            loaded = dict((p, n.copy()) for n, p in tree.paths())
+            self.log.replay(tree, records)
+            count = self.storage.put_many(
+                    (n for n, _ in tree.paths()), loaded)
+        finally:
+            self._storage_lock.release()
+
+        with self._lock:
+            self.log.drop(size)
+            return count
+
+    def _start_compaction(self):
+        """バックグラウンドでcompactする（実行中なら何もしない）"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact)
+        self._compactor.start()
+        return
@@ -1,6 +1,10 @@
 # -*- encoding:utf-8 -*-
 
-import os, re, pickle
+import os, re, time, pickle
+
+from lib.core.Profile import Profile
+from lib.core.ProfileWriter import ProfileWriter
+from lib.core.Overlap import Overlap
 
 class Manager:
 
@@ -8,24 +12,38 @@ class Manager:
     # ディレクトリ → タスクトリ変換メソッド
     #==========================================================================
     @staticmethod
-    def get_tree(root, profile_name, rename=False):
+    def get_tree(root, profile_name, rename=False, manifest_name=None,
+            workers=1, allow_pickle=True):
         """指定したパス以下のタスクトリツリーを取得する
+        manifest_name - 指定した場合はルート直下のマニフェストキャッシュを使い、
+                        変更のあったプロファイルだけを読み込む
+        workers       - 2以上を指定した場合は、プロファイルをその数のスレッドで
+                        並列に読み込む（子の順序は変わらない）
+        allow_pickle  - 偽の場合は旧形式（pickle）のプロファイルを読み込まない
+                        （getを参照）
         """
+        if manifest_name is not None or workers > 1:
+            return Manager.get_tree_cached(root, profile_name, manifest_name,
+                    rename, workers, allow_pickle)
+
         # タスクトリを復元する
-        task = Manager.get(root, profile_name, rename)
+        task = Manager.get(root, profile_name, rename, allow_pickle)
         if task is None: return None
 
         # サブタスクトリを復元する
-        children = [Manager.get_tree(os.path.join(root, p), profile_name, True)
-                for p in os.listdir(root)]
+        children = [Manager.get_tree(os.path.join(root, p), profile_name, True,
+            allow_pickle=allow_pickle) for p in os.listdir(root)]
         [task.append(c) for c in children if c is not None]
 
         return task
 
     @staticmethod
-    def get(path, profile_name, rename=True):
+    def get(path, profile_name, rename=True, allow_pickle=True):
         """指定されたパスからタスクトリを作成して返す
         指定されたパスがタスクトリでなければNoneを返す
+        allow_pickle - 偽の場合は旧形式（pickle）のプロファイルを読み込まずに
+                       Noneを返す（pickleは読み込むだけで任意のコードを実行
+                       できるので、バイナリ形式への移行後は偽にする）
         """
         # プロファイルのパスを作成する
         profile = os.path.join(path, profile_name)
@@ -34,38 +52,122 @@ class Manager:
         if not os.path.isfile(profile): return None
 
         # タスクトリを復元する
+        # バイナリ形式と旧形式（pickle）のどちらも読み込む
         with open(profile, 'rb') as f:
-            try:
-                task = pickle.load(f)
-                if rename: task.name = os.path.basename(path)
-            except pickle.UnpicklingError:
-                return None
+            data = f.read()
+        try:
+            if Profile.is_profile(data): task = Profile.loads(data)
+            elif allow_pickle: task = pickle.loads(data)
+            else: return None
+            if rename: task.name = os.path.basename(path)
+        except (pickle.UnpicklingError, ValueError):
+            return None
 
         return task
 
     #==========================================================================
-    # タスクトリ → ディレクトリ変換メソッド
+    # マニフェストキャッシュ
+    # ツリー全体（各ノードのコピー）と、各プロファイルの (mtime, size, inode)、
+    # 各ディレクトリの mtime とサブディレクトリ名を１つのファイルに保存する。
+    # 読み込み時は stat だけで検証し、変更のあったプロファイルだけを読み直す。
+    # サブディレクトリの増減はディレクトリの mtime の変化で検出する。
+    # 読み込み（検証）はTreeLoaderが行う。
     #==========================================================================
+
+    # マニフェストの形式のバージョン
+    MANIFEST_VERSION = 1
+
+    # 保存時点からこの秒数以内に更新されたものは、同じ時刻のまま再び書き換え
+    # られても区別できないので、キャッシュを信用しない
+    MANIFEST_RACY = 2
+
     @staticmethod
-    def put(root, task, profile_name):
-        """タスクトリをファイルシステムに保存する
+    def get_tree_cached(root, profile_name, manifest_name, rename=False,
+            workers=1, allow_pickle=True):
+        """マニフェストキャッシュを使って指定したパス以下のタスクトリツリーを
+        取得する。結果はget_treeと同じ
         """
-        # タスクトリのフルパスを取得する
-        path = task.path(root)
+        from lib.core.TreeLoader import TreeLoader
+        return TreeLoader(root, profile_name, manifest_name, workers,
+                allow_pickle).load(rename=rename)
 
-        # ディレクトリを無ければ作成する
-        if not os.path.isdir(path):
-            os.makedirs(path)
-
-        # 保存用のオブジェクトを作成する
-        tmp = task.copy()
+    @staticmethod
+    def load_manifest(path):
+        """マニフェストを読み込んで {相対パス: キャッシュ} の辞書を返す
+        無いか壊れている場合は空の辞書を返す（全て読み直す）
+        """
+        try:
+            with open(path, 'rb') as f:
+                manifest = pickle.load(f)
+            if manifest['version'] == Manager.MANIFEST_VERSION:
+                return manifest['nodes']
+        except Exception:
+            # 壊れたpickleは様々な例外を送出するので、全て作り直しの対象とする
+            pass
+        return {}
 
-        # タスクトリを保存する
-        with open(os.path.join(path, profile_name), 'wb') as f:
-            pickle.dump(tmp, f)
+    @staticmethod
+    def save_manifest(path, nodes):
+        """マニフェストを保存する
+        一時ファイルに書いてから置き換えるので、途中で失敗しても壊れない
+        """
+        # 保存直前に更新されたものは、次回必ず読み直すようにする
+        racy = time.time_ns() - Manager.MANIFEST_RACY * 10**9
+        nodes = dict((rel, (None if key is None or key[0] >= racy else key,
+            task.copy(), None if mtime is None or mtime >= racy else mtime,
+            dirs)) for rel, (key, task, mtime, dirs) in nodes.items())
+
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump({'version': Manager.MANIFEST_VERSION,
+                    'nodes': nodes}, f)
+            os.replace(tmp, path)
+        except OSError:
+            # キャッシュなので、保存できなくても動作に支障はない
+            pass
+        return
 
+    #==========================================================================
+    # タスクトリ → ディレクトリ変換メソッド
+    #==========================================================================
+    @staticmethod
+    def put(root, task, profile_name, binary=False, fsync=False):
+        """タスクトリをファイルシステムに保存する
+        一時ファイルに書き出してから置き換えるので、途中で落ちても
+        書きかけのプロファイルは残らない
+        binary - 真の場合はバイナリ形式、偽の場合は旧形式（pickle）で保存する
+        fsync - 真の場合はfsyncする（ProfileWriter参照）
+        """
+        with ProfileWriter(root, profile_name, fsync=fsync,
+                binary=binary) as writer:
+            writer.put(task)
         return
 
+    @staticmethod
+    def put_many(root, tasks, profile_name, loaded=None, binary=False,
+            fsync=False):
+        """複数のタスクトリをファイルシステムに保存する
+        全て一時ファイルに書き出せた場合だけ、まとめて置き換える
+        （途中で失敗した場合は、どのプロファイルも書き換えない）
+        loaded - 読み込んだ時点のタスクトリの {フルパス: コピー} の辞書。
+                 指定した場合は、保存する項目に変更の無いタスクトリを書き出さない
+        binary - 真の場合はバイナリ形式、偽の場合は旧形式（pickle）で保存する
+        fsync - 真の場合はfsyncする（ProfileWriter参照）
+        書き出したタスクトリの数を返す
+        """
+        with ProfileWriter(root, profile_name, fsync=fsync,
+                binary=binary) as writer:
+            for task in tasks:
+                if loaded is not None:
+                    old = loaded.get(task.path(root))
+                    if old is not None and old.ID == task.ID and\
+                            Manager.same(old, task):
+                        continue
+                writer.put(task)
+            count = len(writer)
+        return count
+
     #==========================================================================
     # ディレクトリ参照メソッド
     #==========================================================================
@@ -88,15 +190,9 @@ class Manager:
     def overlap(tree):
         """ツリー全体のタイムテーブルに重複する箇所が無いか確認する
         重複がある場合はTrue、無い場合はFalseを返す
+        （重複する組を全て得るには Overlap.conflicts を使用する）
         """
-        # タイムテーブルを取得し、開始エポック秒でソートする
-        table = sorted(sum([n.timetable for n in tree], []), key=lambda t:t[0])
-
-        # 作業時間に重複がないか確認する
-        last = 0
-        for s,t in table:
-            if s < last: return True
-            last = s + t
+        for _ in Overlap.conflicts(tree): return True
         return False
 
     @staticmethod
@@ -106,10 +202,7 @@ class Manager:
         """
         if tree1 is tree2: return True
         if tree1 is None or tree2 is None: return False
-        if len(tree1) != len(tree2): return False
-        for node1, node2 in zip(tree1, tree2):
-            if not Manager.same(node1, node2): return False
-        return True
+        return tree1.digest() == tree2.digest()
 
     @staticmethod
     def same(task1, task2):
@@ -117,7 +210,7 @@ class Manager:
         差分が無ければTrue、有ればFalseを返す
         """
         if task1.name != task2.name: return False
-        if set(task1.timetable) != set(task2.timetable): return False
+        if task1.timetable != task2.timetable: return False
         if task1.status != task2.status: return False
         if task1.deadline != task2.deadline: return False
         if task1.category != task2.category: return False
@@ -0,0 +1,73 @@
+# -*- encoding:utf-8 -*-
+
+import datetime
+from heapq import heappush, heappop
+from itertools import repeat
+from operator import add
+
+class Overlap:
+    """作業時間の重複の検出
+    ツリー全体の作業時間を開始エポック秒の順に走査し、重複する全ての組を
+    所有するタスクトリのパスと共に返す。
+    各タスクトリのタイムテーブルは整列済みなので、連結して整列すると
+    タスクトリ毎の整列済みの列の併合になる（C実装の併合で済む）。
+    走査中は終了時刻のヒープに作業中の作業時間だけを持つので、
+    作業時間の数 N、重複の数 K に対して O(N log N + K) で済む。
+    for (path1, s1, t1), (path2, s2, t2) in Overlap.conflicts(tree):
+        print(path1, path2)
+    for line in Overlap.describe(Overlap.conflicts(tree)):
+        print(line)
+    """
+
+    @staticmethod
+    def conflicts(tree, start=None, end=None):
+        """重複する作業時間の組 ((パス, 開始, 作業時間), (パス, 開始, 作業時間))
+        を、後の作業時間の開始エポック秒の順に返す（組の中は開始の早い順）
+        start, end - 指定した場合は、start <= s + t かつ s < end となる
+                     作業時間だけを調べる（ジャーナルで編集した日だけを
+                     調べる場合に使用する）
+        """
+        # (開始, 作業時間, タスクトリの番号) のリストを作成して整列する
+        paths = []
+        table = []
+        for node, path in tree.paths():
+            if not node.timetable: continue
+            items = node.timetable if start is None\
+                    else node.timetable.overlapping(start, end)
+            table.extend(map(add, items, repeat((len(paths),))))
+            paths.append(path)
+        table.sort()
+
+        # 作業中の (終了, 開始, 作業時間, タスクトリの番号) のヒープ
+        active = []
+        for s, t, k in table:
+            while active and active[0][0] <= s: heappop(active)
+            for _, s2, t2, k2 in sorted(active, key=lambda a:a[1:]):
+                yield (paths[k2], s2, t2), (paths[k], s, t)
+            heappush(active, (s + t, s, t, k))
+        return
+
+    @staticmethod
+    def describe(conflicts):
+        """conflicts で得た重複する作業時間の組を、エラーログなどに表示する
+        文字列（１組１行）のリストにする
+        '/A 2014/06/01 10:00-10:30 と /B 2014/06/01 10:15-10:45'
+        """
+        def span(path, s, t):
+            start = datetime.datetime.fromtimestamp(s)
+            end = datetime.datetime.fromtimestamp(s + t)
+            return '{} {}-{}'.format(path, start.strftime('%Y/%m/%d %H:%M'),
+                    end.strftime('%H:%M'))
+        return ['{} と {}'.format(span(*a), span(*b)) for a, b in conflicts]
+
+    @staticmethod
+    def window(tree):
+        """ツリー全体の作業時間の範囲 (最初の開始, 最後の終了) を返す
+        作業時間が無ければNoneを返す
+        （ジャーナルで編集した作業時間と重なるものだけを調べる場合に、
+          conflicts の start, end に使用する）
+        """
+        first = min((next(iter(n.timetable))[0] for n in tree
+            if n.timetable), default=None)
+        if first is None: return None
+        return first, tree.subtree_timestamp()
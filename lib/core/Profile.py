@@ -0,0 +1,155 @@
+# -*- encoding:utf-8 -*-
+
+import sys, struct, zlib
+from array import array
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Timetable import Timetable
+
+class Profile:
+    """タスクトリプロファイルのバイナリ形式
+    pickleと違いクラスの構成に依存せず、読み込んでも任意のコードは実行されない。
+    ヘッダ    : マジック(4) バージョン(1) 予約(1) フラグ(2) CRC32(4)
+    ID        : 16バイト（ビッグエンディアン）
+    期日      : 符号付き64bit整数
+    文字列    : 名前、ステータス、種別、コメントの順に、長さ(4) + UTF-8
+    タイムテーブル : 要素数(4) + 集計値（最終終了時刻、最長作業時間、
+                     合計作業時間をそれぞれ8） + 開始エポック秒の配列 +
+                     作業時間の配列
+                     （配列をそのまま書き出す。全ての値が符号無し32bit整数に
+                     収まれば32bit、収まらなければ符号付き64bitの配列とする）
+    数値は全てリトルエンディアンとする。値がNoneの項目、配列の幅はフラグで表す。
+    CRC32はフラグとID以降の全体から計算する。読み込み時はCRC32だけを確かめ、
+    保存してある集計値と配列の並び順をそのまま使う（要素毎の検査をしない）。
+    CRC32の無いバージョン1の形式も読み込める（並び順を確かめ、集計値を
+    計算し直す）。
+    """
+
+    MAGIC = b'TKTP'
+    VERSION = 2
+
+    # Noneを表すフラグ
+    NO_DEADLINE = 0x01
+    NO_STATUS = 0x02
+    NO_CATEGORY = 0x04
+    NO_COMMENTS = 0x08
+
+    # タイムテーブルを64bitの配列で保存したことを表すフラグ
+    WIDE = 0x10
+
+    HEADER = struct.Struct('<4sBBHI16sq')
+    HEADER_V1 = struct.Struct('<4sBBH16sq')
+    LENGTH = struct.Struct('<I')
+    TABLE = struct.Struct('<Iqqq')
+
+    @staticmethod
+    def is_profile(data):
+        """バイナリ形式のプロファイルかどうかを返す"""
+        return data[:4] == Profile.MAGIC
+
+    @staticmethod
+    def dumps(task):
+        """タスクトリ（親と子を含まない）をバイナリ形式に変換する"""
+        flags = 0
+        if task.deadline is None: flags |= Profile.NO_DEADLINE
+        if task.status is None: flags |= Profile.NO_STATUS
+        if task.category is None: flags |= Profile.NO_CATEGORY
+        if task.comments is None: flags |= Profile.NO_COMMENTS
+
+        starts = array('q', (s for s,_ in task.timetable))
+        secs = array('q', (t for _,t in task.timetable))
+        if starts and (min(starts) < 0 or max(starts) >= 1<<32 or
+                min(secs) < 0 or max(secs) >= 1<<32):
+            flags |= Profile.WIDE
+        else:
+            starts, secs = array('I', starts), array('I', secs)
+
+        data = [Profile.HEADER.pack(Profile.MAGIC, Profile.VERSION, 0, flags,
+            0, task.ID.to_bytes(16, 'big'),
+            0 if task.deadline is None else task.deadline)]
+        for s in (task.name, task.status, task.category, task.comments):
+            s = b'' if s is None else s.encode('utf-8')
+            data.append(Profile.LENGTH.pack(len(s)))
+            data.append(s)
+
+        if sys.byteorder != 'little':
+            starts.byteswap()
+            secs.byteswap()
+        data.append(Profile.TABLE.pack(len(starts), *task.timetable.stats()))
+        data.append(starts.tobytes())
+        data.append(secs.tobytes())
+        data = bytearray(b''.join(data))
+        data[8:12] = Profile.LENGTH.pack(Profile._crc(data))
+        return bytes(data)
+
+    @staticmethod
+    def _crc(data):
+        """フラグとID以降の全体のCRC32を返す（CRC32の欄自身は含まない）"""
+        return zlib.crc32(memoryview(data)[12:], zlib.crc32(data[6:8]))
+
+    @staticmethod
+    def loads(data):
+        """バイナリ形式からタスクトリを復元する
+        形式が正しくない場合はValueErrorを送出する
+        """
+        try:
+            magic, version = data[:4], data[4]
+            if magic != Profile.MAGIC: raise ValueError('not a profile')
+            if version > Profile.VERSION:
+                raise ValueError('unknown version {}'.format(version))
+            if version == 1:
+                _, _, _, flags, ID, deadline =\
+                        Profile.HEADER_V1.unpack_from(data)
+                offset = Profile.HEADER_V1.size
+            else:
+                _, _, _, flags, crc, ID, deadline =\
+                        Profile.HEADER.unpack_from(data)
+                if crc != Profile._crc(data): raise ValueError('bad crc')
+                offset = Profile.HEADER.size
+
+            strings = []
+            for _ in range(4):
+                n, = Profile.LENGTH.unpack_from(data, offset)
+                offset += Profile.LENGTH.size
+                strings.append(data[offset:offset+n].decode('utf-8'))
+                offset += n
+            name, status, category, comments = strings
+
+            # タイムテーブルは配列のまま読み込む（要素毎のタプルを作らない）
+            # CRC32で確かめたので、集計値も並び順もそのまま使う
+            n, last, longest, total = Profile.TABLE.unpack_from(data, offset)
+            offset += Profile.TABLE.size
+            size = n * (8 if flags & Profile.WIDE else 4)
+            if len(data) != offset + 2 * size: raise ValueError('bad length')
+            starts = data[offset:offset+size]
+            secs = data[offset+size:]
+        except (struct.error, IndexError) as e:
+            raise ValueError(str(e))
+
+        if not flags & Profile.WIDE:
+            starts, secs = Profile._widen(starts), Profile._widen(secs)
+        starts, secs = array('q', starts), array('q', secs)
+        if sys.byteorder != 'little':
+            starts.byteswap()
+            secs.byteswap()
+
+        task = Tasktory.__new__(Tasktory)
+        task.__setstate__({'ID': int.from_bytes(ID, 'big'), 'name': name,
+            'deadline': None if flags & Profile.NO_DEADLINE else deadline,
+            'status': None if flags & Profile.NO_STATUS else status,
+            'timetable': Timetable.from_arrays(starts, secs,
+                (last, longest, total)) if version > 1 else
+                Timetable.from_arrays(starts, secs, check=True),
+            'parent': None, 'children': [],
+            'category': None if flags & Profile.NO_CATEGORY else category,
+            'comments': None if flags & Profile.NO_COMMENTS else comments})
+        return task
+
+    @staticmethod
+    def _widen(data):
+        """リトルエンディアンの符号無し32bit整数の列を64bit整数の列に広げる
+        要素毎に数値を作らずに、バイト列のスライス代入だけで済ませる
+        """
+        ret = bytearray(len(data) * 2)
+        for i in range(4): ret[i::8] = data[i::4]
+        return ret
@@ -0,0 +1,213 @@
+# -*- encoding:utf-8 -*-
+
+import os, pickle, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from lib.core.Profile import Profile
+
+class ProfileWriter(object):
+    """タスクトリプロファイルの一括書き出し
+    各プロファイルを一時ファイルに書き出し、commitで本来のファイル名に
+    置き換える（置き換えはファイル毎に不可分）。途中で落ちても、
+    プロファイルが書きかけのまま残る事は無い。
+    fsync - 真の場合は一時ファイルをfsyncし、置き換えた後にディレクトリも
+            ディレクトリ毎に１回だけfsyncする（電源断にも備える場合に指定
+            する。既定では行わない）。fsyncする場合は、書き出しとfsyncを
+            group 個ずつまとめてスレッドプールで行う。
+    commit前にrollbackすると、一時ファイルと新しく作ったディレクトリを消す。
+    ※ 既存のプロファイルの置き換えは、従来の直接の上書きより遅い（ext4では
+      置き換え時に新しいファイルの書き出しが強制されるため数倍かかる）。
+      fsyncしない既定の設定でも、書き出し中にアプリケーションが落ちて
+      プロファイルが書きかけになる事は無い。電源断に備える場合だけ fsync を
+      指定する（さらに遅くなる）。
+    with ProfileWriter(root, '.tasktory') as writer:
+        for node in tree: writer.put(node)
+    （withを抜ける時に、例外が無ければcommit、あればrollbackする）
+    """
+
+    # 一時ファイルの拡張子
+    SUFFIX = '.tmp'
+
+    def __init__(self, root, profile_name, group=64, fsync=False, workers=4,
+            binary=False):
+        self.root = root
+        self.profile_name = profile_name
+
+        # 真の場合はバイナリ形式、偽の場合は旧形式（pickle）で書き出す
+        self.binary = binary
+
+        # まとめて書き出すファイル数
+        self.group = group
+
+        # fsyncするかどうか
+        self.fsync = fsync
+
+        # 書き出し用のスレッドプール（最初のグループを書き出す時に作成する）
+        self.workers = workers
+        self._executor = None
+
+        # 書き出し待ちの (一時ファイル, プロファイル, データ) のリスト
+        self._group = []
+
+        # 書き出し中のグループ (Future, グループ) のリスト
+        self._futures = []
+
+        # 新しく作成したディレクトリ（作成順）
+        self._created = []
+        self._lock = threading.Lock()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None: self.commit()
+        else: self.rollback()
+        return False
+
+    def __len__(self):
+        return len(self._group) + sum(len(g) for _, g in self._futures)
+
+    def put(self, task):
+        """タスクトリを一時ファイルに書き出す（書き出しは非同期に行う）
+        """
+        profile = os.path.join(task.path(self.root), self.profile_name)
+        data = Profile.dumps(task) if self.binary\
+                else pickle.dumps(task.copy())
+        self._group.append((profile + ProfileWriter.SUFFIX, profile, data))
+        if len(self._group) >= self.group: self._flush()
+        return
+
+    def _flush(self, wait=False):
+        """書き出し待ちのグループをスレッドプールに渡す
+        wait - 真の場合、スレッドプールが無ければ（全体が１グループに収まって
+               いれば）スレッドを使わずにその場で書き出す
+        fsyncしない場合は待つものが無いので、常にその場で書き出す
+        """
+        if not self._group: return
+        group, self._group = self._group, []
+        if not self.fsync or (wait and self._executor is None):
+            future = Future()
+            try:
+                self._write(group)
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers)
+            future = self._executor.submit(self._write, group)
+        self._futures.append((future, group))
+        return
+
+    def _write(self, group):
+        """グループ内の一時ファイルを書き出してfsyncする"""
+        for tmp, _, data in group:
+            # ディレクトリの有無は、開けなかった時だけ確認する
+            try:
+                f = open(tmp, 'wb')
+            except FileNotFoundError:
+                self._makedirs(os.path.dirname(tmp))
+                f = open(tmp, 'wb')
+            with f:
+                f.write(data)
+                f.flush()
+                if self.fsync: os.fsync(f.fileno())
+        return
+
+    def _makedirs(self, path):
+        """ディレクトリを作成し、作成したものを記録する"""
+        with self._lock:
+            missing = []
+            path = os.path.normpath(path)
+            while not os.path.isdir(path):
+                missing.append(path)
+                parent = os.path.dirname(path)
+                if parent == path: break
+                path = parent
+            for path in reversed(missing):
+                os.mkdir(path)
+                self._created.append(path)
+        return
+
+    def _replace(self, groups):
+        """一時ファイルを本来のプロファイルに置き換える
+        置き換え（ディレクトリエントリの変更）も永続化する場合は、全て置き
+        換えてからディレクトリ毎に１回だけfsyncする
+        ディレクトリをfsyncできない環境（Windows）では何もしない
+        """
+        dirs = set()
+        for group in groups:
+            for tmp, profile, _ in group:
+                os.replace(tmp, profile)
+                dirs.add(os.path.dirname(profile))
+        if not self.fsync or os.name != 'posix': return
+        for path in dirs:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        return
+
+    def commit(self):
+        """全ての一時ファイルを書き出し終えてから、本来のプロファイルに
+        置き換える。書き出しに失敗した場合はrollbackして例外を送出する
+        置き換えに失敗した場合は、残った一時ファイルを消して例外を送出する
+        （置き換え済みのプロファイルは戻さない）
+        置き換えたプロファイルの数を返す
+        """
+        self._flush(True)
+        futures, self._futures = self._futures, []
+        try:
+            for future, _ in futures: future.result()
+        except:
+            self._futures = futures
+            self.rollback()
+            raise
+
+        groups = [g for _, g in futures]
+        try:
+            self._replace(groups)
+        except:
+            for group in groups:
+                for tmp, _, _ in group:
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+            raise
+        finally:
+            self._close()
+            self._created = []
+        return sum(len(g) for g in groups)
+
+    def rollback(self):
+        """commitしていない一時ファイルと、新しく作成したディレクトリを消す
+        """
+        self._group = []
+        futures, self._futures = self._futures, []
+        for future, group in futures:
+            try:
+                future.result()
+            except Exception:
+                pass
+            for tmp, _, _ in group:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        self._close()
+        for path in reversed(self._created):
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+        self._created = []
+        return
+
+    def _close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return
@@ -0,0 +1,224 @@
+# -*- encoding:utf-8 -*-
+
+import sqlite3
+from array import array
+
+from lib.core.Storage import Storage
+from lib.core.Tasktory import Tasktory
+from lib.core.Timetable import Timetable
+from lib.core.Manager import Manager
+
+class SQLiteStorage(Storage):
+    """タスクトリをSQLiteのデータベースに保存する
+    ノード、作業時間、メモをそれぞれ索引付きのテーブルに保存し、
+    put_manyは１回のトランザクションで書き込む。
+    mirror にFileStorageを渡すと、書き込んだ内容をディレクトリにも反映する
+    （エクスプローラーからタスクトリを辿れるようにする）
+    put_manyに渡したタスクトリの子は、そのタスクトリの子の全てとみなし、
+    無くなった子（削除、名前の変更）の行は部分木ごと削除する。
+    同じIDのタスクトリが別のパスにあり、そのパスが書き込むタスクトリの
+    ツリーに無ければ（付け替え）、そちらも削除する。エクスプローラーで
+    複製したタスクトリは同じIDを持つので、ツリーにあるものは削除しない。
+    （ミラーのディレクトリは削除しない）
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS nodes (
+        path TEXT PRIMARY KEY,
+        parent TEXT,
+        id BLOB NOT NULL,
+        name TEXT NOT NULL,
+        deadline INTEGER,
+        status TEXT,
+        category TEXT,
+        comments TEXT
+    );
+    CREATE INDEX IF NOT EXISTS nodes_parent ON nodes (parent);
+    CREATE INDEX IF NOT EXISTS nodes_id ON nodes (id);
+    CREATE TABLE IF NOT EXISTS times (
+        path TEXT NOT NULL,
+        start INTEGER NOT NULL,
+        sec INTEGER NOT NULL,
+        PRIMARY KEY (path, start, sec)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS memos (
+        path TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        written TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (path, seq)
+    );
+    """
+
+    def __init__(self, database, mirror=None):
+        # LoggedStorageのバックグラウンドのcompactからも使う
+        # （アクセスはLoggedStorage側で直列化する）
+        self.conn = sqlite3.connect(database, check_same_thread=False)
+        self.conn.executescript(SQLiteStorage.SCHEMA)
+        self.mirror = mirror
+        return
+
+    def close(self):
+        self.conn.close()
+        return
+
+    #==========================================================================
+    # 行 ←→ タスクトリ変換
+    #==========================================================================
+    @staticmethod
+    def _task(row, starts, secs):
+        """nodesテーブルの行と作業時間の配列からタスクトリを作成する"""
+        _, _, ID, name, deadline, status, category, comments = row
+        task = Tasktory.__new__(Tasktory)
+        task.__setstate__({'ID': int.from_bytes(ID, 'big'), 'name': name,
+            'deadline': deadline, 'status': status,
+            'timetable': Timetable.from_arrays(starts, secs),
+            'parent': None, 'children': [],
+            'category': category, 'comments': comments})
+        return task
+
+    @staticmethod
+    def _row(task):
+        """タスクトリからnodesテーブルの行を作成する"""
+        path = task.path()
+        parent = None if task.parent is None else task.parent.path()
+        return (path, parent, task.ID.to_bytes(16, 'big'), task.name,
+                task.deadline, task.status, task.category, task.comments)
+
+    #==========================================================================
+    # タスクトリ
+    #==========================================================================
+    def get_tree(self):
+        # 作業時間はパス毎に整列済みの配列にまとめる
+        times = {}
+        for path, start, sec in self.conn.execute(
+                'SELECT path, start, sec FROM times ORDER BY path, start, sec'):
+            table = times.get(path)
+            if table is None: table = times[path] = (array('q'), array('q'))
+            table[0].append(start)
+            table[1].append(sec)
+
+        # 親のパスの方が必ず先に並ぶので、パス順に繋げば良い
+        tasks = {}
+        tree = None
+        for row in self.conn.execute('SELECT * FROM nodes ORDER BY path'):
+            path, parent = row[0], row[1]
+            if parent is not None and parent not in tasks: continue
+            starts, secs = times.get(path) or (array('q'), array('q'))
+            task = tasks[path] = SQLiteStorage._task(row, starts, secs)
+            if parent is None: tree = task
+            else: tasks[parent].append(task)
+        return tree
+
+    def get(self, path):
+        row = self.conn.execute(
+                'SELECT * FROM nodes WHERE path = ?', (path,)).fetchone()
+        if row is None: return None
+        starts, secs = array('q'), array('q')
+        for start, sec in self.conn.execute('SELECT start, sec FROM times '
+                'WHERE path = ? ORDER BY start, sec', (path,)):
+            starts.append(start)
+            secs.append(sec)
+        return SQLiteStorage._task(row, starts, secs)
+
+    def put_many(self, tasks, loaded=None):
+        changed = []
+        with self.conn:
+            for task in tasks:
+                path = task.path()
+                self._prune(task, path)
+                if loaded is not None:
+                    old = loaded.get(path)
+                    if old is not None and old.ID == task.ID and\
+                            Manager.same(old, task):
+                        continue
+                self._put(task, path)
+                changed.append(task)
+
+        if self.mirror is not None: self.mirror.put_many(changed)
+        return len(changed)
+
+    def _put(self, task, path, move=True):
+        """タスクトリの行と作業時間を書き込む（トランザクション内で使用する）
+        move - 真の場合、同じIDのタスクトリが別のパスにあり、そのパスが
+               タスクトリのツリーに無ければ、部分木ごと削除する
+        """
+        row = SQLiteStorage._row(task)
+        if move:
+            root = task
+            while root.parent is not None: root = root.parent
+            for old, in self.conn.execute('SELECT path FROM nodes '
+                    'WHERE id = ? AND path != ?', (row[2], path)).fetchall():
+                if root.find(old) is None: self._delete(old)
+        self.conn.execute('INSERT OR REPLACE INTO nodes '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', row)
+        self.conn.execute('DELETE FROM times WHERE path = ?', (path,))
+        self.conn.executemany('INSERT INTO times VALUES (?, ?, ?)',
+                ((path, s, t) for s,t in task.timetable))
+        return
+
+    def _prune(self, task, path):
+        """タスクトリの子に無くなった子の行を、部分木ごと削除する"""
+        names = set(c.name for c in task.children)
+        for child, name in self.conn.execute('SELECT path, name FROM nodes '
+                'WHERE parent = ?', (path,)).fetchall():
+            if name not in names: self._delete(child)
+        return
+
+    def _delete(self, path):
+        """パスの部分木の行と作業時間を削除する"""
+        prefix = path.rstrip('/') + '/'
+        where = 'path = ? OR substr(path, 1, ?) = ?'
+        args = (path, len(prefix), prefix)
+        self.conn.execute('DELETE FROM nodes WHERE ' + where, args)
+        self.conn.execute('DELETE FROM times WHERE ' + where, args)
+        return
+
+    def import_from(self, storage):
+        """データベースが空の場合に、別の保存先（従来のディレクトリなど）の
+        ツリーとメモを１回のトランザクションで取り込む
+        ミラーには書き込まない。メモを書いた日時は引き継がない
+        同じIDのタスクトリ（複製したもの）も、それぞれのパスに取り込む
+        取り込んだタスクトリの数を返す
+        """
+        if self.conn.execute('SELECT 1 FROM nodes LIMIT 1').fetchone():
+            return 0
+        tree = storage.get_tree()
+        if tree is None: return 0
+
+        count = 0
+        with self.conn:
+            for task, path in tree.paths():
+                self._put(task, path, False)
+                self.conn.executemany('INSERT INTO memos VALUES (?, ?, ?, ?)',
+                        ((path, seq, '', text) for seq, text
+                            in enumerate(storage.get_memo(path), 1)))
+                count += 1
+        return count
+
+    def listtask(self):
+        return set(p for p, in self.conn.execute(
+            'SELECT path FROM nodes WHERE parent IS NOT NULL'))
+
+    #==========================================================================
+    # メモ
+    #==========================================================================
+    def get_memo(self, path):
+        return [t for t, in self.conn.execute(
+            'SELECT text FROM memos WHERE path = ? ORDER BY seq', (path,))]
+
+    def put_memo(self, dttm, path, text):
+        # 余計な空白行を削除する
+        text = Manager.delete_blank(text)
+
+        # 既に記載されていれば無視する
+        if text in self.get_memo(path): return False
+
+        with self.conn:
+            self.conn.execute('INSERT INTO memos '
+                    'SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? '
+                    'FROM memos WHERE path = ?',
+                    (path, dttm.strftime('%Y/%m/%d %H:%M'), text, path))
+
+        if self.mirror is not None: self.mirror.put_memo(dttm, path, text)
+        return True
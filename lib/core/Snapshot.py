@@ -0,0 +1,183 @@
+# -*- encoding:utf-8 -*-
+
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class Snapshot(object):
+    """ツリー全体の作業時間の列指向のスナップショット
+    ツリーを前順に番号付けし、次の配列（numpy.ndarray）で保持する。
+    ・ノード毎の配列 parent（親の番号、ルートは-1）、depth（深さ）、
+      size（部分木のノード数。部分木は番号 i から i + size[i] の範囲）
+    ・作業時間毎の配列 node（ノードの番号）、start（開始エポック秒）、
+      sec（作業時間（秒））。node の昇順に並ぶ
+    集計は全てこれらの配列に対するベクトル演算で行う。
+    作成後のツリーの変更は反映されない。numpy が必要。
+    snap = Snapshot(tree)
+    days, nodes, secs = snap.buckets('day')
+    """
+
+    # 期間の単位
+    UNITS = ('day', 'week', 'month')
+
+    def __init__(self, tree):
+        if np is None: raise ImportError('numpy is required')
+
+        # ノードを前順に番号付けする
+        self.nodes = list(tree)
+        number = dict(zip(map(id, self.nodes), range(len(self.nodes))))
+        parent = [number.get(id(n.parent), -1) for n in self.nodes]
+        depth = [0] * len(parent)
+        for i, p in enumerate(parent):
+            if p >= 0: depth[i] = depth[p] + 1
+        self.parent = np.array(parent, dtype=np.int64)
+        self.depth = np.array(depth, dtype=np.int64)
+
+        # 作業時間の配列を連結する（配列単位の連結なので要素毎の処理は無い）
+        starts, secs = array('q'), array('q')
+        lengths = np.zeros(len(self.nodes), dtype=np.int64)
+        for i, n in enumerate(self.nodes):
+            s, t = n.timetable.arrays()
+            starts.extend(s)
+            secs.extend(t)
+            lengths[i] = len(s)
+        self.start = np.frombuffer(starts, dtype=np.int64)
+        self.sec = np.frombuffer(secs, dtype=np.int64)
+        self.node = np.repeat(np.arange(len(self.nodes)), lengths)
+
+        # 部分木のノード数
+        self.size = self.rollup(np.ones(len(self.nodes), dtype=np.int64))
+        return
+
+    def __len__(self):
+        """作業時間の数を返す"""
+        return len(self.start)
+
+    #==========================================================================
+    # ノード
+    #==========================================================================
+    def rollup(self, values):
+        """ノード毎の値を部分木で合計した配列を返す
+        深い階層から順に、同じ深さのノードの値をまとめて親に加える
+        """
+        ret = np.array(values, copy=True)
+        for d in range(int(self.depth.max(initial=0)), 0, -1):
+            idx = np.flatnonzero(self.depth == d)
+            np.add.at(ret, self.parent[idx], ret[idx])
+        return ret
+
+    def subtree(self, index):
+        """ノード index の部分木に属する作業時間の真偽値の配列を返す"""
+        return (self.node >= index) & (self.node < index + self.size[index])
+
+    def _mask(self, start, end):
+        """start <= s < end となる作業時間の真偽値の配列を返す"""
+        mask = np.ones(len(self.start), dtype=bool)
+        if start is not None: mask &= self.start >= start
+        if end is not None: mask &= self.start < end
+        return mask
+
+    def totals(self, start=None, end=None, rollup=False):
+        """ノード毎の合計作業時間（秒）の配列を返す
+        start, end - 指定した場合は start <= s < end となる作業時間だけを
+                     合計する（ジャーナルと同じく開始で判定する）
+        rollup - 真の場合は部分木の合計を返す
+        """
+        mask = self._mask(start, end)
+        ret = np.bincount(self.node[mask], weights=self.sec[mask],
+                minlength=len(self.nodes)).astype(np.int64)
+        return self.rollup(ret) if rollup else ret
+
+    #==========================================================================
+    # 期間
+    #==========================================================================
+    @staticmethod
+    def utcoffset():
+        """ローカル時刻のUTCからの差（秒）を返す（夏時間は考慮しない）"""
+        return -time.timezone
+
+    def keys(self, unit, offset=None):
+        """作業時間毎に、開始した期間の最初の日を numpy.datetime64 の配列で
+        返す（週は月曜日から、月は１日から）
+        unit - 'day'、'week'、'month' のいずれか
+        offset - ローカル時刻のUTCからの差（秒）。省略時は utcoffset()
+        """
+        if unit not in self.UNITS: raise ValueError(unit)
+        if offset is None: offset = self.utcoffset()
+        days = (self.start + offset) // 86400
+
+        # 1970-01-01 は木曜日なので、月曜日は4日ずれる
+        if unit == 'week': days = (days - 4) // 7 * 7 + 4
+        days = days.astype('datetime64[D]')
+        if unit == 'month':
+            days = days.astype('datetime64[M]').astype('datetime64[D]')
+        return days
+
+    def buckets(self, unit, offset=None, rollup=False):
+        """期間とノード毎の合計作業時間（秒）を、(期間, ノードの番号, 秒) の
+        配列の組で期間、ノードの順に返す（作業時間の無い組は含めない）
+        作業時間は開始した期間に計上する
+        rollup - 真の場合は部分木の合計を返す（ルートは全体の合計になる）
+        """
+        days, node, sec = self._group(self.keys(unit, offset).astype(np.int64),
+                self.node, self.sec)
+        if rollup:
+            # 集計済みの組を親に付け替えながら、ルートまで集計を繰り返す
+            cols = [(days, node, sec)]
+            while True:
+                node = self.parent[node]
+                keep = node >= 0
+                if not keep.any(): break
+                days, node, sec = self._group(
+                        days[keep], node[keep], sec[keep])
+                cols.append((days, node, sec))
+            days, node, sec = self._group(*map(np.concatenate, zip(*cols)))
+        return days.astype('datetime64[D]'), node, sec
+
+    def _group(self, days, node, sec):
+        """(日, ノードの番号) 毎に秒を合計し、(日, ノードの番号, 秒) の
+        配列の組で日、ノードの順に返す
+        """
+        # (日, ノード) を１つの整数にまとめて集計する
+        n = len(self.nodes)
+        base = days.min(initial=0)
+        code, inverse = np.unique((days - base) * n + node, return_inverse=True)
+        total = np.bincount(inverse, weights=sec).astype(np.int64)
+        return code // n + base, code % n, total
+
+    def hours(self, offset=None, mask=None):
+        """時刻（0時から23時）毎の作業時間（秒）の配列を返す
+        時をまたぐ作業時間は時毎に分割して計上する
+        mask - 対象とする作業時間の真偽値の配列（subtree などで作成する）
+        """
+        if offset is None: offset = self.utcoffset()
+        start = self.start + offset
+        end = start + self.sec
+        if mask is not None: start, end = start[mask], end[mask]
+
+        # 作業時間を時の境界で分割する
+        first = start // 3600
+        count = np.maximum((end - 1) // 3600 - first + 1, 0)
+        count[end <= start] = 0
+        idx = np.repeat(np.arange(len(start)), count)
+        step = np.arange(len(idx)) - np.repeat(np.cumsum(count) - count, count)
+        hour = first[idx] + step
+        sec = np.minimum(end[idx], (hour + 1) * 3600)\
+                - np.maximum(start[idx], hour * 3600)
+        return np.bincount(hour % 24, weights=sec, minlength=24)\
+                .astype(np.int64)
+
+    def utilization(self, offset=None, mask=None):
+        """時刻毎の稼働率（時刻毎の作業時間 / 対象期間の日数 * 3600）の配列を
+        返す。対象期間は最初の作業時間の日から最後の作業時間の日まで
+        """
+        if offset is None: offset = self.utcoffset()
+        start = self.start if mask is None else self.start[mask]
+        if len(start) == 0: return np.zeros(24)
+        days = (start.max() + offset) // 86400\
+                - (start.min() + offset) // 86400 + 1
+        return self.hours(offset, mask) / (days * 3600.0)
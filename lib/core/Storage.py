@@ -0,0 +1,52 @@
+# -*- encoding:utf-8 -*-
+
+class Storage(object):
+    """タスクトリの保存先のインターフェース
+    パスは全てタスクトリのパス（ルートが'/'、Tasktory.path()の既定値と同じ）で
+    指定する。実装はFileStorage（ディレクトリ）とSQLiteStorage（SQLite）。
+    """
+
+    def get_tree(self):
+        """タスクトリツリー全体を返す。ルートが無ければNoneを返す"""
+        raise NotImplementedError()
+
+    def get(self, path):
+        """指定したパスのタスクトリ（親と子を含まない）を返す
+        無ければNoneを返す
+        """
+        raise NotImplementedError()
+
+    def put(self, task):
+        """タスクトリを保存する"""
+        self.put_many([task])
+        return
+
+    def put_many(self, tasks, loaded=None):
+        """複数のタスクトリをまとめて保存する
+        loaded - 読み込んだ時点のタスクトリの {パス: コピー} の辞書。
+                 指定した場合は、保存する項目に変更の無いタスクトリを保存しない
+        保存したタスクトリの数を返す
+        """
+        raise NotImplementedError()
+
+    def listtask(self):
+        """ルート以外の全てのタスクトリのパスの集合を返す"""
+        raise NotImplementedError()
+
+    def get_memo(self, path):
+        """指定したパスのタスクトリのメモのリストを返す"""
+        raise NotImplementedError()
+
+    def put_memo(self, dttm, path, text):
+        """指定したパスのタスクトリにメモを追記する
+        既に同じメモがあれば追記せずにFalseを返す
+        """
+        raise NotImplementedError()
+
+    def refresh(self):
+        """保存先が外部で変更された時に呼ぶ（保持している内容を破棄する）"""
+        return
+
+    def close(self):
+        """保存先を閉じる"""
+        return
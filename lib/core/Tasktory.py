@@ -1,6 +1,10 @@
 # -*- encoding:utf-8 -*-
 
-import os, uuid
+import os, uuid, weakref
+from collections import deque
+
+from lib.core.Timetable import Timetable
+from lib.core.TimeIndex import TimeIndex
 
 class Tasktory(object):
 
@@ -10,13 +14,37 @@ class Tasktory(object):
     CLOSE = 'close'
     CONST = 'const'
 
+    # 読み込んだステータス文字列を定数オブジェクトに揃えるための表
+    STATUSES = dict((s, s) for s in (OPEN, WAIT, CLOSE, CONST))
+
+    # ノード毎の__dict__を持たない
+    __slots__ = ('_ID', '_name', '_deadline', '_status', '_timetable',
+            'parent', '_children', '_category', '_comments', '_index',
+            '_rollup', '_path', '_level', '_ids', '_times', '_content',
+            '_digest', '_source', '_shadows', '__weakref__')
+
     def __init__(self, name, deadline, status=OPEN):
 
-        # タスクトリID
-        self.ID = str(uuid.uuid4())
+        # 内容のハッシュと部分木のハッシュのキャッシュ
+        # （属性の設定より先に用意しておく）
+        self._content = None
+        self._digest = None
+
+        # 親タスクトリと子タスクトリ（リスト）
+        # （属性の変更時に祖先を辿るので、属性の設定より先に用意しておく）
+        self.parent = None
+        self._children = []
+
+        # 遅延コピーの元のタスクトリと、自身を元にしている遅延コピーの弱参照
+        # のリスト（deepcopy参照）
+        self._source = None
+        self._shadows = None
+
+        # タスクトリID（UUIDの整数表現）
+        self._ID = uuid.uuid4().int
 
         # タスクトリ名（ディレクトリ／フォルダ名に使用できる文字列）
-        self.name = name
+        self._name = name
 
         # 期日（グレゴリオ序数）
         self.deadline = deadline
@@ -24,14 +52,25 @@ class Tasktory(object):
         # ステータス（ステータス用定数）
         self.status = status
 
-        # タイムテーブル（開始エポック秒と作業時間（秒）のタプルのリスト）
-        self.timetable = []
+        # タイムテーブル（開始エポック秒と作業時間（秒）の組）
+        self._timetable = None
+        self._own(Timetable())
 
-        # 親タスクトリ
-        self.parent = None
+        # 子タスクトリの名前索引（必要になるまで作成しない）
+        self._index = None
+
+        # 部分木の集計値（ノード数, 合計作業時間, 最終終了時刻）のキャッシュ
+        self._rollup = None
+
+        # フルパス（ルートとパスの組）と階層のキャッシュ
+        self._path = None
+        self._level = None
+
+        # 部分木のID索引（by_idが呼ばれるまで作成しない）
+        self._ids = None
 
-        # 子タスクトリ（リスト）
-        self.children = []
+        # 部分木の作業時間索引（time_indexが呼ばれるまで作成しない）
+        self._times = None
 
         # 種別（任意）
         self.category = None
@@ -41,6 +80,180 @@ class Tasktory(object):
 
         return
 
+    #==========================================================================
+    # 属性
+    #==========================================================================
+    @property
+    def ID(self):
+        """タスクトリID"""
+        return self._ID
+
+    @ID.setter
+    def ID(self, ID):
+        self._detach()
+
+        # 自身と祖先のID索引に新しいIDを追加する
+        # （古いIDの項目は残しておき、by_idで引かれた時に索引を作り直す。
+        #   同じIDのタスクトリが他にもあれば、作り直すとそちらが見つかる）
+        node = self
+        while node is not None:
+            if node._ids is not None: node._ids[ID] = self
+            node = node.parent
+        self._ID = ID
+        return
+
+    @property
+    def name(self):
+        """タスクトリ名"""
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        self._detach()
+
+        # 親タスクトリの名前索引を更新する
+        parent = self.parent
+        if parent is not None and parent._index is not None:
+            index = parent._index
+            if index.get(self._name) is self:
+                del index[self._name]
+                for c in parent.children:
+                    if c is not self and c._name == self._name:
+                        index[c._name] = c
+                        break
+            index.setdefault(name, self)
+        self._name = name
+        self._reset_path()
+        self._touch()
+        return
+
+    @property
+    def deadline(self):
+        """期日"""
+        return self._deadline
+
+    @deadline.setter
+    def deadline(self, deadline):
+        self._detach()
+        self._deadline = deadline
+        self._touch()
+        return
+
+    @property
+    def status(self):
+        """ステータス"""
+        return self._status
+
+    @status.setter
+    def status(self, status):
+        self._detach()
+        self._status = status
+        self._touch()
+        return
+
+    @property
+    def category(self):
+        """種別"""
+        return self._category
+
+    @category.setter
+    def category(self, category):
+        self._detach()
+        self._category = category
+        self._touch()
+        return
+
+    @property
+    def comments(self):
+        """コメント"""
+        return self._comments
+
+    @comments.setter
+    def comments(self, comments):
+        self._detach()
+        self._comments = comments
+        self._touch()
+        return
+
+    @property
+    def timetable(self):
+        """タイムテーブル
+        直接変更しても、自身のキャッシュ（集計値、ハッシュ、作業時間索引）は
+        タイムテーブルからの通知で更新される
+        """
+        return self._timetable
+
+    @timetable.setter
+    def timetable(self, table):
+        self._detach()
+        self._own(table if isinstance(table, Timetable) else Timetable(table))
+        self._invalidate(True)
+        self._drop_times()
+        return
+
+    def _own(self, table):
+        """タイムテーブルを自身のものにする
+        他のタスクトリのタイムテーブルであれば、配列を共有するものを作る
+        """
+        if table._owner is not None and table._owner is not self:
+            table = table.share()
+        old = self._timetable
+        if old is not None and old is not table and old._owner is self:
+            old._owner = None
+        table._owner = self
+        self._timetable = table
+        return
+
+    @property
+    def children(self):
+        """子タスクトリ（リスト）
+        遅延コピーの場合は、最初の参照時に元のタスクトリの子をコピーする
+        """
+        if self._source is not None: self._materialize()
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self._source = None
+        self._children = children
+        return
+
+    #==========================================================================
+    # pickle
+    #==========================================================================
+    def __getstate__(self):
+        return {'ID': self.ID, 'name': self.name, 'deadline': self.deadline,
+                'status': self.status, 'timetable': self._timetable,
+                'parent': self.parent, 'children': self.children,
+                'category': self.category, 'comments': self.comments}
+
+    def __setstate__(self, state):
+        """旧形式（__dict__を持っていた頃）のプロファイルも復元する"""
+        if isinstance(state, tuple): state = state[1]
+        ID = state['ID']
+        self._ID = uuid.UUID(ID).int if isinstance(ID, str) else ID
+        self._name = state['name']
+        self._deadline = state['deadline']
+        self._status = Tasktory.STATUSES.get(state['status'], state['status'])
+        self.parent = state['parent']
+        self._children = state['children']
+        self._source = None
+        self._shadows = None
+        self._index = None
+        self._rollup = None
+        self._path = None
+        self._level = None
+        self._ids = None
+        self._times = None
+        self._content = None
+        self._digest = None
+        table = state['timetable']
+        self._timetable = None
+        self._own(table if isinstance(table, Timetable) else Timetable(table))
+        self._category = state['category']
+        self._comments = state['comments']
+        return
+
     #==========================================================================
     # 比較／テスト
     #==========================================================================
@@ -73,56 +286,69 @@ class Tasktory(object):
     def __len__(self):
         """ツリー内の全ノード数を返す
         """
-        return 1 + sum([c.__len__() for c in self.children])
+        return self.rollup()[0]
 
     def __iter__(self):
-        """ツリー内の全タスクトリを走査する
+        """ツリー内の全タスクトリを走査する（前順）
         """
-        yield self
-        for child in self.children:
-            for c in child: yield c
+        return self.preorder()
 
     #==========================================================================
-    # 数値型エミュレート
+    # 走査メソッド
+    # 再帰を使わずに明示的なスタック（キュー）で走査する。
+    # max_depth を指定すると、自身からその深さまでのノードのみを走査する。
     #==========================================================================
-    def __add__(self, other):
-        """２つのタスクトリをマージする"""
-        if self != other:
-            raise ValueError()
-
-        # 期日はotherを優先する
-        deadline = self.deadline if other.deadline is None else other.deadline
-
-        # ステータスは新しい方を優先する
-        status = self.status if other.status is None else other.status
-
-        # 新しいタスクトリを作成する
-        # 名前はどっちでも良い
-        ret = Tasktory(self.name, deadline, status)
-
-        # IDはselfを使用する
-        ret.ID = self.ID
-
-        # 作業時間は結合する。
-        for s,t in self.timetable + other.timetable: ret.add_time(s,t)
-
-        # 親タスクトリはotherを優先する
-        ret.parent = other.parent if other.parent else self.parent
+    def preorder(self, max_depth=None):
+        """ツリー内の全タスクトリを前順に走査する
+        """
+        if max_depth is None:
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                yield node
+                stack.extend(reversed(node.children))
+            return
+
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            yield node
+            if depth < max_depth:
+                stack.extend((c, depth+1) for c in reversed(node.children))
+        return
 
-        # 子タスクトリリスト
-        _ = self.children + other.children
-        while _:
-            c = _.pop(0)
-            ret.append((c + _.pop(_.index(c))) if c in _ else c.deepcopy())
+    def postorder(self, max_depth=None):
+        """ツリー内の全タスクトリを後順に走査する
+        """
+        stack = [(self, iter(self.children))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield node
+            elif max_depth is None or len(stack) <= max_depth:
+                stack.append((child, iter(child.children)))
+        return
 
-        # 種別はotherを優先する
-        ret.category = self.category if other.category is None\
-                else other.category
+    def breadth_first(self, max_depth=None):
+        """ツリー内の全タスクトリを幅優先で走査する
+        """
+        queue = deque([(self, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            yield node
+            if max_depth is None or depth < max_depth:
+                queue.extend((c, depth+1) for c in node.children)
+        return
 
-        # コメントはotherを使用する
-        ret.comments = other.comments
+    #==========================================================================
+    # 数値型エミュレート
+    #==========================================================================
+    def __add__(self, other):
+        """２つのタスクトリをマージする"""
+        return self.merge(other)
 
-        return ret
 
     #==========================================================================
     # タスクトリ参照メソッド
@@ -130,29 +356,114 @@ class Tasktory(object):
     def get(self, name, default=None):
         """子タスクトリから名前で検索する
         """
-        children = [c for c in self.children if c.name == name]
-        return children[0] if children else default
+        if self._index is None:
+            if not self.children: return default
+            self._index = {}
+            for c in self.children: self._index.setdefault(c._name, c)
+        return self._index.get(name, default)
 
     def total_time(self):
         """合計作業時間（秒）を返す
         """
-        return sum(t for _,t in self.timetable)
+        return self._timetable.total()
 
     def timestamp(self):
         """タイムテーブルの中から最も大きい終了エポック秒を返す
         作業時間が無い場合は0を返す
         """
-        return sum(sorted(self.timetable, key=lambda t:t[0])[-1])\
-                if self.timetable else 0
+        return self._timetable.last()
+
+    def subtree_time(self):
+        """部分木全体の合計作業時間（秒）を返す
+        """
+        return self.rollup()[1]
+
+    def subtree_timestamp(self):
+        """部分木全体で最も大きい終了エポック秒を返す
+        作業時間が無い場合は0を返す
+        """
+        return self.rollup()[2]
+
+    def rollup(self):
+        """部分木の集計値（ノード数, 合計作業時間, 最終終了時刻）を返す
+        変更が無ければキャッシュを返す
+        """
+        if self._rollup is None:
+            # キャッシュの無いノードを集め、子から順に計算する
+            nodes = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                nodes.append(node)
+                stack.extend(c for c in node.children if c._rollup is None)
+            for node in reversed(nodes):
+                count = 1
+                total = node._timetable.total()
+                last = node._timetable.last()
+                for c in node.children:
+                    n, t, l = c._rollup
+                    count += n
+                    total += t
+                    last = max(last, l)
+                node._rollup = (count, total, last)
+        return self._rollup
+
+    def content_digest(self):
+        """自身の内容（名前、ステータス、期日、種別、コメント、タイムテー
+        ブル）のハッシュを返す。IDと親子関係は含まない
+        組み込みのhashを使うので、同じプロセス内の比較にだけ使用する
+        変更が無ければキャッシュを返す
+        """
+        if self._content is None:
+            self._content = hash((self._name, self._status, self._deadline,
+                self._category, self._comments, self._timetable.tobytes()))
+        return self._content
+
+    def digest(self):
+        """部分木のハッシュ（自身の内容のハッシュと、子の部分木のハッシュを
+        順に繋げたもののハッシュ）を返す
+        変更のあったノードとその祖先だけを計算し直す
+        """
+        if self._digest is None:
+            # キャッシュの無いノードを集め、子から順に計算する
+            nodes = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                nodes.append(node)
+                stack.extend(c for c in node.children if c._digest is None)
+            for node in reversed(nodes):
+                node._digest = hash((node.content_digest(),
+                    tuple(c._digest for c in node.children)))
+        return self._digest
 
     def copy(self):
-        """単一タスクトリのディープコピーを返す（親と子を含まない）
+        """単一タスクトリのコピーを返す（親と子を含まない）
+        タイムテーブルは配列をコピーせずに共有し、どちらかが変更する時に
+        初めてコピーする（コピーオンライト）。元のタイムテーブルも今まで
+        通り変更できる
         """
-        task = Tasktory(self.name, self.deadline, self.status)
-        task.ID = self.ID
-        task.timetable = [(s,t) for s,t in self.timetable]
-        task.category = self.category
-        task.comments = self.comments
+        task = Tasktory.__new__(Tasktory)
+        task._ID = self._ID
+        task._name = self._name
+        task._deadline = self._deadline
+        task._status = self._status
+        task._timetable = self._timetable.share()
+        task._timetable._owner = task
+        task.parent = None
+        task._children = []
+        task._source = None
+        task._shadows = None
+        task._index = None
+        task._rollup = None
+        task._path = None
+        task._level = None
+        task._ids = None
+        task._times = None
+        task._category = self._category
+        task._comments = self._comments
+        task._content = self._content
+        task._digest = None
         return task
 
     #==========================================================================
@@ -163,16 +474,100 @@ class Tasktory(object):
         start - 作業開始時刻をエポック秒で指定する
         sec  - 作業時間を秒で指定する
         """
-        if (start, sec) not in self.timetable:
-            self.timetable.append((start, sec))
+        self._timetable.add(start, sec)
         return self
 
+    def erase_time(self, start, end):
+        """開始エポック秒が start <= s < end となる作業時間を削除する
+        """
+        self._timetable.remove_between(start, end)
+        return self
+
+    def remove_time(self, start, sec):
+        """作業時間を１件削除する
+        """
+        self._timetable.remove(start, sec)
+        return self
+
+    def _time_changed(self, start=None, sec=None):
+        """タイムテーブルの変更の通知を受け、キャッシュを更新する
+        start, sec - 追加した作業時間（削除した場合は省略する）
+        """
+        self._invalidate(True)
+        self._index_time(start, sec)
+        return
+
+    def _index_time(self, start=None, sec=None):
+        """自身と祖先の作業時間索引に、作業時間の追加を反映する
+        引数を省略した場合は、作業時間の削除を反映する
+        """
+        node = self
+        while node is not None:
+            if node._times is not None:
+                if start is None: node._times.remove()
+                else: node._times.add(self, int(start), int(sec))
+            node = node.parent
+        return
+
+    def _drop_times(self):
+        """自身と祖先の作業時間索引を破棄する（次の参照時に作り直す）"""
+        node = self
+        while node is not None:
+            node._times = None
+            node = node.parent
+        return
+
     def append(self, child):
         """子タスクトリリストにタスクトリを加える
         子タスクトリの親タスクトリに自身をセットする
         """
+        self._detach()
+        child._detach()
         self.children.append(child)
         child.parent = self
+        child._reset_path()
+        if self._index is not None: self._index.setdefault(child._name, child)
+        self._invalidate()
+
+        # 自身と祖先のID索引に子タスクトリの部分木を加える
+        # （作業時間索引は破棄する）
+        node = self
+        while node is not None:
+            if node._ids is not None:
+                if child._ids is not None: node._ids.update(child._ids)
+                else: node._ids.update((n.ID, n) for n in child)
+            node._times = None
+            node = node.parent
+        return self
+
+    def remove(self, child):
+        """子タスクトリリストからタスクトリを取り除く
+        取り除いたタスクトリの親はNoneになる
+        （同名の兄弟があっても取り違えないように、同一性で探す）
+        """
+        self._detach()
+        for i, c in enumerate(self.children):
+            if c is child: break
+        else:
+            raise ValueError('not a child')
+        del self.children[i]
+        if self._index is not None and self._index.get(child._name) is child:
+            del self._index[child._name]
+            for c in self.children:
+                if c._name == child._name:
+                    self._index[c._name] = c
+                    break
+        self._invalidate()
+
+        # 自身と祖先のID索引と作業時間索引を破棄する
+        node = self
+        while node is not None:
+            node._ids = None
+            node._times = None
+            node = node.parent
+
+        child.parent = None
+        child._reset_path()
         return self
 
     def wash(self, other):
@@ -180,18 +575,162 @@ class Tasktory(object):
         """
         # otherはTasktoryでなければならない
         if not isinstance(other, Tasktory): raise TypeError()
+        self._detach()
+
+        # IDと子タスクトリが変わるので、自身と祖先のID索引と作業時間索引を
+        # 破棄する
+        node = self
+        while node is not None:
+            node._ids = None
+            node._times = None
+            node = node.parent
 
         self.ID = other.ID
         self.name = other.name
         self.deadline = other.deadline
-        self.timetable = [(s,t) for s,t in other.timetable]
+        self.timetable = other.timetable.share()
         self.parent = other.parent
         self.children = [c for c in other.children]
+        self._index = None
+        self._reset_path()
         self.status = other.status
         self.category = other.category
         self.comments = other.comments
         return self
 
+    def merge(self, other, share=False):
+        """２つのタスクトリをマージしたタスクトリを返す
+        子タスクトリは名前の辞書で対応付けるため、兄弟の数に対して線形時間で
+        済む。
+        share - 真の場合、対応する相手の無い部分木をコピーせずに新しいツリーへ
+                移す（selfとotherのツリーは壊れるため、使い捨てのツリー同士を
+                マージする場合に使用する）
+        """
+        if self._name != other._name:
+            raise ValueError()
+
+        # 期日はotherを優先する
+        deadline = self.deadline if other.deadline is None else other.deadline
+
+        # ステータスは新しい方を優先する
+        status = self.status if other.status is None else other.status
+
+        # 新しいタスクトリを作成する
+        # 名前はどっちでも良い
+        ret = Tasktory(self._name, deadline, status)
+
+        # IDはselfを使用する
+        ret._ID = self._ID
+
+        # 作業時間は整列済みのまま併合する
+        ret._own(Timetable.merge(self._timetable, other._timetable))
+
+        # 親タスクトリはotherを優先する
+        ret.parent = other.parent if other.parent else self.parent
+
+        # 子タスクトリリスト
+        # 先頭から順に、同じ名前の次のタスクトリと対にしてマージする
+        children = self.children + other.children
+        pending = {}
+        for i, c in enumerate(children):
+            pending.setdefault(c._name, deque()).append(i)
+        for i, c in enumerate(children):
+            queue = pending[c._name]
+            if not queue or queue[0] != i: continue
+            queue.popleft()
+            if queue:
+                ret.append(c.merge(children[queue.popleft()], share))
+            else:
+                ret.append(c if share else c.deepcopy())
+
+        # 種別はotherを優先する
+        ret.category = self.category if other.category is None\
+                else other.category
+
+        # コメントはotherを使用する
+        ret.comments = other.comments
+
+        return ret
+
+    def _invalidate(self, content=False):
+        """自身と祖先の集計値と部分木のハッシュのキャッシュを破棄する
+        キャッシュの無いノードの祖先にはキャッシュが無いので、そこで止める
+        content - 真の場合、自身の内容のハッシュも破棄する
+        """
+        if content: self._content = None
+        node = self
+        while node is not None and\
+                (node._rollup is not None or node._digest is not None):
+            node._rollup = None
+            node._digest = None
+            node = node.parent
+        return
+
+    def _touch(self):
+        """自身の内容のハッシュと、自身と祖先の部分木のハッシュを破棄する
+        （集計値に影響しない属性の変更時に使用する）
+        """
+        self._content = None
+        node = self
+        while node is not None and node._digest is not None:
+            node._digest = None
+            node = node.parent
+        return
+
+    def _detach(self):
+        """自身か祖先を元にしている遅延コピーを、変更前の状態で実体化する
+        ルートから順に、遅延コピーの子を実体化して自身のコピーまで辿る
+        （遅延コピーが無ければ祖先を辿るだけで済む）
+        """
+        nodes = []
+        node = self
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        for node in reversed(nodes):
+            shadows = node._shadows
+            if shadows is None: continue
+            node._shadows = None
+            for ref in shadows:
+                task = ref()
+                if task is not None and task._source is node:
+                    task._materialize()
+        return
+
+    def _materialize(self):
+        """遅延コピーの子を、元のタスクトリの子の遅延コピーで作成する"""
+        source = self._source
+        self._source = None
+        children = []
+        for c in source.children:
+            child = c._shadow()
+            child.parent = self
+            children.append(child)
+        self._children = children
+        return
+
+    def _shadow(self):
+        """自身の遅延コピー（子は最初の参照時にコピーする）を返す
+        部分木の集計値とハッシュは元と同じなので、キャッシュを引き継ぐ
+        """
+        task = self.copy()
+        task._rollup = self._rollup
+        task._digest = self._digest
+        if self._source is None and not self._children: return task
+
+        # 元が変更される前に実体化できるよう、元に弱参照を登録する
+        # （実体化済みと回収済みのものは、増えてきたら取り除く）
+        task._source = self
+        shadows = self._shadows
+        if shadows is None:
+            self._shadows = [weakref.ref(task)]
+            return task
+        if len(shadows) >= 8:
+            shadows[:] = [r for r in shadows
+                    if r() is not None and r()._source is self]
+        shadows.append(weakref.ref(task))
+        return task
+
     #==========================================================================
     # ツリー参照メソッド
     #==========================================================================
@@ -200,55 +739,161 @@ class Tasktory(object):
         例）tree.find('/Project/LargeTask/SmallTask/step1')
         """
         if isinstance(path, str): path = path.rstrip('/').split('/')
-        if self.name != path[0]: return None
-        if len(path) == 1: return self
-        for child in self.children:
-            ret = child.find(path[1:])
-            if ret is not None: return ret
-        return None
+        if self._name != path[0]: return None
+        node = self
+        for name in path[1:]:
+            node = node.get(name)
+            if node is None: return None
+        return node
+
+    def by_id(self, ID, default=None):
+        """ツリー全体からIDで検索する
+        索引は最初の呼び出しで作成し、以降はappendとIDの変更に合わせて
+        更新する
+        例）tree.by_id(SPECIFIC_ID)
+        """
+        if self._ids is None:
+            self._ids = dict((n.ID, n) for n in self)
+        node = self._ids.get(ID)
+
+        # 古いIDで引かれた場合は作り直す（ID参照）
+        if node is not None and node._ID != ID:
+            self._ids = dict((n.ID, n) for n in self)
+            node = self._ids.get(ID)
+
+        return default if node is None else node
+
+    def time_index(self):
+        """部分木の作業時間索引（TimeIndex）を返す
+        索引は最初の呼び出しで作成し、以降はadd_time、remove_timeに合わせて
+        更新する（それ以外の変更では破棄して作り直す）
+        例）tree.time_index().nodes(start, end)
+        """
+        if self._times is None: self._times = TimeIndex(self)
+        return self._times
 
     def search(self, test):
         """ツリー全体から条件に一致するタスクトリ全てを返す
         例）期日が一定未満かつCLOSEでないもの
         tree.search(lambda t:t.deadline < DEADLINE and t.status != CLOSE)
-        例）特定のIDのタスクトリ
-        tree.search(lambda t:t.ID == SPECIFIC_ID)[0]
         """
-        ret = [self] if test(self) else []
-        for child in self.children: ret += child.search(test)
-        return ret
+        return [node for node in self if test(node)]
 
     def path(self, root='/'):
         """タスクトリのフルパスを返す
+        直前に指定されたルートと同じであればキャッシュを返す
         """
-        return os.path.join(self.parent.path(root) if self.parent
-                else root, self.name).replace('\\', '/')
+        # キャッシュのある祖先まで遡り、そこから順にパスを作成する
+        nodes = []
+        node = self
+        while node is not None and\
+                (node._path is None or node._path[0] != root):
+            nodes.append(node)
+            node = node.parent
+        path = root if node is None else node._path[1]
+        for node in reversed(nodes):
+            path = os.path.join(path, node._name).replace('\\', '/')
+            node._path = (root, path)
+        return self._path[1]
+
+    def paths(self, root='/'):
+        """ツリー内の全タスクトリとそのフルパスの組を前順に返す
+        各パスは親のパスに名前を１回結合するだけで作成する
+        """
+        stack = [(self, self.path(root))]
+        while stack:
+            node, path = stack.pop()
+            yield node, path
+            for child in reversed(node.children):
+                child_path = os.path.join(path, child._name).replace('\\', '/')
+                child._path = (root, child_path)
+                stack.append((child, child_path))
+        return
+
+    def fold(self, func):
+        """部分木の各タスクトリについて、子の結果から自身の結果を求める
+        後順に１回だけ走査し、{id(タスクトリ): 結果} の辞書を返す
+        func : func(タスクトリ, 子の結果のリスト) で結果を返す関数
+        """
+        ret = {}
+        for node in self.postorder():
+            ret[id(node)] = func(node, [ret[id(c)] for c in node.children])
+        return ret
+
+    @staticmethod
+    def max_deadline(node, deadlines):
+        """部分木で設定されている期日の最大値を返す（foldで使用する）
+        設定されている期日が無い場合はNoneを返す
+        """
+        deadlines = [d for d in deadlines if d is not None]
+        if node._deadline is not None: deadlines.append(node._deadline)
+        return max(deadlines, default=None)
 
     def level(self):
         """タスクトリの階層を返す
         """
-        return self.parent.level() + 1 if self.parent else 0
+        nodes = []
+        node = self
+        while node is not None and node._level is None:
+            nodes.append(node)
+            node = node.parent
+        level = -1 if node is None else node._level
+        for node in reversed(nodes):
+            level += 1
+            node._level = level
+        return self._level
+
+    def _reset_path(self):
+        """部分木のフルパスと階層のキャッシュを破棄する
+        キャッシュの無いノードの子孫にはキャッシュが無いので、そこで止める
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._path is None and node._level is None: continue
+            node._path = node._level = None
+            stack.extend(node.children)
+        return
 
     def deepcopy(self):
         """タスクトリのディープコピーを返す
+        ノードは全てをすぐにはコピーせず、子は最初の参照時に元の子の遅延
+        コピーで作成する（参照されなかった部分木は元と共有したままになる）。
+        元のツリーを変更する時は、その前に変更するノードまでの経路を実体化
+        するので、コピーはコピーした時点の内容のまま変わらない。
+        タイムテーブルはcopyと同様に共有し、変更時にコピーする。部分木の
+        集計値とハッシュは元のツリーと同じなので、キャッシュもそのまま
+        引き継ぐ（変更の無い部分木の比較では子を参照しない）。子孫の親は
+        コピーしたノードになる。ルートの親は元のままとする。
         """
-        task = Tasktory(self.name, self.deadline, self.status)
-        task.ID = self.ID
-        task.timetable = [(s,t) for s,t in self.timetable]
-        task.parent = self.parent
-        task.children = [c.deepcopy() for c in self.children]
-        task.category = self.category
-        task.comments = self.comments
-        return task
+        ret = self._shadow()
+        ret.parent = self.parent
+        return ret
+
+    def fill_defaults(self):
+        """部分木の未設定の項目を補完する
+        期日 : 部分木で設定されている期日の最大値（foldで１回だけ求める）
+        ステータス : OPEN
+        コメント : 空文字列
+        """
+        deadlines = self.fold(Tasktory.max_deadline)
+        for node in self:
+            if node._deadline is None: node.deadline = deadlines[id(node)]
+            if node._status is None: node.status = Tasktory.OPEN
+            if node._comments is None: node.comments = ''
+        return self
 
     def clip(self, test=lambda t:t.status!=Tasktory.CLOSE):
         """条件に一致するノードと、そのノードへの経路となるノードのみをコピーし
         て返す。
         test : 条件関数。引数としてタスクトリを受け取ってbool値を返す
         """
-        children = [c.clip(test) for c in self.children]
-        if test(self) or any(children):
-            task = self.copy()
-            [task.append(c) for c in children if c is not None]
-            return task
-        return None
+        clipped = {}
+        for node in self.postorder():
+            children = [clipped.pop(id(c)) for c in node.children
+                    if id(c) in clipped]
+            if test(node) or children:
+                task = node.copy()
+                [task.append(c) for c in children]
+                clipped[id(node)] = task
+        return clipped.get(id(self))
@@ -0,0 +1,83 @@
+# -*- encoding:utf-8 -*-
+
+class TasktoryView(object):
+    """タスクトリツリーのビュー
+    元のツリーをコピーせずに、条件に一致するノードと、そのノードへの経路と
+    なるノードだけを見せる（Tasktory.clipと同じノードが見える）。
+    属性の参照は元のタスクトリに委譲する。キーワード引数で渡した関数は、
+    元のタスクトリを引数に呼び出される計算属性になる。
+    view = TasktoryView(tree, lambda t:t.status != CLOSE,
+            rest_days=lambda t:t.deadline - today)
+    for node in view: print(node.level(), node.name, node.rest_days)
+    """
+
+    __slots__ = ('_node', '_level', '_context')
+
+    def __init__(self, tree, test=None, **attrs):
+        self._node = tree
+        self._level = 0
+
+        # 見えるノードのid集合（条件が無ければ全ノードが見える）
+        visible = None
+        if test is not None:
+            found = tree.fold(lambda n, found:bool(test(n)) or any(found))
+            visible = set(k for k, v in found.items() if v)
+
+        self._context = (visible, attrs)
+        return
+
+    @staticmethod
+    def _wrap(node, level, context):
+        view = TasktoryView.__new__(TasktoryView)
+        view._node = node
+        view._level = level
+        view._context = context
+        return view
+
+    def _visible(self, node):
+        visible = self._context[0]
+        return visible is None or id(node) in visible
+
+    #==========================================================================
+    # 属性
+    #==========================================================================
+    def __getattr__(self, name):
+        attrs = self._context[1]
+        if name in attrs: return attrs[name](self._node)
+        return getattr(self._node, name)
+
+    @property
+    def tasktory(self):
+        """元のタスクトリ"""
+        return self._node
+
+    @property
+    def children(self):
+        """見える子タスクトリのビューのリスト"""
+        level = self._level + 1
+        return [TasktoryView._wrap(c, level, self._context)
+                for c in self._node.children if self._visible(c)]
+
+    def level(self):
+        """ビューのルートからの階層を返す"""
+        return self._level
+
+    #==========================================================================
+    # コンテナエミュレート
+    #==========================================================================
+    def __bool__(self):
+        """ビューのルートが見えるかどうかを返す"""
+        return self._visible(self._node)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __iter__(self):
+        """見えるノードのビューを前順に走査する"""
+        if not self: return
+        stack = [self]
+        while stack:
+            view = stack.pop()
+            yield view
+            stack.extend(reversed(view.children))
+        return
@@ -0,0 +1,156 @@
+# -*- encoding:utf-8 -*-
+
+from array import array
+from bisect import bisect_left
+
+class TimeIndex(object):
+    """ツリー全体の作業時間の索引
+    作業時間を持つタスクトリを、作業期間（最初の開始エポック秒から最後の
+    終了エポック秒まで）の開始順に並べ、最後の終了エポック秒の最大値を
+    セグメント木で保持する。期間の問い合わせは、開始が期間の終わりより前で
+    終了が期間の始めより後のタスクトリだけをセグメント木で辿って候補とし、
+    候補のタイムテーブルを二分探索して確かめる。索引の大きさは作業時間の数
+    ではなくタスクトリの数に比例する。
+    作業期間が広がる変更（add_time）は索引に反映し、狭まる変更は反映しない
+    （候補が多くなるだけで、結果は候補のタイムテーブルで確かめる）。
+    通常は Tasktory.time_index で作成する。
+    index = tree.time_index()
+    for node, sec in index.seconds(start, end): print(node.path(), sec)
+    """
+
+    def __init__(self, tree):
+        # {id(タスクトリ): 前順の番号}（結果を前順に並べるために使用する）
+        nodes = list(tree)
+        self._order = dict(zip(map(id, nodes), range(len(nodes))))
+
+        spans = [(n.timetable.first(), n.timetable.last(), n)
+                for n in nodes if n.timetable]
+        spans.sort(key=lambda a:a[0])
+
+        # 作業期間の開始の配列と、対応するタスクトリのリスト
+        self._firsts = array('q', [f for f, _, _ in spans])
+        self._nodes = [n for _, _, n in spans]
+        self._slots = dict(zip(map(id, self._nodes), range(len(spans))))
+
+        # 作業期間の終了の最大値のセグメント木（葉は self._size から並ぶ）
+        size = 1
+        while size < len(spans): size *= 2
+        self._size = size
+        ends = [l for _, l, _ in spans]
+        tree = [-1] * size + ends + [-1] * (size - len(ends))
+        for i in range(size - 1, 0, -1):
+            a, b = tree[2*i], tree[2*i+1]
+            tree[i] = a if a > b else b
+        self._max = array('q', tree)
+
+        # 作業期間の開始が早まったタスクトリ（常に候補とする）
+        self._extra = []
+
+        # 問い合わせ結果（idの集合）のキャッシュ
+        self._memo = {}
+        return
+
+    def __len__(self):
+        """索引にあるタスクトリの数を返す"""
+        return len(self._nodes) + len(self._extra)
+
+    #==========================================================================
+    # 更新
+    #==========================================================================
+    def add(self, node, start, sec):
+        """作業時間の追加を反映する"""
+        self._memo.clear()
+        i = self._slots.get(id(node))
+        if i is None or start < self._firsts[i]:
+            if id(node) not in self._order:
+                self._order[id(node)] = len(self._order)
+            if all(n is not node for n in self._extra):
+                self._extra.append(node)
+            return
+
+        # 作業期間の終了が延びた分をセグメント木に反映する
+        i += self._size
+        last = start + sec
+        while i and self._max[i] < last:
+            self._max[i] = last
+            i //= 2
+        return
+
+    def remove(self):
+        """作業時間の削除を反映する（キャッシュだけを破棄する）"""
+        self._memo.clear()
+        return
+
+    #==========================================================================
+    # 問い合わせ
+    #==========================================================================
+    def _candidates(self, start, end):
+        """作業期間が s < end かつ s + t >= start となり得るタスクトリを返す
+        """
+        j = bisect_left(self._firsts, end)
+        found = []
+        stack = [(1, 0, self._size)]
+        while stack:
+            i, lo, hi = stack.pop()
+            if lo >= j or self._max[i] < start: continue
+            if hi - lo == 1:
+                found.append(self._nodes[lo])
+                continue
+            mid = (lo + hi) // 2
+            stack.append((2*i+1, mid, hi))
+            stack.append((2*i, lo, mid))
+        if self._extra:
+            seen = set(map(id, found))
+            found.extend(n for n in self._extra if id(n) not in seen)
+        return found
+
+    def _sorted(self, nodes):
+        """タスクトリのリストを前順に並べる"""
+        return sorted(nodes, key=lambda n:self._order[id(n)])
+
+    def entries(self, start, end, started=False):
+        """条件に一致する (タスクトリ, 開始, 作業時間) のリストを開始順に返す
+        started - 真の場合は start <= s < end、偽の場合は
+                  s < end かつ s + t >= start となる作業時間
+                  （Timetable.between、Timetable.overlapping と同じ条件）
+        """
+        ret = []
+        for node in self._candidates(start, end):
+            items = node.timetable.between(start, end) if started\
+                    else node.timetable.overlapping(start, end)
+            ret.extend((node, s, t) for s, t in items)
+        ret.sort(key=lambda e:(e[1], e[2], self._order[id(e[0])]))
+        return ret
+
+    def nodes(self, start, end, started=False):
+        """条件に一致する作業時間を持つタスクトリのリストを前順に返す
+        条件は entries と同じ
+        """
+        if started:
+            test = lambda n:n.timetable.between(start, end)
+        else:
+            test = lambda n:n.timetable.overlapping(start, end)
+        return self._sorted(n for n in self._candidates(start, end) if test(n))
+
+    def ids(self, start, end, started=False):
+        """条件に一致する作業時間を持つタスクトリのidの集合を返す
+        （ノード毎に判定する場合に使用する。結果はキャッシュする）
+        """
+        key = (start, end, started)
+        ret = self._memo.get(key)
+        if ret is None:
+            ret = self._memo[key] = frozenset(
+                    id(n) for n in self.nodes(start, end, started))
+        return ret
+
+    def seconds(self, start, end):
+        """期間 [start, end) に含まれる作業時間（秒）を、タスクトリ毎に
+        (タスクトリ, 秒) のリストで前順に返す（期間外の部分は含めない）
+        """
+        ret = []
+        for node in self._candidates(start, end):
+            sec = sum(min(s + t, end) - max(s, start)
+                    for s, t in node.timetable.overlapping(start, end))
+            if sec > 0: ret.append((node, sec))
+        ret.sort(key=lambda a:self._order[id(a[0])])
+        return ret
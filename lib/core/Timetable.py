@@ -0,0 +1,340 @@
+# -*- encoding:utf-8 -*-
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import add, lt
+
+class Timetable(object):
+    """タイムテーブル
+    開始エポック秒と作業時間（秒）の組を、タプルのリストではなく
+    64bit整数の配列２本（開始エポック秒、作業時間）で保持する。
+    要素は常に (開始エポック秒, 作業時間) の昇順に並び、重複を持たない。
+    走査すると (開始エポック秒, 作業時間) のタプルを返す。
+    ※ 値は整数秒として保持する
+    shareで作成したタイムテーブルは、元と配列を共有する。どちらも変更できる
+    が、変更する側が変更の直前に配列をコピーする（コピーオンライト）。
+    タスクトリのタイムテーブルを直接変更した場合も、変更メソッドが所有する
+    タスクトリ（_owner）に通知し、タスクトリのキャッシュ（集計値、ハッシュ、
+    作業時間索引）を更新させる。
+    """
+
+    __slots__ = ('_starts', '_secs', '_last', '_longest', '_total', '_shared',
+            '_owner')
+
+    def __init__(self, table=()):
+        self._starts = array('q')
+        self._secs = array('q')
+        for s,t in sorted(set((int(s), int(t)) for s,t in table)):
+            self._starts.append(s)
+            self._secs.append(t)
+        self._shared = False
+        self._owner = None
+        self._update()
+        return
+
+    @staticmethod
+    def from_arrays(starts, secs, stats=None, check=False):
+        """整列済みで重複の無い開始エポック秒と作業時間の配列から作成する
+        配列はコピーせずにそのまま使用する
+        stats - statsで得た集計値。指定した場合は計算し直さない
+        check - 真の場合は配列が整列済みで重複が無い事を確かめ、そうでなけ
+                れば整列し直したものを返す（外部から読み込んだ配列に使用する）
+        """
+        if check and not Timetable._ordered(starts, secs):
+            return Timetable(zip(starts, secs))
+        ret = Timetable.__new__(Timetable)
+        ret._starts, ret._secs = starts, secs
+        ret._shared = False
+        ret._owner = None
+        if stats is None: ret._update()
+        else: ret._last, ret._longest, ret._total = stats
+        return ret
+
+    @staticmethod
+    def _ordered(starts, secs):
+        """(開始エポック秒, 作業時間) の組が昇順に並び、重複が無いかを返す"""
+        if len(starts) != len(secs): raise ValueError('length mismatch')
+        # 開始エポック秒が重ならない普通の場合は、タプルを作らずに確かめる
+        if all(map(lt, starts, starts[1:])): return True
+        pairs = list(zip(starts, secs))
+        return all(map(lt, pairs, pairs[1:]))
+
+    def _update(self):
+        """集計値（最終終了時刻、最長作業時間、合計作業時間）を計算し直す"""
+        self._last = max(map(add, self._starts, self._secs), default=0)
+        self._longest = max(self._secs) if self._secs else 0
+        self._total = sum(self._secs)
+        return
+
+    #==========================================================================
+    # 比較／テスト
+    #==========================================================================
+    def __eq__(self, other):
+        if isinstance(other, Timetable):
+            return self._starts == other._starts and self._secs == other._secs
+        try:
+            return list(self) == [(s,t) for s,t in other]
+        except (TypeError, ValueError):
+            return NotImplemented
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    def __bool__(self):
+        return len(self._starts) > 0
+
+    def tobytes(self):
+        """開始エポック秒の配列と作業時間の配列を繋げたバイト列を返す
+        （ハッシュの計算用。バイト順は実行環境のもの）
+        """
+        return self._starts.tobytes() + self._secs.tobytes()
+
+    def arrays(self):
+        """開始エポック秒の配列と作業時間の配列の組を返す
+        （まとめて連結する場合に使用する。コピーしないので変更しない事）
+        """
+        return self._starts, self._secs
+
+    #==========================================================================
+    # コンテナエミュレート
+    #==========================================================================
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return zip(self._starts, self._secs)
+
+    def __getitem__(self, index):
+        return (self._starts[index], self._secs[index])
+
+    def __contains__(self, item):
+        s, t = item
+        i = bisect_left(self._starts, s)
+        j = bisect_right(self._starts, s, i)
+        return t in self._secs[i:j]
+
+    def __iadd__(self, table):
+        for s,t in table: self.add(s, t)
+        return self
+
+    def __repr__(self):
+        return 'Timetable({})'.format(list(self))
+
+    #==========================================================================
+    # pickle
+    #==========================================================================
+    def __getstate__(self):
+        # 配列はリトルエンディアンのバイト列のまま、集計値と共に保存する
+        # （読み込み時に要素毎の数値を作らず、集計値も計算し直さない）
+        starts, secs = self._starts, self._secs
+        if sys.byteorder != 'little':
+            starts, secs = array('q', starts), array('q', secs)
+            starts.byteswap()
+            secs.byteswap()
+        return (starts.tobytes(), secs.tobytes(),
+                self._last, self._longest, self._total)
+
+    def __setstate__(self, state):
+        self._shared = False
+        self._owner = None
+        if len(state) == 2:
+            # 整数のリストか配列で保存していた形式
+            starts, secs = state
+            self._starts, self._secs = array('q', starts), array('q', secs)
+            self._update()
+            return
+        starts, secs, self._last, self._longest, self._total = state
+        self._starts, self._secs = array('q'), array('q')
+        self._starts.frombytes(starts)
+        self._secs.frombytes(secs)
+        if sys.byteorder != 'little':
+            self._starts.byteswap()
+            self._secs.byteswap()
+        return
+
+    #==========================================================================
+    # 参照メソッド
+    #==========================================================================
+    def first(self):
+        """最も小さい開始エポック秒を返す。作業時間が無い場合は0を返す"""
+        return self._starts[0] if self._starts else 0
+
+    def last(self):
+        """最も大きい終了エポック秒を返す。作業時間が無い場合は0を返す"""
+        return self._last
+
+    def total(self):
+        """合計作業時間（秒）を返す"""
+        return self._total
+
+    def stats(self):
+        """集計値（最終終了時刻、最長作業時間、合計作業時間）を返す"""
+        return (self._last, self._longest, self._total)
+
+    def shared(self):
+        """配列を他のタイムテーブルと共有しているかどうかを返す"""
+        return self._shared
+
+    def _span(self, start, end):
+        """開始エポック秒が start <= s < end となる要素の添字範囲を返す
+        end が None の場合は上限なしとする
+        """
+        i = bisect_left(self._starts, start)
+        j = len(self._starts) if end is None\
+                else bisect_left(self._starts, end, i)
+        return i, j
+
+    def between(self, start, end=None):
+        """開始エポック秒が start <= s < end となる作業時間のリストを返す
+        end が None の場合は上限なしとする
+        """
+        i, j = self._span(start, end)
+        return list(zip(self._starts[i:j], self._secs[i:j]))
+
+    def overlapping(self, start, end):
+        """s < end かつ s + t >= start となる作業時間のリストを返す"""
+        i = bisect_left(self._starts, start - self._longest)
+        j = bisect_left(self._starts, end, i)
+        return [(s,t) for s,t in zip(self._starts[i:j], self._secs[i:j])
+                if s + t >= start]
+
+    #==========================================================================
+    # 変更メソッド
+    #==========================================================================
+    def share(self):
+        """配列を共有するタイムテーブルを返す（配列はコピーしない）
+        以降は自身と返したもののどちらも、変更する時に配列をコピーする
+        """
+        ret = Timetable.__new__(Timetable)
+        ret._starts, ret._secs = self._starts, self._secs
+        ret._last, ret._longest, ret._total =\
+                self._last, self._longest, self._total
+        ret._shared = self._shared = True
+        ret._owner = None
+        return ret
+
+    def _unshare(self):
+        """変更する直前の準備をする
+        所有するタスクトリがあれば、その遅延コピーを変更前の状態で実体化
+        させ、配列を共有していれば自身用にコピーする
+        """
+        if self._owner is not None: self._owner._detach()
+        if self._shared:
+            self._starts = array('q', self._starts)
+            self._secs = array('q', self._secs)
+            self._shared = False
+        return
+
+    def _changed(self, start=None, sec=None):
+        """所有するタスクトリがあれば、変更を通知する
+        start, sec - 追加した作業時間（削除した場合は省略する）
+        """
+        if self._owner is not None: self._owner._time_changed(start, sec)
+        return
+
+    def add(self, start, sec):
+        """作業時間を追加する。既にあれば何もしない
+        追加した場合はTrue、既にあった場合はFalseを返す
+        """
+        start, sec = int(start), int(sec)
+        i = bisect_left(self._starts, start)
+        j = bisect_right(self._starts, start, i)
+        k = i + bisect_left(self._secs[i:j], sec)
+        if k < j and self._secs[k] == sec: return False
+        self._unshare()
+        self._starts.insert(k, start)
+        self._secs.insert(k, sec)
+        self._last = max(self._last, start + sec)
+        self._longest = max(self._longest, sec)
+        self._total += sec
+        self._changed(start, sec)
+        return True
+
+    def remove(self, start, sec):
+        """作業時間を削除する。無ければ何もしない
+        削除した場合はTrue、無かった場合はFalseを返す
+        """
+        start, sec = int(start), int(sec)
+        i = bisect_left(self._starts, start)
+        j = bisect_right(self._starts, start, i)
+        k = i + bisect_left(self._secs[i:j], sec)
+        if k == j or self._secs[k] != sec: return False
+        self._unshare()
+        del self._starts[k]
+        del self._secs[k]
+        self._update()
+        self._changed()
+        return True
+
+    def append(self, item):
+        """リスト互換の追加メソッド"""
+        self.add(*item)
+        return
+
+    def remove_between(self, start, end=None):
+        """開始エポック秒が start <= s < end となる作業時間を削除する
+        削除した件数を返す
+        """
+        i, j = self._span(start, end)
+        if i < j:
+            self._unshare()
+            del self._starts[i:j]
+            del self._secs[i:j]
+            self._update()
+            self._changed()
+        return j - i
+
+    @staticmethod
+    def merge(table1, table2):
+        """２つのタイムテーブルを併合した新しいタイムテーブルを返す
+        どちらも整列済みなので、先頭から順に比べるだけで済む
+        片方が空の場合は、もう片方と配列を共有する
+        """
+        if not table2: return table1.share()
+        if not table1: return table2.share()
+
+        a = list(zip(table1._starts, table1._secs))
+        b = list(zip(table2._starts, table2._secs))
+
+        # 重なりが無ければ連結するだけで良い
+        if a[-1] < b[0]:
+            ret = table1.copy()
+            ret._starts.extend(table2._starts)
+            ret._secs.extend(table2._secs)
+        else:
+            ret = Timetable.__new__(Timetable)
+            starts, secs = array('q'), array('q')
+            i = j = 0
+            while i < len(a) and j < len(b):
+                if a[i] < b[j]:
+                    item = a[i]; i += 1
+                elif b[j] < a[i]:
+                    item = b[j]; j += 1
+                else:
+                    item = a[i]; i += 1; j += 1
+                starts.append(item[0])
+                secs.append(item[1])
+            for s,t in a[i:] + b[j:]:
+                starts.append(s)
+                secs.append(t)
+            ret._starts, ret._secs = starts, secs
+            ret._shared = False
+            ret._owner = None
+
+        ret._last = max(table1._last, table2._last)
+        ret._longest = max(table1._longest, table2._longest)
+        ret._total = sum(ret._secs)
+        return ret
+
+    def copy(self):
+        """タイムテーブルのコピーを返す"""
+        ret = Timetable.__new__(Timetable)
+        ret._starts = array('q', self._starts)
+        ret._secs = array('q', self._secs)
+        ret._shared = False
+        ret._owner = None
+        ret._last, ret._longest, ret._total =\
+                self._last, self._longest, self._total
+        return ret
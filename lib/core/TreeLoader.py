@@ -0,0 +1,160 @@
+# -*- encoding:utf-8 -*-
+
+import os, stat, time
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.core.Manager import Manager
+
+class TreeLoader(object):
+    """タスクトリツリーの差分読み込み
+    前回読み込んだ内容（ディレクトリ毎のmtime、プロファイルのstat、タスクトリ、
+    サブディレクトリ名）をメモリ上に保持し、変更のあった部分だけを読み直す。
+    ・ディレクトリは os.scandir で走査し、エントリの種別をそのまま使う
+    ・mtimeが変わっていないディレクトリは走査し直さない
+    ・ツリーの読み込みと同時にタスクトリのパスの集合（listtask相当）を作る
+    manifest_name を指定すると、キャッシュをマニフェストとして保存し、
+    次回起動時の初回読み込みにも使用する（Manager.get_tree_cached と同じ形式）
+    workers に2以上を指定すると、プロファイルの読み込みをスレッドプールで
+    並列に行う（ディレクトリの走査、ツリーの組み立ては従来通り１スレッド）
+    allow_pickle が偽の場合は、旧形式（pickle）のプロファイルを読み込まず、
+    pickleで保存するマニフェストも使用しない
+    loader = TreeLoader(root, '.tasktory')
+    tree = loader.load()
+    """
+
+    def __init__(self, root, profile_name, manifest_name=None, workers=1,
+            allow_pickle=True):
+        self.root = root
+        self.profile_name = profile_name
+        self.manifest = None if manifest_name is None or not allow_pickle\
+                else os.path.join(root, manifest_name)
+        self.workers = workers
+        self.allow_pickle = allow_pickle
+
+        # 前回読み込んだタスクトリのパスの集合（ルートを除く）
+        self.paths = set()
+
+        # {ルートからの相対パス: (プロファイルのstat, タスクトリ,
+        #                         ディレクトリのmtime, サブディレクトリ名)}
+        # タスクトリは親と子を含まないコピーを保持する
+        self._cache = None
+        return
+
+    def load(self, rename=False):
+        """タスクトリツリーを読み込んで返す
+        返すツリーは毎回新しく作成するので、変更してもキャッシュは壊れない
+        """
+        if self._cache is None:
+            self._cache = {} if self.manifest is None\
+                    else Manager.load_manifest(self.manifest)
+        old = self._cache
+
+        # ディレクトリを走査し、キャッシュを検証する
+        # 前順に並べた (相対パス, 親の相対パス, パス, 改名, キャッシュ) のリスト
+        walked = []
+        stack = [(None, self.root, '', None, rename)]
+        while stack:
+            parent, path, rel, entry, rename_ = stack.pop()
+
+            node, entries = self._scan(path, entry, old.get(rel))
+            if node is None: continue
+            walked.append((rel, parent, path, rename_, node))
+
+            for name in reversed(node[3]):
+                stack.append((rel, os.path.join(path, name),
+                    name if rel == '' else rel + '/' + name,
+                    None if entries is None else entries[name], True))
+
+        # 変更のあったプロファイルを読み込む（子の順序は走査順のまま）
+        pending = [(path, rename_) for _, _, path, rename_, node in walked
+                if node[1] is None]
+        if self.workers > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(self.workers) as executor:
+                loaded = list(executor.map(lambda a:Manager.get(a[0],
+                    self.profile_name, a[1], self.allow_pickle), pending))
+        else:
+            loaded = [Manager.get(path, self.profile_name, rename_,
+                self.allow_pickle) for path, rename_ in pending]
+        loaded = iter(loaded)
+
+        # ツリーを組み立てる
+        # 読み込めなかったタスクトリの部分木は、従来通りツリーに含めない
+        cache = {}
+        tasks = {}
+        paths = set()
+        modified = False
+        tree = None
+        for rel, parent, path, _, node in walked:
+            if node[1] is None:
+                node = (node[0], next(loaded), node[2], node[3])
+                if node[1] is None: continue
+            if parent is not None and parent not in tasks: continue
+            modified = modified or node is not old.get(rel)
+
+            cache[rel] = node
+            task = tasks[rel] = node[1].copy()
+            if parent is None:
+                tree = task
+            else:
+                tasks[parent].append(task)
+                paths.add(path.replace('\\', '/'))
+
+        self._cache = cache
+        self.paths = paths
+
+        if self.manifest is not None and tree is not None and\
+                (modified or len(cache) != len(old)):
+            Manager.save_manifest(self.manifest, cache)
+
+        return tree
+
+    def _scan(self, path, entry, known):
+        """ディレクトリを検証し、(キャッシュ, サブディレクトリのエントリ) を返す
+        変更が無ければ known をそのまま返す。タスクトリでなければNoneを返す
+        プロファイルを読み直す必要があれば、キャッシュのタスクトリをNoneにする
+        entry - 親ディレクトリを走査した時のエントリ（stat結果を使い回す）
+        """
+        try:
+            mtime = (os.stat(path) if entry is None else entry.stat())\
+                    .st_mtime_ns
+        except OSError:
+            return None, None
+
+        profile = os.path.join(path, self.profile_name)
+        if known is not None and known[2] == mtime:
+            # ディレクトリに変更が無ければ、プロファイルだけを確認する
+            dirs, entries = known[3], None
+            try:
+                st = os.stat(profile)
+            except OSError:
+                return None, None
+            if not stat.S_ISREG(st.st_mode): return None, None
+        else:
+            st = None
+            dirs, entries = [], {}
+            try:
+                with os.scandir(path) as it:
+                    for e in it:
+                        if e.is_dir():
+                            dirs.append(e.name)
+                            entries[e.name] = e
+                        elif e.name == self.profile_name and e.is_file():
+                            st = e.stat()
+            except OSError:
+                return None, None
+            if st is None: return None, None
+
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if known is not None and known[0] == key:
+            if known[2] == mtime: return known, entries
+            task = known[1]
+        else:
+            task = None
+
+        # 直前に更新されたものは同じ時刻のまま再び書き換えられても区別
+        # できないので、次回必ず読み直すようにする
+        racy = time.time_ns() - Manager.MANIFEST_RACY * 10**9
+        if key[0] >= racy: key = None
+        if mtime >= racy: mtime = None
+
+        return (key, task, mtime, dirs), entries
@@ -1,6 +1,7 @@
 # -*- encoding:utf-8 -*-
 
 import os, re, datetime, time
+from functools import lru_cache
 
 from lib.common.RWTemplate import RWTemplate
 from lib.core.Tasktory import Tasktory
@@ -26,9 +27,11 @@ class Journal:
     # 正規表現生成メソッド
     #==========================================================================
     @staticmethod
+    @lru_cache(maxsize=32)
     def date_regex(tmpl_str):
         """日付テンプレート文字列から日付正規表現を作成する
         年数はあっても無くても良いようにする
+        （テンプレート文字列毎にキャッシュする）
         """
         _ = Journal.head_reg.sub(r'(\1)?', tmpl_str)
         _ = Journal.tail_reg.sub(r'(\1)?', _)
@@ -39,9 +42,11 @@ class Journal:
             'DAY': r'(?P<day>\d{1,2})'}))
 
     @staticmethod
+    @lru_cache(maxsize=32)
     def time_regex(tmpl_str):
         """作業時間テンプレート文字列から作業時間正規表現を作成する
         空白が含まれていても良いようにする
+        （テンプレート文字列毎にキャッシュする）
         """
         _ = Journal.delim_reg.sub(r'\s*\1\s*', tmpl_str)
         _ = r'^' + _ + r'$'
@@ -219,13 +224,17 @@ class Journal:
         # タスクライン初期化
         tasklines = {OPEN: '', WAIT: '', CLOSE: '', CONST: ''}
 
+        # 当日の作業時間が計上されているタスクトリ（idの集合）
+        if not isinstance(tasktory, Tasktory): raise TypeError()
+        worked = tasktory.time_index().ids(*Journal.day_span(date), True)
+
         # ジャーナルに表示するタスクトリの条件（優先度順）
         # ・当日の作業時間が計上されているものは表示する
         # ・ステータスがOPENで残り日数がinfiniteより大きいものは表示しない
         # ・ステータスがCLOSEのものは表示しない
         # ・上記以外のものは表示する
         for node in tasktory:
-            if Journal.at_date(date, node):
+            if id(node) in worked:
                 pass
             elif node.status == OPEN and\
                     node.deadline - date.toordinal() > infinite:
@@ -257,13 +266,16 @@ class Journal:
         return journal
 
     @staticmethod
-    def at_date(date, node):
-        """指定した日付の作業時間が計上されているかどうかを返す"""
+    def day_span(date):
+        """指定した日付の開始と終了のエポック秒の組を返す"""
         start = datetime.datetime.combine(date, datetime.time())
         end = start + datetime.timedelta(1)
-        start = int(start.timestamp())
-        end = int(end.timestamp())
-        return any([start <= s < end for s,_ in node.timetable])
+        return int(start.timestamp()), int(end.timestamp())
+
+    @staticmethod
+    def at_date(date, node):
+        """指定した日付の作業時間が計上されているかどうかを返す"""
+        return bool(node.timetable.between(*Journal.day_span(date)))
 
     @staticmethod
     def taskline(date, node, taskline_tmpl, time_tmpl, times_delim, infinite):
@@ -275,7 +287,7 @@ class Journal:
         # 作業時間
         times_phrase = times_delim.join([
             Journal.time_phrase(s,t,time_tmpl)
-            for s,t in node.timetable if s >= time.mktime(date.timetuple())])
+            for s,t in node.timetable.between(time.mktime(date.timetuple()))])
 
         return taskline_tmpl.substitute({
             'PATH': node.path(),
@@ -3,6 +3,7 @@
 import datetime
 
 from lib.core.Tasktory import Tasktory
+from lib.core.TasktoryView import TasktoryView
 from lib.common.RWTemplate import RWTemplate
 
 #=======================================
@@ -59,16 +60,14 @@ def report(date, tasktory):
             datetime.timedelta(1)).timestamp()
 
     thisweek = ''
-    clip = tasktory.clip(lambda t:at(t, start, end))
-    for node in [] if clip is None else clip:
+    for node in TasktoryView(tasktory, lambda t:at(t, start, end)):
         # 出力条件
         # ・ルートタスクトリは表示しない
-        # ・指定期間に作業時間が計上されている事（clipで解決済み）
+        # ・指定期間に作業時間が計上されている事（ビューで解決済み）
         # ・期日が規定以上遠ければ進捗率を表示しない
         if node.level() == 0: continue
-        org = tasktory.search(lambda t:t.ID == node.ID)[0]
         rest = node.deadline - date.toordinal()
-        rate = achieve_rate(org)
+        rate = achieve_rate(node.tasktory)
         tmpl = TasklineTemplate if rest <= INFINITE else SimpleTasklineTemplate
         thisweek += tmpl.substitute({'INDENT': INDENT * (node.level()-1),
             'PATH': node.name, 'ACHIEVE_RATE': '{}'.format(rate)}) +'\n'
@@ -81,8 +80,7 @@ def report(date, tasktory):
     #===================
     # OPEN, WAITのタスクを出力する
     nextweek = ''
-    clip = tasktory.clip(lambda t:t.status != Tasktory.CLOSE)
-    for node in [] if clip is None else clip:
+    for node in TasktoryView(tasktory, lambda t:t.status != Tasktory.CLOSE):
         if node.level() == 0: continue
         nextweek += SimpleTasklineTemplate.substitute({
             'INDENT': INDENT * (node.level()-1), 'PATH': node.name}) +'\n'
@@ -105,10 +103,12 @@ def at(node, start, end):
     start : 条件期間の開始エポック秒
     end : 条件期間の終了エポック秒
     ※ 条件は start < t < end となる事に注意
+    ツリー全体の作業時間索引で判定する（同じ期間の問い合わせは索引側で
+    キャッシュされるので、ノード毎に呼び出しても１回の検索で済む）
     """
-    for s,t in node.timetable:
-        if s < end and (s+t) >= start: return True
-    return False
+    root = node
+    while root.parent is not None: root = root.parent
+    return id(node) in root.time_index().ids(start, end)
 
 def achieve_rate(node):
     """タスクトリの進捗率を返す
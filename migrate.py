@@ -0,0 +1,38 @@
+#!C:/python/python3.4/python
+# -*- encoding:utf-8 -*-
+"""ルート以下の全てのタスクトリプロファイルを指定した形式に変換する
+python migrate.py [--root ROOT] [--to binary|pickle] [--workers N]
+（ROOTを省略した場合はmain.confのROOTを使用する）
+"""
+
+import sys, argparse, configparser
+
+from lib.core.Manager import Manager
+from lib.common.common import MAIN_CONF_FILE
+
+def main():
+    # コンフィグを読み出す
+    config = configparser.ConfigParser()
+    config.read(MAIN_CONF_FILE, encoding='utf-8-sig')
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default=config['MAIN']['ROOT'])
+    parser.add_argument('--to', choices=('binary', 'pickle'),
+            default='binary')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    profile_name = config['MAIN']['PROFILE_NAME']
+
+    # 並列に読み込み、まとめて書き出す
+    # （全て書き出せた場合だけプロファイルを置き換える）
+    tree = Manager.get_tree(args.root, profile_name, workers=args.workers)
+    if tree is None:
+        print('{} is not a tasktory'.format(args.root))
+        return 1
+    count = Manager.put_many(args.root, tree, profile_name,
+            binary=args.to == 'binary')
+    print('{} profiles converted to {}'.format(count, args.to))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, random, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.common.RWTemplate import RWTemplate
+
+class TestRWTemplate(unittest.TestCase):
+
+    def regex_parse(self, tmpl, string):
+        """正規表現による従来の読み込み"""
+        m = tmpl.tmpl_reg.match(string)
+        return None if m is None else m.groupdict()
+
+    def try_parse(self, tmpl, string):
+        try:
+            return tmpl.parse(string)
+        except ValueError:
+            return None
+
+    def test_parse(self):
+        tmpl = RWTemplate('%YEAR年%{MONTH}月%DAY日')
+        self.assertDictEqual(tmpl.parse('2014年4月1日'),
+                {'YEAR':'2014', 'MONTH':'4', 'DAY':'1'})
+        self.assertDictEqual(tmpl.parse('年4月1日'),
+                {'YEAR':'', 'MONTH':'4', 'DAY':'1'})
+        self.assertRaises(ValueError, tmpl.parse, '2014年4月1')
+        self.assertRaises(ValueError, tmpl.parse, '2014年4月1日。')
+
+        # 固定文字列だけのテンプレート
+        self.assertDictEqual(RWTemplate('abc').parse('abc'), {})
+        self.assertRaises(ValueError, RWTemplate('abc').parse, 'abcd')
+
+        # 改行を含む値（最短一致）
+        tmpl = RWTemplate('%A\n-\n%B')
+        self.assertDictEqual(tmpl.parse('a\nb\n-\nc\n-\nd'),
+                {'A':'a\nb', 'B':'c\n-\nd'})
+        return
+
+    def test_escape(self):
+        # %% は % として扱い、正規表現の特殊な文字はそのまま一致させる
+        tmpl = RWTemplate('%%%A(%B)*.%{C}%%')
+        self.assertDictEqual(tmpl.parse('%x(y)*.z%'),
+                {'A':'x', 'B':'y', 'C':'z'})
+        self.assertEqual(tmpl.substitute({'A':'x', 'B':'y', 'C':'z'}),
+                '%x(y)*.z%')
+        self.assertRaises(ValueError, tmpl.parse, '%x(y)**z%')
+        return
+
+    def test_cache(self):
+        # 同じテンプレート文字列の解析結果は共有する
+        tmpl1 = RWTemplate('%A-%B')
+        tmpl2 = RWTemplate('%A-%B')
+        self.assertIs(tmpl1.anchors, tmpl2.anchors)
+        self.assertIs(tmpl1.tmpl_reg, tmpl2.tmpl_reg)
+        return
+
+    def test_fuzz(self):
+        # 無作為なテンプレートと文字列で、正規表現と同じ結果になる事を確認する
+        # （固定文字列は名前と区別できる文字だけで作成する）
+        rand = random.Random(0)
+        alphabet = 'ab-.(%\n'
+        for _ in range(300):
+            parts = []
+            for i in range(rand.randint(0, 4)):
+                parts.append(''.join(rand.choice('-.(\n')
+                    for _ in range(rand.randint(0, 2))))
+                parts.append('%{{N{}}}'.format(i) if rand.random() < 0.5
+                        else '%N{}'.format(i) + rand.choice(['', '-']))
+            parts.append(rand.choice(['', '%%', '.']))
+            tmpl = RWTemplate(''.join(parts))
+            for _ in range(20):
+                string = ''.join(rand.choice(alphabet)
+                        for _ in range(rand.randint(0, 12)))
+                self.assertEqual(self.try_parse(tmpl, string),
+                        self.regex_parse(tmpl, string),
+                        (tmpl.template, string))
+
+            # テンプレートから作成した文字列は必ず読み込める
+            values = dict(('N{}'.format(i), ''.join(rand.choice(alphabet)
+                for _ in range(rand.randint(0, 3)))) for i in range(4))
+            string = tmpl.substitute(values)
+            self.assertEqual(self.try_parse(tmpl, string),
+                    self.regex_parse(tmpl, string))
+            self.assertIsNotNone(tmpl.parse(string))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
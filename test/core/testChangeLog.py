@@ -0,0 +1,242 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, shutil, threading, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.ChangeLog import ChangeLog
+from lib.core.FileStorage import FileStorage
+from lib.core.LoggedStorage import LoggedStorage
+
+OPEN = Tasktory.OPEN
+WAIT = Tasktory.WAIT
+CLOSE = Tasktory.CLOSE
+
+class TestChangeLog(unittest.TestCase):
+
+    def setUp(self):
+        self.root = '/Users/taku/tmp/test/work'
+        self.profile = '.tasktory'
+        self.memo = 'memo.txt'
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+        self.path = os.path.join(self.root, '.changelog')
+
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2)
+        self.t2 = Tasktory('01.い', 3)
+        self.t1.add_time(10, 20)
+        self.t0.append(self.t1)
+        self.t0.append(self.t2)
+        return
+
+    def tearDown(self):
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        return
+
+    def test_diff(self):
+        new = self.t1.copy()
+        new.add_time(40, 5)
+        new.remove_time(10, 20)
+        new.status = WAIT
+        new.deadline = None
+        self.assertListEqual(ChangeLog.diff(self.t1, new), [
+            (ChangeLog.REMOVE_TIME, self.t1.ID, (10, 20)),
+            (ChangeLog.ADD_TIME, self.t1.ID, (40, 5)),
+            (ChangeLog.STATUS, self.t1.ID, WAIT),
+            (ChangeLog.DEADLINE, self.t1.ID, None)])
+        self.assertListEqual(ChangeLog.diff(self.t1, self.t1.copy()), [])
+
+        # 名前などの変更は記録できない
+        self.assertTrue(ChangeLog.covers(self.t1, new))
+        new.comments = 'コメント'
+        self.assertFalse(ChangeLog.covers(self.t1, new))
+        return
+
+    def test_replay(self):
+        log = ChangeLog(self.path)
+        log.append([(ChangeLog.ADD_TIME, self.t1.ID, (40, 5)),
+            (ChangeLog.STATUS, self.t2.ID, CLOSE),
+            (ChangeLog.DEADLINE, self.t2.ID, 10),
+            (ChangeLog.REMOVE_TIME, self.t1.ID, (10, 20)),
+            (ChangeLog.STATUS, 12345, CLOSE)])
+
+        # 開き直しても同じ記録が読める
+        log = ChangeLog(self.path)
+        self.assertEqual(len(log.records()), 5)
+        tree = log.replay(self.t0.deepcopy())
+        self.assertListEqual(list(tree.find('/00.あ').timetable), [(40, 5)])
+        self.assertIs(tree.find('/01.い').status, CLOSE)
+        self.assertEqual(tree.find('/01.い').deadline, 10)
+
+        # 何度適用しても結果は変わらない
+        log.replay(tree)
+        self.assertListEqual(list(tree.find('/00.あ').timetable), [(40, 5)])
+        return
+
+    def test_recover(self):
+        log = ChangeLog(self.path)
+        log.append([(ChangeLog.ADD_TIME, self.t1.ID, (40, 5)),
+            (ChangeLog.ADD_TIME, self.t1.ID, (50, 5))])
+        size = log.size()
+
+        # 書きかけの記録は開く時に切り詰める
+        data = ChangeLog.dumps(ChangeLog.STATUS, self.t1.ID, CLOSE)
+        with open(self.path, 'ab') as f: f.write(data[:-1])
+        log = ChangeLog(self.path)
+        self.assertEqual(log.size(), size)
+        self.assertEqual(len(log.records()), 2)
+
+        # 壊れた記録以降は無効になる
+        with open(self.path, 'r+b') as f:
+            f.seek(size - 1)
+            f.write(b'\xff')
+        log = ChangeLog(self.path)
+        self.assertListEqual(log.records(),
+                [(ChangeLog.ADD_TIME, self.t1.ID, (40, 5))])
+        return
+
+    def test_logged_storage(self):
+        storage = LoggedStorage(FileStorage(self.root, self.profile,
+            self.memo), self.path, fsync=False)
+        storage.put_many(n for n, _ in self.t0.paths())
+
+        # 記録できる項目だけの変更は、プロファイルに書き込まない
+        tree = storage.get_tree()
+        loaded = dict((p, n.copy()) for n, p in tree.paths())
+        tree.find('/00.あ').add_time(40, 5)
+        tree.find('/01.い').status = CLOSE
+        self.assertEqual(storage.put_many(
+            (n for n, _ in tree.paths()), loaded), 2)
+        self.assertEqual(len(storage.log.records()), 2)
+        self.assertEqual(len(storage.storage.get('/00.あ').timetable), 1)
+
+        # 読み込み時は変更ログを適用する
+        tree = storage.get_tree()
+        self.assertListEqual(list(tree.find('/00.あ').timetable),
+                [(10, 20), (40, 5)])
+        self.assertIs(tree.find('/01.い').status, CLOSE)
+        self.assertIs(storage.get('/01.い').status, CLOSE)
+
+        # 記録できない項目も変われば、プロファイルにも書き込む
+        # （以前の記録が新しい値を上書きしない）
+        loaded = dict((p, n.copy()) for n, p in tree.paths())
+        tree.find('/00.あ').remove_time(40, 5)
+        tree.find('/00.あ').comments = 'コメント'
+        self.assertEqual(storage.put_many(
+            (n for n, _ in tree.paths()), loaded), 1)
+        tree = storage.get_tree()
+        self.assertListEqual(list(tree.find('/00.あ').timetable), [(10, 20)])
+        self.assertEqual(tree.find('/00.あ').comments, 'コメント')
+
+        # compactすると保存先に反映して変更ログを空にする
+        storage.compact()
+        self.assertEqual(storage.log.size(), 0)
+        self.assertIs(storage.storage.get('/01.い').status, CLOSE)
+        tree = storage.get_tree()
+        self.assertListEqual(list(tree.find('/00.あ').timetable), [(10, 20)])
+        self.assertIs(tree.find('/01.い').status, CLOSE)
+        storage.close()
+        return
+
+    def test_cached_tree(self):
+        storage = LoggedStorage(FileStorage(self.root, self.profile,
+            self.memo), self.path, fsync=False)
+        storage.put_many(n for n, _ in self.t0.paths())
+
+        # 書き込んだ内容は、保存先を読み直さずに反映される
+        tree = storage.get_tree()
+        loaded = dict((p, n.copy()) for n, p in tree.paths())
+        tree.find('/00.あ').add_time(40, 5)
+        tree.find('/01.い').comments = 'コメント'
+        storage.put_many((n for n, _ in tree.paths()), loaded)
+        tree.find('/00.あ').add_time(50, 5)
+        self.assertListEqual(list(storage.get_tree().find('/00.あ').timetable),
+                [(10, 20), (40, 5)])
+        self.assertEqual(storage.get('/01.い').comments, 'コメント')
+
+        # 返したツリーを変更しても、保持しているツリーは変わらない
+        storage.get_tree().find('/01.い').status = CLOSE
+        self.assertIs(storage.get_tree().find('/01.い').status, OPEN)
+
+        # 外部での変更はrefreshするまで反映しない
+        storage.storage.put_many([Tasktory('02.う', 4)])
+        self.assertIsNone(storage.get_tree().find('/02.う'))
+        storage.refresh()
+        self.assertIsNotNone(storage.get_tree().find('/02.う'))
+        self.assertListEqual(list(storage.get_tree().find('/00.あ').timetable),
+                [(10, 20), (40, 5)])
+        storage.close()
+        return
+
+    def test_background_compaction(self):
+        storage = LoggedStorage(FileStorage(self.root, self.profile,
+            self.memo), self.path, compact_size=0, fsync=False)
+        storage.put_many(n for n, _ in self.t0.paths())
+        tree = storage.get_tree()
+        loaded = dict((p, n.copy()) for n, p in tree.paths())
+        tree.find('/00.あ').add_time(40, 5)
+        storage.put_many((n for n, _ in tree.paths()), loaded)
+        storage.close()
+        self.assertEqual(storage.log.size(), 0)
+        self.assertEqual(len(storage.storage.get('/00.あ').timetable), 2)
+        return
+
+    def test_compaction_during_write(self):
+        storage = LoggedStorage(FileStorage(self.root, self.profile,
+            self.memo), self.path, fsync=False)
+        storage.put_many(n for n, _ in self.t0.paths())
+        tree = storage.get_tree()
+        loaded = dict((p, n.copy()) for n, p in tree.paths())
+        tree.find('/00.あ').add_time(40, 5)
+        storage.put_many((n for n, _ in tree.paths()), loaded)
+
+        # 保存先への書き込み中に、変更ログだけで済む書き込みをする
+        put_many = storage.storage.put_many
+        def write(tasks, loaded=None):
+            def other():
+                tree = storage.get_tree()
+                loaded = dict((p, n.copy()) for n, p in tree.paths())
+                tree.find('/01.い').status = CLOSE
+                storage.put_many((n for n, _ in tree.paths()), loaded)
+            thread = threading.Thread(target=other)
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+            return put_many(tasks, loaded)
+        storage.storage.put_many = write
+        self.assertEqual(storage.compact(), 1)
+
+        # 書き込み中に追記された記録は消さない
+        self.assertListEqual(storage.log.records(),
+                [(ChangeLog.STATUS, self.t2.ID, CLOSE)])
+        self.assertEqual(len(storage.storage.get('/00.あ').timetable), 2)
+        self.assertIs(storage.storage.get('/01.い').status, OPEN)
+        storage.refresh()
+        self.assertIs(storage.get_tree().find('/01.い').status, CLOSE)
+        storage.close()
+        return
+
+    def test_drop(self):
+        log = ChangeLog(self.path, fsync=False)
+        log.append([(ChangeLog.ADD_TIME, self.t1.ID, (40, 5))])
+        records, size = log.snapshot()
+        log.append([(ChangeLog.STATUS, self.t1.ID, CLOSE)])
+        log.drop(size)
+        self.assertListEqual(log.records(),
+                [(ChangeLog.STATUS, self.t1.ID, CLOSE)])
+        log.drop(log.size())
+        self.assertEqual(log.size(), 0)
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, pickle, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Diff import Diff
+
+OPEN = Tasktory.OPEN
+WAIT = Tasktory.WAIT
+CLOSE = Tasktory.CLOSE
+
+class TestDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2)
+        self.t11 = Tasktory('01.い', 3)
+        self.t2 = Tasktory('02.う', 4)
+        self.t1.add_time(10, 20)
+        self.t11.add_time(30, 5)
+        self.t0.append(self.t1)
+        self.t1.append(self.t11)
+        self.t0.append(self.t2)
+        return
+
+    def modified(self):
+        tree = self.t0.deepcopy()
+        tree.find('/00.あ').add_time(40, 5)
+        tree.find('/00.あ').remove_time(10, 20)
+        tree.find('/00.あ/01.い').status = CLOSE
+        tree.find('/00.あ/01.い').comments = 'コメント'
+        tree.find('/02.う').deadline = 9
+        tree.remove(tree.find('/02.う'))
+        t3 = Tasktory('03.え', 5, WAIT)
+        t31 = Tasktory('04.お', 6)
+        t31.add_time(50, 1)
+        t3.append(t31)
+        tree.append(t3)
+        return tree
+
+    def test_diff(self):
+        self.assertListEqual(Diff.diff(self.t0, self.t0.deepcopy()), [])
+
+        changes = Diff.diff(self.t0, self.modified())
+        self.assertListEqual([c[:2] for c in changes], [
+            (Diff.REMOVE_TIME, '/00.あ'),
+            (Diff.ADD_TIME, '/00.あ'),
+            (Diff.STATUS, '/00.あ/01.い'),
+            (Diff.COMMENTS, '/00.あ/01.い'),
+            (Diff.REMOVE_NODE, '/02.う'),
+            (Diff.ADD_NODE, '/03.え'),
+            (Diff.ADD_NODE, '/03.え/04.お')])
+        self.assertEqual(changes[0][2], (10, 20))
+        self.assertEqual(changes[1][2], (40, 5))
+        self.assertIs(changes[2][2], CLOSE)
+        self.assertEqual(changes[6][2].name, '04.お')
+        self.assertSetEqual(Diff.paths(changes),
+                set(['/00.あ', '/00.あ/01.い', '/03.え', '/03.え/04.お']))
+        return
+
+    def test_patch(self):
+        new = self.modified()
+        changes = Diff.diff(self.t0, new)
+
+        # 適用すると同じ内容のツリーになる
+        tree = Diff.patch(self.t0.deepcopy(), changes)
+        self.assertEqual(tree.digest(), new.digest())
+        self.assertListEqual([n.name for n in tree],
+                ['', '00.あ', '01.い', '03.え', '04.お'])
+        self.assertListEqual(list(tree.find('/03.え/04.お').timetable),
+                [(50, 1)])
+        self.assertEqual(len(tree), 5)
+
+        # 元のツリーは変更しない
+        self.assertListEqual(list(self.t1.timetable), [(10, 20)])
+        self.assertIs(self.t2.parent, self.t0)
+
+        # pickleしても同じように適用できる
+        tree = Diff.patch(self.t0.deepcopy(),
+                pickle.loads(pickle.dumps(changes)))
+        self.assertEqual(tree.digest(), new.digest())
+
+        # 何度適用しても結果は変わらない
+        Diff.patch(tree, changes)
+        self.assertEqual(tree.digest(), new.digest())
+        return
+
+    def test_names(self):
+        # ルートの名前に関わらず、ルートを'/'とする相対パスで検索できる
+        self.assertIs(self.t0.find(Diff.names(self.t0, '/00.あ/01.い/')),
+                self.t0.find('/00.あ/01.い'))
+        self.assertIs(self.t0.find(Diff.names(self.t0, '/')), self.t0)
+        tree = self.t0.deepcopy()
+        tree.name = 'root'
+        self.assertEqual(tree.find(Diff.names(tree, '/00.あ')).name, '00.あ')
+        self.assertIsNone(tree.find(Diff.names(tree, '/05.か')))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
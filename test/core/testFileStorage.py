@@ -0,0 +1,85 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, shutil, datetime, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.FileStorage import FileStorage
+
+class TestFileStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.root = '/Users/taku/tmp/test/work'
+        self.profile = '.tasktory'
+        self.memo = 'memo.txt'
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+
+        self.storage = FileStorage(self.root, self.profile, self.memo)
+
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2)
+        self.t11 = Tasktory('01.い', 3)
+        self.t0.append(self.t1)
+        self.t1.append(self.t11)
+        return
+
+    def tearDown(self):
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        return
+
+    def test_fspath(self):
+        # Tasktory.path(root)と同じパスになる事を確認する
+        for node in self.t0:
+            self.assertEqual(self.storage.fspath(node.path()),
+                    node.path(self.root))
+        return
+
+    def test_storage(self):
+        self.assertIsNone(self.storage.get_tree())
+        self.assertIsNone(self.storage.get('/'))
+        self.assertSetEqual(self.storage.listtask(), set())
+
+        self.assertEqual(self.storage.put_many(self.t0), 3)
+        self.assertEqual(self.storage.get('/00.あ/01.い').deadline, 3)
+        self.assertListEqual([n.path() for n in self.storage.get_tree()],
+                ['/', '/00.あ', '/00.あ/01.い'])
+        self.assertSetEqual(self.storage.listtask(),
+                set(['/00.あ', '/00.あ/01.い']))
+
+        # 控えはタスクトリのパスで指定する
+        loaded = dict((p, n.copy()) for n, p in self.t0.paths())
+        self.t11.deadline = 30
+        self.assertEqual(self.storage.put_many(self.t0, loaded), 1)
+
+        dttm = datetime.datetime(2014, 6, 1, 12, 30)
+        self.assertTrue(self.storage.put_memo(dttm, '/00.あ', 'めも'))
+        self.assertListEqual(self.storage.get_memo('/00.あ'), ['めも'])
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.root, '00.あ', self.memo)))
+        return
+
+    def test_listtask(self):
+        # 直前のget_treeで集めたパスを返し、ディレクトリを走査し直さない
+        self.storage.put_many(self.t0)
+        self.storage.get_tree()
+        self.t0.append(Tasktory('02.う', 4))
+        FileStorage(self.root, self.profile, self.memo).put_many(self.t0)
+        self.assertSetEqual(self.storage.listtask(),
+                set(['/00.あ', '/00.あ/01.い']))
+        self.storage.get_tree()
+        self.assertSetEqual(self.storage.listtask(),
+                set(['/00.あ', '/00.あ/01.い', '/02.う']))
+        return
+
+if __name__ == '__main__':
+    print(datetime.datetime.now())
+    unittest.main()
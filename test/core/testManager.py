@@ -99,6 +99,95 @@ class TestManager(unittest.TestCase):
                     n.status, n.category, n.comments)
         return
 
+    def test_get_tree_cached(self):
+        # 保存直後のプロファイルもキャッシュを信用する
+        racy = Manager.MANIFEST_RACY
+        Manager.MANIFEST_RACY = -1
+        manifest = '.manifest'
+        loaded = []
+        get = Manager.__dict__['get']
+        def counting_get(path, profile_name, rename=True, allow_pickle=True):
+            loaded.append(os.path.basename(path))
+            return get.__func__(path, profile_name, rename, allow_pickle)
+        Manager.get = staticmethod(counting_get)
+        try:
+            self.assertIsNone(Manager.get_tree(self.root, self.profile,
+                manifest_name=manifest))
+
+            t0 = Tasktory('', 1)
+            t1 = Tasktory('00.あ', 2)
+            t2 = Tasktory('01.か', 3)
+            t21 = Tasktory('02.き', 4)
+            t0.append(t1)
+            t0.append(t2)
+            t2.append(t21)
+            for node in t0:
+                Manager.put(self.root, node, self.profile)
+            os.makedirs(os.path.join(self.root, 'notask'))
+
+            def names(tree):
+                return sorted(n.path() for n in tree)
+
+            # 初回は全て読み込み、マニフェストを作成する
+            tree = Manager.get_tree(self.root, self.profile,
+                    manifest_name=manifest)
+            self.assertListEqual(names(tree),
+                    names(Manager.get_tree(self.root, self.profile)))
+            self.assertTrue(os.path.isfile(os.path.join(self.root, manifest)))
+
+            # 変更が無ければプロファイルを読まない
+            del loaded[:]
+            tree = Manager.get_tree(self.root, self.profile,
+                    manifest_name=manifest)
+            self.assertListEqual(loaded, [])
+            self.assertListEqual(names(tree), ['/', '/00.あ', '/01.か',
+                '/01.か/02.き'])
+            self.assertEqual(tree.find('/01.か/02.き').deadline, 4)
+            self.assertEqual(tree.find('/01.か/02.き').name, '02.き')
+
+            # 変更したプロファイルだけを読み直す
+            t21.deadline = 40
+            Manager.put(self.root, t21, self.profile)
+            tree = Manager.get_tree(self.root, self.profile,
+                    manifest_name=manifest)
+            self.assertListEqual(loaded, ['02.き'])
+            self.assertEqual(tree.find('/01.か/02.き').deadline, 40)
+
+            # 追加したタスクトリ（既存のディレクトリを含む）を検出する
+            del loaded[:]
+            t3 = Tasktory('notask', 5)
+            t0.append(t3)
+            Manager.put(self.root, t3, self.profile)
+            t22 = Tasktory('02.きき', 6)
+            t2.append(t22)
+            Manager.put(self.root, t22, self.profile)
+            tree = Manager.get_tree(self.root, self.profile,
+                    manifest_name=manifest)
+            self.assertListEqual(sorted(loaded), ['02.きき', 'notask'])
+            self.assertListEqual(names(tree), ['/', '/00.あ', '/01.か',
+                '/01.か/02.き', '/01.か/02.きき', '/notask'])
+
+            # 削除したタスクトリを検出する
+            shutil.rmtree(os.path.join(self.root, '00.あ'))
+            tree = Manager.get_tree(self.root, self.profile,
+                    manifest_name=manifest)
+            self.assertListEqual(names(tree), ['/', '/01.か',
+                '/01.か/02.き', '/01.か/02.きき', '/notask'])
+
+            # 壊れたマニフェストは作り直す
+            with open(os.path.join(self.root, manifest), 'wb') as f:
+                f.write(b'broken')
+            del loaded[:]
+            tree = Manager.get_tree(self.root, self.profile,
+                    manifest_name=manifest)
+            self.assertEqual(len(loaded), 5)
+            self.assertListEqual(names(tree), ['/', '/01.か',
+                '/01.か/02.き', '/01.か/02.きき', '/notask'])
+        finally:
+            Manager.get = get
+            Manager.MANIFEST_RACY = racy
+        return
+
     #==========================================================================
     # get
     #==========================================================================
@@ -139,6 +228,38 @@ class TestManager(unittest.TestCase):
         # getと一緒にテストする
         return
 
+    def test_put_many(self):
+        t0 = Tasktory('', 1)
+        t1 = Tasktory('00.あ', 2)
+        t2 = Tasktory('01.か', 3)
+        t0.append(t1)
+        t0.append(t2)
+
+        # 控えが無ければ全て書き出す
+        self.assertEqual(Manager.put_many(self.root, t0, self.profile), 3)
+        loaded = dict((p, n.copy()) for n, p in t0.paths(self.root))
+
+        # 変更が無ければ書き出さない
+        self.assertEqual(
+                Manager.put_many(self.root, t0, self.profile, loaded), 0)
+
+        # 変更したタスクトリと追加したタスクトリだけを書き出す
+        t2.add_time(10, 20)
+        t3 = Tasktory('02.さ', 4)
+        t0.append(t3)
+        self.assertEqual(
+                Manager.put_many(self.root, t0, self.profile, loaded), 2)
+        self.check_time(Manager.get(os.path.join(self.root, '01.か'),
+            self.profile), (10, 20))
+        self.check(Manager.get(os.path.join(self.root, '02.さ'),
+            self.profile), '02.さ', 4, None, OPEN, None, '')
+
+        # IDが変わった場合も書き出す
+        t1.ID = Tasktory('', 1).ID
+        self.assertEqual(
+                Manager.put_many(self.root, t0, self.profile, loaded), 3)
+        return
+
     #==========================================================================
     # listtask
     #==========================================================================
@@ -150,13 +271,36 @@ class TestManager(unittest.TestCase):
     # overlap
     #==========================================================================
     def test_overlap(self):
+        t0 = Tasktory('', 1)
+        t1 = Tasktory('00.あ', 2)
+        t2 = Tasktory('01.か', 3)
+        t0.append(t1)
+        t0.append(t2)
+        t1.add_time(0, 100)
+        t2.add_time(100, 10)
+        self.assertFalse(Manager.overlap(t0))
+
+        # 直前の作業時間より前に終わるものに埋もれた重複も検出する
+        t1.add_time(10, 5)
+        self.assertTrue(Manager.overlap(t0))
         return
 
     #==========================================================================
     # same_tree
     #==========================================================================
     def test_same_tree(self):
-        # TODO
+        t0 = Tasktory('', 1)
+        t1 = Tasktory('00.あ', 2)
+        t11 = Tasktory('01.い', 3)
+        t0.append(t1)
+        t1.append(t11)
+
+        tree = t0.deepcopy()
+        self.assertTrue(Manager.same_tree(t0, t0))
+        self.assertTrue(Manager.same_tree(t0, tree))
+        self.assertFalse(Manager.same_tree(t0, None))
+        tree.find('/00.あ/01.い').add_time(100, 1)
+        self.assertFalse(Manager.same_tree(t0, tree))
         return
 
     #==========================================================================
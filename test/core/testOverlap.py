@@ -0,0 +1,69 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, datetime, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Overlap import Overlap
+
+class TestOverlap(unittest.TestCase):
+
+    def setUp(self):
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2)
+        self.t11 = Tasktory('01.い', 3)
+        self.t2 = Tasktory('02.う', 4)
+        self.t0.append(self.t1)
+        self.t1.append(self.t11)
+        self.t0.append(self.t2)
+        self.t1.add_time(0, 100)
+        self.t11.add_time(100, 10)
+        self.t2.add_time(200, 10)
+        return
+
+    def test_conflicts(self):
+        # 接しているだけなら重複ではない
+        self.assertListEqual(list(Overlap.conflicts(self.t0)), [])
+
+        # 重複する全ての組をパスと共に返す
+        self.t11.add_time(50, 10)
+        self.t2.add_time(55, 100)
+        self.assertListEqual(list(Overlap.conflicts(self.t0)), [
+            (('/00.あ', 0, 100), ('/00.あ/01.い', 50, 10)),
+            (('/00.あ', 0, 100), ('/02.う', 55, 100)),
+            (('/00.あ/01.い', 50, 10), ('/02.う', 55, 100)),
+            (('/02.う', 55, 100), ('/00.あ/01.い', 100, 10))])
+        return
+
+    def test_describe(self):
+        # 重複する組を、パスと作業時間の範囲で１組１行に表示する
+        s = int(datetime.datetime(2014, 6, 1, 10, 0).timestamp())
+        self.t1.add_time(s, 1800)
+        self.t2.add_time(s + 900, 1800)
+        self.assertListEqual(Overlap.describe(Overlap.conflicts(self.t0)), [
+            '/00.あ 2014/06/01 10:00-10:30 と /02.う 2014/06/01 10:15-10:45'])
+        self.assertListEqual(Overlap.describe([]), [])
+        return
+
+    def test_window(self):
+        self.assertTupleEqual(Overlap.window(self.t0), (0, 210))
+        self.assertIsNone(Overlap.window(Tasktory('', 1)))
+
+        # 範囲外の重複は調べない
+        self.t1.add_time(50, 10)
+        self.t2.add_time(205, 1)
+        self.assertListEqual(list(Overlap.conflicts(self.t0, 200, 300)),
+                [(('/02.う', 200, 10), ('/02.う', 205, 1))])
+        self.assertEqual(len(list(Overlap.conflicts(self.t0))), 2)
+
+        # 範囲の前から続く作業時間は調べる
+        self.assertListEqual(list(Overlap.conflicts(self.t0, 55, 60)),
+                [(('/00.あ', 0, 100), ('/00.あ', 50, 10))])
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, shutil, datetime, pickle, unittest
+from array import array
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Manager import Manager
+from lib.core.Profile import Profile
+from lib.core.Timetable import Timetable
+
+OPEN = Tasktory.OPEN
+WAIT = Tasktory.WAIT
+CLOSE = Tasktory.CLOSE
+CONST = Tasktory.CONST
+
+class TestProfile(unittest.TestCase):
+
+    def check(self, task, other):
+        self.assertEqual(task.ID, other.ID)
+        self.assertEqual(task.name, other.name)
+        self.assertEqual(task.deadline, other.deadline)
+        self.assertEqual(task.status, other.status)
+        self.assertEqual(task.category, other.category)
+        self.assertEqual(task.comments, other.comments)
+        self.assertListEqual(list(task.timetable), list(other.timetable))
+        self.assertIsNone(task.parent)
+        self.assertListEqual(task.children, [])
+        return
+
+    def setUp(self):
+        self.root = '/Users/taku/tmp/test/work'
+        self.profile = '.tasktory'
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+
+        self.t1 = Tasktory('#123.あいうえお', 735000, WAIT)
+        self.t1.add_time(1400000000, 1800)
+        self.t1.add_time(1400003600, 60)
+        self.t1.category = '作業'
+        self.t1.comments = 'コメント\n２行目'
+        self.t1.append(Tasktory('child', 1))
+        return
+
+    def tearDown(self):
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        return
+
+    #==========================================================================
+    # dumps / loads
+    #==========================================================================
+    def test_dumps(self):
+        data = Profile.dumps(self.t1)
+        self.assertTrue(Profile.is_profile(data))
+        self.assertFalse(Profile.is_profile(pickle.dumps(self.t1.copy())))
+        self.assertLess(len(data), len(pickle.dumps(self.t1.copy())))
+
+        task = Profile.loads(data)
+        self.assertEqual(task.ID, self.t1.ID)
+        self.assertIs(task.status, WAIT)
+        self.assertEqual(task.timetable.total(), 1860)
+        return
+
+    def test_loads_none(self):
+        # Noneの項目を復元できる事を確認する
+        t = Tasktory('', None, None)
+        t.comments = None
+        self.check(Profile.loads(Profile.dumps(t)), t)
+        t = Tasktory('', 0, CONST)
+        t.category = ''
+        self.check(Profile.loads(Profile.dumps(t)), t)
+        return
+
+    def test_loads_wide(self):
+        # 32bitに収まらない値も復元できる事を確認する
+        for start, sec in ((-10, 5), (1<<40, 1), (0, 1<<33)):
+            t = Tasktory('', 1)
+            t.add_time(start, sec)
+            t.add_time(0, 1)
+            task = Profile.loads(Profile.dumps(t))
+            self.check(task, t)
+            self.assertEqual(task.timetable.stats(), t.timetable.stats())
+        return
+
+    def test_loads_error(self):
+        data = Profile.dumps(self.t1)
+        self.assertRaises(ValueError, Profile.loads, b'')
+        self.assertRaises(ValueError, Profile.loads, data[:-1])
+        self.assertRaises(ValueError, Profile.loads, data[:20])
+        self.assertRaises(ValueError, Profile.loads, b'XXXX' + data[4:])
+        newer = data[:4] + bytes([Profile.VERSION + 1]) + data[5:]
+        self.assertRaises(ValueError, Profile.loads, newer)
+
+        # 書き換えられた内容はCRC32で検出する
+        broken = bytearray(data)
+        broken[-1] ^= 0x01
+        self.assertRaises(ValueError, Profile.loads, bytes(broken))
+        return
+
+    def test_loads_v1(self):
+        # CRC32の無いバージョン1の形式は、整列していない、重複した配列や
+        # 誤った集計値を信用しない
+        t = self.t1.copy()
+        t.timetable = Timetable.from_arrays(array('q', [50, 10, 50]),
+                array('q', [5, 20, 5]), (1, 2, 3))
+        data = Profile.dumps(t)
+        data = data[:4] + bytes([1]) + data[5:8] + data[12:]
+        task = Profile.loads(data)
+        self.assertEqual(task.ID, self.t1.ID)
+        self.assertListEqual(list(task.timetable), [(10, 20), (50, 5)])
+        self.assertEqual(task.timetable.stats(), (55, 20, 25))
+        return
+
+    #==========================================================================
+    # Manager
+    #==========================================================================
+    def test_manager(self):
+        # どちらの形式で保存しても読み込める事を確認する
+        t0 = Tasktory('', 1)
+        t0.append(self.t1)
+        Manager.put(self.root, t0, self.profile)
+        Manager.put(self.root, self.t1, self.profile, binary=True)
+        path = os.path.join(self.root, self.t1.name, self.profile)
+        with open(path, 'rb') as f:
+            self.assertTrue(Profile.is_profile(f.read()))
+        self.check(Manager.get(os.path.join(self.root, self.t1.name),
+            self.profile), self.t1.copy())
+        tree = Manager.get_tree(self.root, self.profile)
+        self.assertListEqual([n.name for n in tree], ['', self.t1.name])
+
+        # pickleを許可しなければ、旧形式のプロファイルは読み込まない
+        self.assertIsNone(Manager.get(self.root, self.profile,
+            allow_pickle=False))
+        tree = Manager.get_tree(self.root, self.profile, allow_pickle=False)
+        self.assertIsNone(tree)
+        Manager.put(self.root, t0, self.profile, binary=True)
+        tree = Manager.get_tree(self.root, self.profile, allow_pickle=False)
+        self.assertListEqual([n.name for n in tree], ['', self.t1.name])
+
+        # 壊れたプロファイルはタスクトリとみなさない
+        with open(path, 'wb') as f:
+            f.write(Profile.dumps(self.t1)[:30])
+        self.assertIsNone(Manager.get(os.path.join(self.root, self.t1.name),
+            self.profile))
+        return
+
+if __name__ == '__main__':
+    print(datetime.datetime.now())
+    unittest.main()
@@ -0,0 +1,107 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, shutil, datetime, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Manager import Manager
+from lib.core.ProfileWriter import ProfileWriter
+
+class TestProfileWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.root = '/Users/taku/tmp/test/work'
+        self.profile = '.tasktory'
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+
+        self.t0 = Tasktory('', 1)
+        for i in range(10):
+            self.t0.append(Tasktory('{:02}'.format(i), i))
+        return
+
+    def tearDown(self):
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        return
+
+    def files(self):
+        return sorted(os.path.relpath(os.path.join(d, f), self.root)
+                for d, _, fs in os.walk(self.root) for f in fs)
+
+    #==========================================================================
+    # commit
+    #==========================================================================
+    def test_commit(self):
+        # 複数のグループに分けて書き出し、一時ファイルを残さない
+        # （fsyncする場合はスレッドプールで書き出す）
+        with ProfileWriter(self.root, self.profile, group=3,
+                fsync=True) as writer:
+            for node in self.t0: writer.put(node)
+            self.assertEqual(len(writer), 11)
+        self.assertListEqual(self.files(), [self.profile] +
+                ['{:02}/{}'.format(i, self.profile) for i in range(10)])
+        tree = Manager.get_tree(self.root, self.profile)
+        self.assertListEqual(sorted((n.name, n.deadline) for n in tree),
+                sorted((n.name, n.deadline) for n in self.t0))
+
+        # 既存のプロファイルを置き換える
+        self.t0.children[3].deadline = 30
+        writer = ProfileWriter(self.root, self.profile, fsync=False)
+        writer.put(self.t0.children[3])
+        self.assertEqual(writer.commit(), 1)
+        self.assertEqual(Manager.get(os.path.join(self.root, '03'),
+            self.profile).deadline, 30)
+        return
+
+    def test_commit_failure(self):
+        # 置き換えに失敗した場合は、残りの一時ファイルを消して
+        # スレッドプールを終了する
+        os.makedirs(os.path.join(self.root, '05', self.profile))
+        writer = ProfileWriter(self.root, self.profile, group=3, fsync=True)
+        for node in self.t0: writer.put(node)
+        self.assertRaises(OSError, writer.commit)
+        self.assertListEqual([f for f in self.files()
+            if f.endswith(ProfileWriter.SUFFIX)], [])
+        self.assertIsNone(writer._executor)
+        return
+
+    #==========================================================================
+    # rollback
+    #==========================================================================
+    def test_rollback(self):
+        Manager.put(self.root, self.t0, self.profile)
+        Manager.put(self.root, self.t0.children[0], self.profile)
+
+        # commitしなければ既存のプロファイルは変わらず、一時ファイルと
+        # 新しく作成したディレクトリは残らない
+        self.t0.deadline = 100
+        writer = ProfileWriter(self.root, self.profile, group=2)
+        for node in self.t0: writer.put(node)
+        writer.rollback()
+        self.assertListEqual(self.files(),
+                [self.profile, '00/' + self.profile])
+        self.assertEqual(Manager.get(self.root, self.profile).deadline, 1)
+
+        # 途中で例外が起きた場合もrollbackする
+        try:
+            with ProfileWriter(self.root, self.profile, group=2) as writer:
+                for node in self.t0: writer.put(node)
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        self.assertListEqual(self.files(),
+                [self.profile, '00/' + self.profile])
+        self.assertEqual(Manager.get(self.root, self.profile).deadline, 1)
+        return
+
+if __name__ == '__main__':
+    print(datetime.datetime.now())
+    unittest.main()
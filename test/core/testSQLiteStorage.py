@@ -0,0 +1,193 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, shutil, datetime, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Manager import Manager
+from lib.core.FileStorage import FileStorage
+from lib.core.SQLiteStorage import SQLiteStorage
+
+OPEN = Tasktory.OPEN
+WAIT = Tasktory.WAIT
+CLOSE = Tasktory.CLOSE
+CONST = Tasktory.CONST
+
+class TestSQLiteStorage(unittest.TestCase):
+
+    def check(self, task, other):
+        self.assertEqual(task.ID, other.ID)
+        self.assertEqual(task.name, other.name)
+        self.assertEqual(task.deadline, other.deadline)
+        self.assertEqual(task.status, other.status)
+        self.assertEqual(task.category, other.category)
+        self.assertEqual(task.comments, other.comments)
+        self.assertListEqual(list(task.timetable), list(other.timetable))
+        return
+
+    def setUp(self):
+        self.root = '/Users/taku/tmp/test/work'
+        self.profile = '.tasktory'
+        self.memo = 'memo.txt'
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+
+        self.storage = SQLiteStorage(':memory:')
+
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2, WAIT)
+        self.t2 = Tasktory('01.か', 3)
+        self.t21 = Tasktory('02.き', None, CLOSE)
+        self.t1.add_time(10, 20)
+        self.t1.add_time(0, 5)
+        self.t21.category = '作業'
+        self.t21.comments = 'コメント'
+        self.t0.append(self.t1)
+        self.t0.append(self.t2)
+        self.t2.append(self.t21)
+        return
+
+    def tearDown(self):
+        self.storage.close()
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        return
+
+    #==========================================================================
+    # タスクトリ
+    #==========================================================================
+    def test_get_tree(self):
+        self.assertIsNone(self.storage.get_tree())
+        self.assertEqual(self.storage.put_many(self.t0), 4)
+
+        tree = self.storage.get_tree()
+        self.assertListEqual([n.path() for n in tree],
+                ['/', '/00.あ', '/01.か', '/01.か/02.き'])
+        for n, n_ in zip(self.t0, tree): self.check(n_, n)
+        self.assertSetEqual(self.storage.listtask(),
+                set(['/00.あ', '/01.か', '/01.か/02.き']))
+        return
+
+    def test_get(self):
+        self.storage.put_many(self.t0)
+        self.assertIsNone(self.storage.get('/なし'))
+        self.check(self.storage.get('/00.あ'), self.t1)
+        self.check(self.storage.get('/01.か/02.き'), self.t21)
+        self.assertIsNone(self.storage.get('/00.あ').parent)
+        return
+
+    def test_put_many(self):
+        self.storage.put_many(self.t0)
+        loaded = dict((p, n.copy()) for n, p in self.t0.paths())
+
+        # 変更の無いタスクトリは書き込まない
+        self.assertEqual(self.storage.put_many(self.t0, loaded), 0)
+
+        # 変更したタスクトリだけを置き換える
+        self.t1.add_time(100, 1)
+        self.t2.deadline = 30
+        self.assertEqual(self.storage.put_many(self.t0, loaded), 2)
+        self.check(self.storage.get('/00.あ'), self.t1)
+        self.assertEqual(self.storage.get('/01.か').deadline, 30)
+
+        # 途中で失敗したら何も書き込まない
+        self.t1.add_time(200, 1)
+        def tasks():
+            yield self.t1
+            raise RuntimeError()
+        self.assertRaises(RuntimeError, self.storage.put_many, tasks())
+        self.assertEqual(len(self.storage.get('/00.あ').timetable), 3)
+        return
+
+    def test_put_many_prune(self):
+        self.storage.put_many(self.t0)
+
+        # 無くなった子の行は部分木ごと削除する
+        self.t0.remove(self.t2)
+        self.storage.put_many(self.t0)
+        self.assertSetEqual(self.storage.listtask(), set(['/00.あ']))
+        self.assertEqual(self.storage.conn.execute(
+            'SELECT COUNT(*) FROM times').fetchone()[0], 2)
+
+        # 名前を変えたタスクトリは、古いパスの行を削除する
+        self.t0.append(self.t2)
+        self.storage.put_many(self.t0)
+        self.t2.name = '03.さ'
+        self.storage.put_many([self.t2, self.t21])
+        self.assertSetEqual(self.storage.listtask(),
+                set(['/00.あ', '/03.さ', '/03.さ/02.き']))
+        self.check(self.storage.get('/03.さ/02.き'), self.t21)
+
+        # 同じIDでも、ツリーにあるもの（複製したもの）は削除しない
+        t3 = self.t1.copy()
+        t3.name = '04.た'
+        self.t0.append(t3)
+        self.storage.put_many(self.t0)
+        self.assertSetEqual(self.storage.listtask(),
+                set(['/00.あ', '/03.さ', '/03.さ/02.き', '/04.た']))
+        return
+
+    def test_import_from(self):
+        # 空のデータベースにだけ、ミラーを使わずに取り込む
+        files = FileStorage(self.root, self.profile, self.memo)
+        files.put_many(self.t0)
+        dttm = datetime.datetime(2014, 6, 1, 12, 30)
+        files.put_memo(dttm, '/01.か', 'めも１')
+        files.put_memo(dttm, '/01.か', 'めも２')
+        storage = SQLiteStorage(':memory:', files)
+        self.assertEqual(storage.import_from(files), 4)
+        self.assertEqual(storage.import_from(files), 0)
+        for n, n_ in zip(self.t0, storage.get_tree()): self.check(n_, n)
+        self.assertListEqual(storage.get_memo('/01.か'), ['めも１', 'めも２'])
+        self.assertListEqual(files.get_memo('/01.か'), ['めも１', 'めも２'])
+        storage.close()
+
+        # 複製したタスクトリ（同じID）もそれぞれ取り込む
+        t3 = self.t2.deepcopy()
+        t3.name = '03.さ'
+        self.t0.append(t3)
+        files.put_many(self.t0)
+        storage = SQLiteStorage(':memory:', files)
+        self.assertEqual(storage.import_from(files), 6)
+        self.assertSetEqual(storage.listtask(), files.listtask())
+        storage.close()
+        return
+
+    def test_memo(self):
+        dttm = datetime.datetime(2014, 6, 1, 12, 30)
+        self.assertListEqual(self.storage.get_memo('/00.あ'), [])
+        self.assertTrue(self.storage.put_memo(dttm, '/00.あ', '\n\nめも１\n'))
+        self.assertTrue(self.storage.put_memo(dttm, '/00.あ', 'めも２'))
+        self.assertFalse(self.storage.put_memo(dttm, '/00.あ', 'めも１'))
+        self.assertListEqual(self.storage.get_memo('/00.あ'),
+                ['めも１', 'めも２'])
+        self.assertListEqual(self.storage.get_memo('/01.か'), [])
+        return
+
+    def test_mirror(self):
+        # ディレクトリにも同じ内容を書き出す事を確認する
+        mirror = FileStorage(self.root, self.profile, self.memo)
+        storage = SQLiteStorage(':memory:', mirror)
+        storage.put_many(self.t0)
+        tree = Manager.get_tree(self.root, self.profile)
+        self.assertListEqual(sorted(n.path() for n in tree),
+                sorted(n.path() for n in self.t0))
+        self.assertSetEqual(mirror.listtask(), storage.listtask())
+
+        dttm = datetime.datetime(2014, 6, 1, 12, 30)
+        storage.put_memo(dttm, '/01.か', 'めも')
+        self.assertListEqual(mirror.get_memo('/01.か'), ['めも'])
+        storage.close()
+        return
+
+if __name__ == '__main__':
+    print(datetime.datetime.now())
+    unittest.main()
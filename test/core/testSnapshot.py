@@ -0,0 +1,126 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Snapshot import Snapshot, np
+
+DAY = 86400
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        # 2015-01-05（月曜日）の0時（UTC）
+        self.base = 1420416000
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2)
+        self.t11 = Tasktory('01.い', 3)
+        self.t2 = Tasktory('02.う', 4)
+        self.t0.append(self.t1)
+        self.t1.append(self.t11)
+        self.t0.append(self.t2)
+        self.t1.add_time(self.base + 3600, 1800)
+        self.t11.add_time(self.base + 7200, 600)
+        self.t11.add_time(self.base + DAY + 3000, 1200)
+        self.t2.add_time(self.base + 7 * DAY, 60)
+        self.t2.add_time(self.base + 30 * DAY, 120)
+        self.snap = Snapshot(self.t0)
+        return
+
+    def test_init(self):
+        self.assertListEqual(self.snap.nodes,
+                [self.t0, self.t1, self.t11, self.t2])
+        self.assertListEqual(list(self.snap.parent), [-1, 0, 1, 0])
+        self.assertListEqual(list(self.snap.depth), [0, 1, 2, 1])
+        self.assertListEqual(list(self.snap.size), [4, 2, 1, 1])
+        self.assertListEqual(list(self.snap.node), [1, 2, 2, 3, 3])
+        self.assertListEqual(list(self.snap.sec), [1800, 600, 1200, 60, 120])
+        self.assertEqual(len(self.snap), 5)
+
+        # 作成後の変更は反映されない
+        self.t2.add_time(self.base, 1)
+        self.assertEqual(len(self.snap), 5)
+        return
+
+    def test_rollup(self):
+        self.assertListEqual(list(self.snap.rollup([1, 2, 3, 4])),
+                [10, 5, 3, 4])
+        self.assertListEqual(list(self.snap.subtree(1)),
+                [True, True, True, False, False])
+        return
+
+    def test_totals(self):
+        self.assertListEqual(list(self.snap.totals()), [0, 1800, 1800, 180])
+        self.assertListEqual(list(self.snap.totals(rollup=True)),
+                [3780, 3600, 1800, 180])
+
+        # 開始で判定する
+        self.assertListEqual(list(self.snap.totals(self.base + 3601,
+            self.base + DAY + 3000)), [0, 0, 600, 0])
+        return
+
+    def test_keys(self):
+        keys = self.snap.keys('week', 0)
+        self.assertListEqual([str(k) for k in keys], ['2015-01-05',
+            '2015-01-05', '2015-01-05', '2015-01-12', '2015-02-02'])
+        keys = self.snap.keys('month', 0)
+        self.assertListEqual([str(k) for k in keys], ['2015-01-01',
+            '2015-01-01', '2015-01-01', '2015-01-01', '2015-02-01'])
+
+        # ローカル時刻の日付で区切る
+        keys = self.snap.keys('day', -7200)
+        self.assertListEqual([str(k) for k in keys], ['2015-01-04',
+            '2015-01-05', '2015-01-05', '2015-01-11', '2015-02-03'])
+        self.assertRaises(ValueError, self.snap.keys, 'year')
+        return
+
+    def test_buckets(self):
+        days, nodes, secs = self.snap.buckets('day', 0)
+        self.assertListEqual([(str(d), n, s) for d, n, s
+            in zip(days, nodes, secs)], [
+                ('2015-01-05', 1, 1800), ('2015-01-05', 2, 600),
+                ('2015-01-06', 2, 1200), ('2015-01-12', 3, 60),
+                ('2015-02-04', 3, 120)])
+
+        weeks, nodes, secs = self.snap.buckets('week', 0, True)
+        self.assertListEqual([(str(d), n, s) for d, n, s
+            in zip(weeks, nodes, secs)], [
+                ('2015-01-05', 0, 3600), ('2015-01-05', 1, 3600),
+                ('2015-01-05', 2, 1800), ('2015-01-12', 0, 60),
+                ('2015-01-12', 3, 60), ('2015-02-02', 0, 120),
+                ('2015-02-02', 3, 120)])
+        return
+
+    def test_hours(self):
+        # 時をまたぐ作業時間は分割する
+        self.t2.add_time(self.base + 23 * 3600 + 3000, 1200)
+        snap = Snapshot(self.t0)
+        hours = snap.hours(0)
+        self.assertEqual(hours[0], 600 + 60 + 120 + 600)
+        self.assertEqual(hours[1], 1800 + 600)
+        self.assertEqual(hours[2], 600)
+        self.assertEqual(hours[23], 600)
+        self.assertEqual(hours.sum(), 1800 + 600 + 1200 + 60 + 120 + 1200)
+
+        # 部分木に絞る
+        self.assertListEqual(list(snap.hours(0, snap.subtree(2))[:3]),
+                [600, 600, 600])
+        return
+
+    def test_utilization(self):
+        # 2015-01-05 から 2015-02-04 までの31日間
+        rate = self.snap.utilization(0)
+        self.assertAlmostEqual(rate[1], 2400 / (31 * 3600.0))
+        mask = self.snap.subtree(2)
+        self.assertAlmostEqual(self.snap.utilization(0, mask)[0],
+                600 / (2 * 3600.0))
+        return
+
+if __name__ == '__main__':
+    unittest.main()
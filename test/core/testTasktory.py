@@ -2,7 +2,7 @@
 #!C:/python/python3.4/python
 #-*- encoding:utf-8 -*-
 
-import sys, os, datetime, unittest
+import sys, os, datetime, pickle, unittest
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
@@ -318,6 +318,59 @@ class TestTasktory(unittest.TestCase):
             self.tp312, self.tp32, self.tp323, self.tp324])
         return
 
+    def test_preorder(self):
+        self.assertListEqual(list(self.t0.preorder()), [self.t0])
+        self.assertListEqual(list(self.tp3.preorder()), list(self.tp3))
+        self.assertListEqual(list(self.tp3.preorder(0)), [self.tp3])
+        self.assertListEqual(list(self.tp3.preorder(1)),
+                [self.tp3, self.tp31, self.tp32])
+        return
+
+    def test_postorder(self):
+        self.assertListEqual(list(self.t0.postorder()), [self.t0])
+        self.assertListEqual(list(self.tp3.postorder()), [self.tp311,
+            self.tp312, self.tp31, self.tp323, self.tp324, self.tp32, self.tp3])
+        self.assertListEqual(list(self.tp3.postorder(0)), [self.tp3])
+        self.assertListEqual(list(self.tp3.postorder(1)),
+                [self.tp31, self.tp32, self.tp3])
+        return
+
+    def test_fold(self):
+        # 子の結果から自身の結果を求める（部分木のノード数）
+        counts = self.tp3.fold(lambda t, counts:1 + sum(counts))
+        self.assertEqual(len(counts), 7)
+        self.assertEqual(counts[id(self.tp3)], 7)
+        self.assertEqual(counts[id(self.tp31)], 3)
+        self.assertEqual(counts[id(self.tp311)], 1)
+        return
+
+    def test_breadth_first(self):
+        self.assertListEqual(list(self.t0.breadth_first()), [self.t0])
+        self.assertListEqual(list(self.tp3.breadth_first()), [self.tp3,
+            self.tp31, self.tp32, self.tp311, self.tp312, self.tp323,
+            self.tp324])
+        self.assertListEqual(list(self.tp3.breadth_first(1)),
+                [self.tp3, self.tp31, self.tp32])
+        return
+
+    def test_deep_tree(self):
+        # 再帰の上限を超える深さのツリーを扱える事を確認する
+        depth = sys.getrecursionlimit() * 2
+        tree = Tasktory('', 1)
+        node = tree
+        for i in range(depth):
+            child = Tasktory(str(i), 1)
+            node.append(child)
+            node = child
+        self.assertEqual(len(tree), depth + 1)
+        self.assertEqual(len(list(tree.postorder())), depth + 1)
+        self.assertEqual(node.level(), depth)
+        self.assertIs(tree.find(node.path()), node)
+        self.assertEqual(len(tree.search(lambda t:True)), depth + 1)
+        self.assertEqual(len(tree.deepcopy()), depth + 1)
+        self.assertEqual(len(tree.clip(lambda t:t is node)), depth + 1)
+        return
+
     #==========================================================================
     # 数値型エミュレート
     #==========================================================================
@@ -403,6 +456,35 @@ class TestTasktory(unittest.TestCase):
 
         return
 
+    def test_merge(self):
+        # __add__と同じ結果になる事を確認する
+        t3 = Tasktory('Proj3', 2, WAIT)
+        t31 = Tasktory('LargeTask1', 3); t31.add_time(5, 1)
+        t33 = Tasktory('LargeTask3', 3)
+        t3.append(t31)
+        t3.append(t33)
+        for t in (self.tp3.merge(t3), self.tp3 + t3):
+            self.check(t, 'Proj3', 2, None, WAIT, None, '')
+            self.assertEqual(t.ID, self.tp3.ID)
+            self.assertListEqual([n.name for n in t],
+                    ['Proj3', 'LargeTask1', 'SmallTask1', 'SmallTask2',
+                        'LargeTask2', 'SmallTask3', 'SmallTask4', 'LargeTask3'])
+            self.check_time(t.get('LargeTask1'), (5,1))
+
+        # 相手の無い部分木はコピーされる事を確認する
+        t = self.tp3.merge(t3)
+        self.assertIsNot(t.get('LargeTask2'), self.tp32)
+        self.assertIsNot(t.get('LargeTask3'), t33)
+        self.assertIs(self.tp32.parent, self.tp3)
+
+        # shareを指定すると相手の無い部分木が移される事を確認する
+        t = self.tp3.merge(t3, True)
+        self.assertIs(t.get('LargeTask2'), self.tp32)
+        self.assertIs(t.get('LargeTask3'), t33)
+        self.assertIs(self.tp32.parent, t)
+        self.assertIs(t.find('Proj3/LargeTask2/SmallTask4'), self.tp324)
+        return
+
     #==========================================================================
     # タスクトリ参照メソッド
     #==========================================================================
@@ -417,6 +499,16 @@ class TestTasktory(unittest.TestCase):
         self.assertIsNone(self.tp1.get('SmallTask1'))
         self.assertIs(self.tp1.get('LargeTask1').get('SmallTask1'), self.tp111)
         self.assertIs(self.tp2.get('LargeTask2'), self.tp22)
+
+        # 追加、名前変更、上書き後も検索できる事を確認する
+        self.tp1.append(self.tn1)
+        self.assertIs(self.tp1.get('#123.Hoge'), self.tn1)
+        self.tn1.name = 'Renamed'
+        self.assertIsNone(self.tp1.get('#123.Hoge'))
+        self.assertIs(self.tp1.get('Renamed'), self.tn1)
+        self.tp1.wash(self.tp2)
+        self.assertIsNone(self.tp1.get('Renamed'))
+        self.assertIs(self.tp1.get('LargeTask2'), self.tp22)
         return
 
     def test_total_time(self):
@@ -432,6 +524,91 @@ class TestTasktory(unittest.TestCase):
         self.assertEqual(self.tp111.total_time(), 2)
         return
 
+    def test_rollup(self):
+        # 部分木の集計値を確認する
+        self.assertTupleEqual(self.t0.rollup(), (1, 0, 0))
+        self.assertTupleEqual(self.tp1.rollup(), (3, 3, 3))
+        self.assertTupleEqual(self.tp3.rollup(), (7, 15, 15))
+        self.assertEqual(self.tp3.subtree_time(), 15)
+        self.assertEqual(self.tp3.subtree_timestamp(), 15)
+        self.assertEqual(self.tp31.subtree_time(), 9)
+
+        # 変更すると祖先の集計値が更新される事を確認する
+        self.tp311.add_time(20, 5)
+        self.assertTupleEqual(self.tp3.rollup(), (7, 20, 25))
+        self.assertTupleEqual(self.tp32.rollup(), (3, 6, 7))
+        self.tp311.erase_time(20, 21)
+        self.assertTupleEqual(self.tp3.rollup(), (7, 15, 15))
+        self.tp324.append(self.tn2t2)
+        self.assertTupleEqual(self.tp3.rollup(), (8, 17, 15))
+        self.tp312.timetable += [(30, 1)]
+        self.assertTupleEqual(self.tp3.rollup(), (8, 18, 31))
+        self.tp32.wash(self.tt1)
+        self.assertTupleEqual(self.tp3.rollup(), (5, 11, 31))
+
+        # タイムテーブルを直接変更しても更新される事を確認する
+        self.tp311.timetable.add(40, 2)
+        self.assertTupleEqual(self.tp3.rollup(), (5, 13, 42))
+        self.tp311.timetable.remove(40, 2)
+        self.assertTupleEqual(self.tp3.rollup(), (5, 11, 31))
+
+        # 置き換えた後の古いタイムテーブルの変更は反映しない
+        old = self.tp311.timetable
+        self.tp311.timetable = [(50, 1)]
+        self.assertTupleEqual(self.tp3.rollup(), (5, 12, 51))
+        old.add(60, 1)
+        self.assertIsNone(old._owner)
+        self.assertTupleEqual(self.tp3.rollup(), (5, 12, 51))
+
+        # 他のタスクトリのタイムテーブルを設定すると、配列を共有する別の
+        # タイムテーブルになる
+        self.tp312.timetable = self.tp311.timetable
+        self.assertIsNot(self.tp312.timetable, self.tp311.timetable)
+        self.tp312.timetable.add(70, 1)
+        self.assertEqual(len(self.tp311.timetable), 1)
+        return
+
+    def test_digest(self):
+        # 内容が同じであれば、IDが違ってもハッシュは一致する
+        tree = self.tp3.deepcopy()
+        self.assertEqual(self.tp3.digest(), tree.digest())
+        self.assertEqual(Tasktory('', 1).content_digest(),
+                self.t0.content_digest())
+        self.assertNotEqual(self.t0.content_digest(), self.td1.content_digest())
+        self.assertNotEqual(self.t0.content_digest(), self.tt1.content_digest())
+        self.assertNotEqual(self.ta1.content_digest(), self.ta2.content_digest())
+        self.assertNotEqual(self.tp1.digest(), self.tp1.content_digest())
+
+        # 変更すると自身と祖先のハッシュが更新される事を確認する
+        digest = self.tp3.digest()
+        for change, undo in (
+                (lambda t:t.add_time(20, 5), lambda t:t.remove_time(20, 5)),
+                (lambda t:t.timetable.add(20, 5),
+                    lambda t:t.timetable.remove(20, 5)),
+                (lambda t:t.timetable.append((20, 5)),
+                    lambda t:t.timetable.remove_between(20, 21)),
+                (lambda t:setattr(t, 'status', CLOSE),
+                    lambda t:setattr(t, 'status', OPEN)),
+                (lambda t:setattr(t, 'deadline', 9),
+                    lambda t:setattr(t, 'deadline', 3)),
+                (lambda t:setattr(t, 'category', '作業'),
+                    lambda t:setattr(t, 'category', None)),
+                (lambda t:setattr(t, 'comments', 'コメント'),
+                    lambda t:setattr(t, 'comments', '')),
+                (lambda t:setattr(t, 'name', 'Renamed'),
+                    lambda t:setattr(t, 'name', 'SmallTask1'))):
+            change(self.tp311)
+            self.assertNotEqual(self.tp3.digest(), digest)
+            self.assertEqual(self.tp32.digest(), tree.find('Proj3/LargeTask2')
+                    .digest())
+            undo(self.tp311)
+            self.assertEqual(self.tp3.digest(), digest)
+
+        # 子の追加も反映される
+        self.tp324.append(self.tn2t2)
+        self.assertNotEqual(self.tp3.digest(), digest)
+        return
+
     def test_timestamp(self):
         # タイムテーブルで決定する事を確認する
         self.assertEqual(self.t0.timestamp(), 0)
@@ -492,6 +669,37 @@ class TestTasktory(unittest.TestCase):
         self.check(self.td1, '', 2, self.t0, OPEN, None, '')
         return
 
+    def test_remove(self):
+        self.assertTupleEqual(self.tp3.rollup(), (7, 15, 15))
+        self.assertIs(self.tp3.by_id(self.tp312.ID), self.tp312)
+        self.assertIs(self.tp31.get('SmallTask2'), self.tp312)
+
+        self.tp31.remove(self.tp312)
+        self.check_child(self.tp31, self.tp311)
+        self.check(self.tp312, 'SmallTask2', 4, None, CLOSE, None, '')
+        self.assertEqual(self.tp312.path(), '/SmallTask2')
+
+        # 索引と集計値も更新される事を確認する
+        self.assertIsNone(self.tp31.get('SmallTask2'))
+        self.assertIsNone(self.tp3.by_id(self.tp312.ID))
+        self.assertTupleEqual(self.tp3.rollup(), (6, 6, 7))
+        self.assertRaises(ValueError, self.tp31.remove, self.tp312)
+
+        # 同名の兄弟がある場合も、指定したタスクトリを取り除く
+        a1 = Tasktory('a', 1)
+        a2 = Tasktory('a', 2)
+        self.t0.append(a1)
+        self.t0.append(a2)
+        self.t0.remove(a2)
+        self.assertEqual(len(self.t0.children), 1)
+        self.assertIs(self.t0.children[0], a1)
+        self.assertIs(a1.parent, self.t0)
+        self.assertIsNone(a2.parent)
+        self.assertIs(self.t0.get('a'), a1)
+        self.t0.remove(a1)
+        self.assertListEqual(self.t0.children, [])
+        return
+
     def test_wash(self):
         self.check(self.t0, '', 1, None, OPEN, None, '')
         self.t0.wash(self.tn1)
@@ -533,6 +741,52 @@ class TestTasktory(unittest.TestCase):
         self.assertIs(self.tp3.find('Proj3/LargeTask2'), self.tp32)
         self.assertIs(self.tp3.find('Proj3/LargeTask2/SmallTask3'), self.tp323)
         self.assertIs(self.tp3.find('Proj3/LargeTask2/SmallTask4'), self.tp324)
+        self.assertIsNone(self.tp3.find('Proj3/LargeTask3/SmallTask4'))
+
+        # 名前変更後のパスで検索できる事を確認する
+        self.tp32.name = 'LargeTask3'
+        self.assertIsNone(self.tp3.find('Proj3/LargeTask2/SmallTask4'))
+        self.assertIs(self.tp3.find('Proj3/LargeTask3/SmallTask4'), self.tp324)
+        return
+
+    def test_by_id(self):
+        self.assertIs(self.t0.by_id(self.t0.ID), self.t0)
+        self.assertIsNone(self.t0.by_id(self.tn1.ID))
+        self.assertEqual(self.t0.by_id(self.tn1.ID, 0), 0)
+        for node in self.tp3:
+            self.assertIs(self.tp3.by_id(node.ID), node)
+        self.assertIsNone(self.tp31.by_id(self.tp324.ID))
+
+        # 追加したタスクトリを検索できる事を確認する
+        self.tp324.append(self.tp1)
+        self.assertIs(self.tp3.by_id(self.tp111.ID), self.tp111)
+        self.assertIs(self.tp32.by_id(self.tp111.ID), self.tp111)
+
+        # マージ、コピーしたツリーではそのツリーのノードを返す事を確認する
+        for tree in (self.tp3 + Tasktory('Proj3', 1), self.tp3.deepcopy()):
+            node = tree.by_id(self.tp111.ID)
+            self.assertIsNot(node, self.tp111)
+            self.assertIs(node, tree.find('Proj3/LargeTask2/SmallTask4/'
+                'Proj1/LargeTask1/SmallTask1'))
+
+        # 上書きでIDが変わった場合
+        self.tp311.wash(self.tn1)
+        self.assertIs(self.tp3.by_id(self.tn1.ID), self.tp311)
+
+        # IDを直接書き換えた場合（新しいIDはすぐに引ける）
+        ID = self.tp312.ID
+        self.tp312.ID = 1
+        self.assertIs(self.tp3.by_id(1), self.tp312)
+        self.assertIs(self.tp31.by_id(1), self.tp312)
+        self.assertIsNone(self.tp3.by_id(ID))
+        self.assertIs(self.tp3.by_id(1), self.tp312)
+
+        # 同じIDのタスクトリがあれば、古いIDでそちらを引ける
+        self.tp311.ID = 2
+        self.tp312.ID = 2
+        self.tp312.ID = 3
+        self.assertIs(self.tp3.by_id(3), self.tp312)
+        self.assertIs(self.tp3.by_id(2), self.tp311)
         return
 
     def test_search(self):
@@ -577,6 +831,31 @@ class TestTasktory(unittest.TestCase):
         self.assertEqual(self.tp111.path(), '/Proj1/LargeTask1/SmallTask1')
         self.assertEqual(self.tp111.path('/hoge'),
                 '/hoge/Proj1/LargeTask1/SmallTask1')
+
+        # 名前変更、付け替え、上書き後に正しいパスを返す事を確認する
+        self.tp1.name = 'Proj9'
+        self.assertEqual(self.tp111.path(), '/Proj9/LargeTask1/SmallTask1')
+        self.tp2.append(self.tp11)
+        self.assertEqual(self.tp111.path(), '/Proj2/LargeTask1/SmallTask1')
+        self.assertEqual(self.tp111.path('/hoge'),
+                '/hoge/Proj2/LargeTask1/SmallTask1')
+        self.tp11.wash(self.tp311)
+        self.assertEqual(self.tp11.path(), '/Proj3/LargeTask1/SmallTask1')
+        return
+
+    def test_paths(self):
+        # 前順に全ノードとパスの組を返す事を確認する
+        self.assertListEqual(list(self.t0.paths()), [(self.t0, '/')])
+        self.assertListEqual([(n.name, p) for n,p in self.tp3.paths('/r')],
+                [('Proj3', '/r/Proj3'),
+                    ('LargeTask1', '/r/Proj3/LargeTask1'),
+                    ('SmallTask1', '/r/Proj3/LargeTask1/SmallTask1'),
+                    ('SmallTask2', '/r/Proj3/LargeTask1/SmallTask2'),
+                    ('LargeTask2', '/r/Proj3/LargeTask2'),
+                    ('SmallTask3', '/r/Proj3/LargeTask2/SmallTask3'),
+                    ('SmallTask4', '/r/Proj3/LargeTask2/SmallTask4')])
+        self.assertListEqual([p for _,p in self.tp3.paths('/r')],
+                [n.path('/r') for n in self.tp3])
         return
 
     def test_level(self):
@@ -590,6 +869,13 @@ class TestTasktory(unittest.TestCase):
         self.assertEqual(self.tp1.level(), 0)
         self.assertEqual(self.tp11.level(), 1)
         self.assertEqual(self.tp111.level(), 2)
+
+        # 付け替え後に正しい階層を返す事を確認する
+        self.tp111.append(self.tp2)
+        self.assertEqual(self.tp22.level(), 4)
+        self.t0.append(self.tp11)
+        self.assertEqual(self.tp22.level(), 4)
+        self.assertEqual(self.tp111.level(), 2)
         return
 
     def test_deepcopy(self):
@@ -625,6 +911,104 @@ class TestTasktory(unittest.TestCase):
         self.check_time(self.tp22.deepcopy())
         return
 
+    def test_deepcopy_share(self):
+        # タイムテーブルは共有され、変更した側だけがコピーを持つ事を確認する
+        t = self.tp1.deepcopy()
+        t11 = t.children[0]
+        self.assertIs(t11.timetable.arrays()[0],
+                self.tp11.timetable.arrays()[0])
+        t11.add_time(5, 1)
+        self.check_time(t11, (0,1), (5,1))
+        self.check_time(self.tp11, (0,1))
+        self.assertEqual(t.subtree_time(), 4)
+        self.assertEqual(self.tp1.subtree_time(), 3)
+
+        # 元のツリーを変更してもコピーは変わらない事を確認する
+        t111 = t11.children[0]
+        self.tp111.erase_time(0, 10)
+        self.check_time(self.tp111)
+        self.check_time(t111, (1,2))
+
+        # 共有中のタイムテーブルを直接変更しても、相手は変わらない
+        t = self.tp11.deepcopy()
+        t.timetable += [(1,2)]
+        self.check_time(t, (0,1), (1,2))
+        self.check_time(self.tp11, (0,1))
+
+        # コピーした後も、元のタイムテーブルを直接変更できる
+        t = self.tp11.copy()
+        self.tp11.timetable.append((3,4))
+        self.check_time(self.tp11, (0,1), (3,4))
+        self.check_time(t, (0,1))
+        return
+
+    def test_deepcopy_lazy(self):
+        # 子は参照するまでコピーしない事を確認する
+        # （集計値とハッシュはキャッシュを引き継ぐ）
+        self.tp3.digest()
+        self.tp3.rollup()
+        t = self.tp3.deepcopy()
+        self.assertListEqual(t._children, [])
+        self.assertEqual(t.digest(), self.tp3.digest())
+        self.assertEqual(len(t), 7)
+        self.assertListEqual(t._children, [])
+
+        # 元を変更しても、コピーした時点の内容のままである事を確認する
+        self.tp312.deadline = 10
+        self.tp312.add_time(20, 1)
+        self.tp32.name = 'Renamed'
+        self.tp31.remove(self.tp311)
+        self.tp3.append(Tasktory('New', 1))
+        self.assertListEqual([(n.name, p) for n,p in t.paths('/r')],
+                [('Proj3', '/r/Proj3'),
+                    ('LargeTask1', '/r/Proj3/LargeTask1'),
+                    ('SmallTask1', '/r/Proj3/LargeTask1/SmallTask1'),
+                    ('SmallTask2', '/r/Proj3/LargeTask1/SmallTask2'),
+                    ('LargeTask2', '/r/Proj3/LargeTask2'),
+                    ('SmallTask3', '/r/Proj3/LargeTask2/SmallTask3'),
+                    ('SmallTask4', '/r/Proj3/LargeTask2/SmallTask4')])
+        t312 = t.find('Proj3/LargeTask1/SmallTask2')
+        self.check(t312, 'SmallTask2', 4, t.children[0], CLOSE, None, '')
+        self.check_time(t312, (0,1), (7,8))
+        self.assertEqual(t312.ID, self.tp312.ID)
+
+        # コピーを変更しても元は変わらない事を確認する
+        t = self.tp3.deepcopy()
+        t.children[0].children[0].status = OPEN
+        self.assertEqual(self.tp312.status, CLOSE)
+
+        # コピーのコピーも、元の変更の影響を受けない事を確認する
+        t = self.tp3.deepcopy().deepcopy()
+        self.tp324.comments = 'changed'
+        self.assertEqual(t.find('Proj3/Renamed/SmallTask4').comments, '')
+        return
+
+    #==========================================================================
+    # pickle
+    #==========================================================================
+    def test_pickle(self):
+        # プロファイルと同様にコピーをpickleして復元できる事を確認する
+        t = pickle.loads(pickle.dumps(self.tp11.copy()))
+        self.check(t, 'LargeTask1', 2, None, WAIT, None, '')
+        self.check_time(t, (0,1))
+        self.assertEqual(t.ID, self.tp11.ID)
+        self.assertIs(t.status, WAIT)
+
+        # 旧形式（__dict__）の状態からも復元できる事を確認する
+        t = Tasktory.__new__(Tasktory)
+        t.__setstate__({'ID': '12345678-1234-5678-1234-567812345678',
+            'name': 'old', 'deadline': 3, 'status': ''.join(['cl', 'ose']),
+            'timetable': [(0,1), (1,2)], 'parent': None, 'children': [],
+            'category': None, 'comments': 'c'})
+        self.check(t, 'old', 3, None, CLOSE, None, 'c')
+        self.check_time(t, (0,1), (1,2))
+        self.assertEqual(t.ID, 0x12345678123456781234567812345678)
+        self.assertIs(t.status, CLOSE)
+
+        # __dict__を持たない事を確認する
+        self.assertFalse(hasattr(self.t0, '__dict__'))
+        return
+
     def test_clip(self):
         # 子無し
         self.check(self.t0.clip(), '', 1, None, OPEN, None, '')
@@ -650,6 +1034,27 @@ class TestTasktory(unittest.TestCase):
                     self.tp323, self.tp324])
         return
 
+    def test_fill_defaults(self):
+        # 期日は部分木で設定されている期日の最大値を補完する
+        t0 = Tasktory('', None, None)
+        t1 = Tasktory('a', None, None)
+        t11 = Tasktory('b', 5)
+        t12 = Tasktory('c', 3)
+        t2 = Tasktory('d', None)
+        t0.append(t1)
+        t1.append(t11)
+        t1.append(t12)
+        t0.append(t2)
+        self.assertIs(t0.fill_defaults(), t0)
+        self.assertListEqual([t.deadline for t in t0], [5, 5, 5, 3, None])
+
+        # ステータスとコメント
+        self.assertEqual(t0.status, OPEN)
+        self.assertEqual(t1.status, OPEN)
+        self.assertEqual(t1.comments, '')
+        self.assertEqual(t2.comments, '')
+        return
+
 if __name__ == '__main__':
     print(datetime.datetime.now())
     unittest.main()
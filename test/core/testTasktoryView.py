@@ -0,0 +1,76 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, datetime, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.TasktoryView import TasktoryView
+
+OPEN = Tasktory.OPEN
+WAIT = Tasktory.WAIT
+CLOSE = Tasktory.CLOSE
+CONST = Tasktory.CONST
+
+class TestTasktoryView(unittest.TestCase):
+
+    def setUp(self):
+        self.tp3 = Tasktory('Proj3', 1)
+        self.tp31 = Tasktory('LargeTask1', 2); self.tp31.status = OPEN
+        self.tp311 = Tasktory('SmallTask1', 3); self.tp311.status = OPEN
+        self.tp312 = Tasktory('SmallTask2', 4); self.tp312.status = CLOSE
+        self.tp32 = Tasktory('LargeTask2', 5); self.tp32.status = CLOSE
+        self.tp323 = Tasktory('SmallTask3', 6); self.tp323.status = WAIT
+        self.tp324 = Tasktory('SmallTask4', 7); self.tp324.status = CLOSE
+        self.tp3.append(self.tp31)
+        self.tp31.append(self.tp311)
+        self.tp31.append(self.tp312)
+        self.tp3.append(self.tp32)
+        self.tp32.append(self.tp323)
+        self.tp32.append(self.tp324)
+        return
+
+    def test_iter(self):
+        # 条件が無ければ全ノードが見える事を確認する
+        view = TasktoryView(self.tp3)
+        self.assertListEqual([v.tasktory for v in view], list(self.tp3))
+        self.assertEqual(len(view), 7)
+
+        # clipと同じノードが見える事を確認する
+        for test in (lambda t:t.status != CLOSE, lambda t:t.deadline > 5,
+                lambda t:t.deadline == 1, lambda t:False):
+            clip = self.tp3.clip(test)
+            view = TasktoryView(self.tp3, test)
+            self.assertEqual(bool(view), clip is not None)
+            self.assertListEqual([v.ID for v in view],
+                    [] if clip is None else [n.ID for n in clip])
+            self.assertListEqual([v.level() for v in view],
+                    [] if clip is None else [n.level() for n in clip])
+        return
+
+    def test_children(self):
+        view = TasktoryView(self.tp31, lambda t:t.status != CLOSE)
+        self.assertListEqual([c.tasktory for c in view.children],
+                [self.tp311])
+        self.assertEqual(view.children[0].level(), 1)
+        self.assertEqual(self.tp311.level(), 2)
+        return
+
+    def test_getattr(self):
+        # 属性は元のタスクトリを参照し、計算属性も使える事を確認する
+        view = TasktoryView(self.tp3, rest=lambda t:t.deadline - 1)
+        nodes = list(view)
+        self.assertEqual(nodes[1].name, 'LargeTask1')
+        self.assertEqual(nodes[1].rest, 1)
+        self.assertEqual(nodes[1].path(), '/Proj3/LargeTask1')
+        self.tp31.deadline = 10
+        self.assertEqual(nodes[1].rest, 9)
+        self.assertRaises(AttributeError, getattr, nodes[1], 'unknown')
+        return
+
+if __name__ == '__main__':
+    print(datetime.datetime.now())
+    unittest.main()
@@ -0,0 +1,111 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.TimeIndex import TimeIndex
+
+class TestTimeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2)
+        self.t11 = Tasktory('01.い', 3)
+        self.t2 = Tasktory('02.う', 4)
+        self.t0.append(self.t1)
+        self.t1.append(self.t11)
+        self.t0.append(self.t2)
+        self.t1.add_time(0, 100)
+        self.t11.add_time(150, 10)
+        self.t2.add_time(120, 50)
+        self.t2.add_time(300, 10)
+        return
+
+    def test_init(self):
+        # 作業時間を持つタスクトリだけを索引する
+        index = TimeIndex(self.t0)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(len(TimeIndex(Tasktory('', 1))), 0)
+        return
+
+    def test_entries(self):
+        index = TimeIndex(self.t0)
+
+        # 期間と重なるもの（前から続くものを含む）
+        self.assertListEqual(index.entries(50, 130),
+                [(self.t1, 0, 100), (self.t2, 120, 50)])
+
+        # 期間内に開始したもの
+        self.assertListEqual(index.entries(50, 130, True),
+                [(self.t2, 120, 50)])
+        return
+
+    def test_nodes(self):
+        index = TimeIndex(self.t0)
+        self.assertListEqual(index.nodes(0, 400), [self.t1, self.t11, self.t2])
+        self.assertListEqual(index.nodes(155, 200), [self.t11, self.t2])
+        self.assertListEqual(index.nodes(200, 300), [])
+        self.assertSetEqual(set(index.ids(155, 200)),
+                set([id(self.t11), id(self.t2)]))
+        return
+
+    def test_seconds(self):
+        index = TimeIndex(self.t0)
+
+        # 期間外の部分は含めない
+        self.assertListEqual(index.seconds(50, 160),
+                [(self.t1, 50), (self.t11, 10), (self.t2, 40)])
+        self.assertListEqual(index.seconds(100, 120), [])
+        return
+
+    def test_time_index(self):
+        index = self.t0.time_index()
+        self.assertIs(self.t0.time_index(), index)
+        self.assertListEqual(index.nodes(200, 300), [])
+
+        # add_time、remove_timeに合わせて更新される
+        self.t11.add_time(250, 10)
+        self.assertIs(self.t0.time_index(), index)
+        self.assertListEqual(index.nodes(200, 300), [self.t11])
+        self.t11.remove_time(250, 10)
+        self.assertListEqual(index.nodes(200, 300), [])
+
+        # タイムテーブルを直接変更しても更新される
+        self.t11.timetable.add(250, 10)
+        self.assertListEqual(self.t0.time_index().nodes(200, 300), [self.t11])
+        self.t11.timetable.remove(250, 10)
+        self.assertListEqual(self.t0.time_index().nodes(200, 300), [])
+
+        # 追加したタスクトリの作業時間も反映される
+        t3 = Tasktory('03.え', 5)
+        self.t0.append(t3)
+        t3.add_time(200, 5)
+        self.assertListEqual(self.t0.time_index().nodes(200, 300), [t3])
+
+        # 作業期間より前に追加したものも反映される
+        self.t2.add_time(-100, 10)
+        self.assertListEqual(self.t0.time_index().nodes(-100, -50), [self.t2])
+        self.assertListEqual(self.t0.time_index().nodes(0, 400),
+                [self.t1, self.t11, self.t2, t3])
+
+        # 削除も反映される
+        index = self.t0.time_index()
+        self.t2.erase_time(-1000, 1000)
+        self.assertIs(self.t0.time_index(), index)
+        self.assertListEqual(self.t0.time_index().nodes(0, 1000),
+                [self.t1, self.t11, t3])
+
+        # タイムテーブルを置き換えると作り直す
+        self.t2.timetable = [(500, 1)]
+        self.assertIsNot(self.t0.time_index(), index)
+        self.assertListEqual(self.t0.time_index().nodes(0, 1000),
+                [self.t1, self.t11, self.t2, t3])
+        return
+
+if __name__ == '__main__':
+    unittest.main()
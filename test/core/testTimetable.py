@@ -0,0 +1,219 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, datetime, pickle, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Timetable import Timetable
+
+class TestTimetable(unittest.TestCase):
+
+    def setUp(self):
+        self.tb0 = Timetable()
+        self.tb1 = Timetable([(10, 5), (0, 1), (10, 5), (3, 20), (10, 2)])
+        return
+
+    #==========================================================================
+    # コンストラクタ
+    #==========================================================================
+    def test_init(self):
+        # 開始エポック秒、作業時間の順にソートされ、重複が除かれる事を確認する
+        self.assertListEqual(list(self.tb0), [])
+        self.assertListEqual(list(self.tb1), [(0,1), (3,20), (10,2), (10,5)])
+        self.assertEqual(len(self.tb1), 4)
+        self.assertEqual(self.tb1, [(0,1), (3,20), (10,2), (10,5)])
+        self.assertFalse(self.tb0)
+        self.assertTrue(self.tb1)
+        return
+
+    #==========================================================================
+    # 参照メソッド
+    #==========================================================================
+    def test_arrays(self):
+        # 開始エポック秒と作業時間の配列を返す事を確認する
+        starts, secs = self.tb1.arrays()
+        self.assertListEqual(list(starts), [0, 3, 10, 10])
+        self.assertListEqual(list(secs), [1, 20, 2, 5])
+        return
+
+    def test_first(self):
+        # 最も小さい開始エポック秒を返す事を確認する
+        self.assertEqual(self.tb0.first(), 0)
+        self.assertEqual(self.tb1.first(), 0)
+        self.tb1.add(-5, 1)
+        self.assertEqual(self.tb1.first(), -5)
+        return
+
+    def test_last(self):
+        # 最も大きい終了エポック秒を返す事を確認する
+        self.assertEqual(self.tb0.last(), 0)
+        self.assertEqual(self.tb1.last(), 23)
+        self.tb1.add(20, 1)
+        self.assertEqual(self.tb1.last(), 23)
+        self.tb1.add(20, 4)
+        self.assertEqual(self.tb1.last(), 24)
+        return
+
+    def test_total(self):
+        self.assertEqual(self.tb0.total(), 0)
+        self.assertEqual(self.tb1.total(), 28)
+        return
+
+    def test_stats(self):
+        self.assertEqual(self.tb0.stats(), (0, 0, 0))
+        self.assertEqual(self.tb1.stats(), (23, 20, 28))
+        return
+
+    def test_from_arrays(self):
+        tb = Timetable.from_arrays(self.tb1._starts, self.tb1._secs)
+        self.assertEqual(tb, self.tb1)
+        self.assertEqual(tb.stats(), self.tb1.stats())
+        tb = Timetable.from_arrays(self.tb1._starts, self.tb1._secs,
+                (23, 20, 28))
+        self.assertEqual(tb.last(), 23)
+
+        # checkを指定すると、整列していない配列は整列し直す
+        tb = Timetable.from_arrays(self.tb1._starts, self.tb1._secs, check=True)
+        self.assertIs(tb._starts, self.tb1._starts)
+        tb = Timetable.from_arrays(self.tb1._starts[::-1],
+                self.tb1._secs[::-1], check=True)
+        self.assertEqual(tb, self.tb1)
+        self.assertEqual(tb.stats(), self.tb1.stats())
+        return
+
+    def test_between(self):
+        self.assertListEqual(self.tb0.between(0, 100), [])
+        self.assertListEqual(self.tb1.between(0, 10), [(0,1), (3,20)])
+        self.assertListEqual(self.tb1.between(3, 11), [(3,20), (10,2), (10,5)])
+        self.assertListEqual(self.tb1.between(4, 10), [])
+        self.assertListEqual(self.tb1.between(10), [(10,2), (10,5)])
+        return
+
+    def test_overlapping(self):
+        self.assertListEqual(self.tb0.overlapping(0, 100), [])
+        self.assertListEqual(self.tb1.overlapping(15, 16), [(3,20), (10,5)])
+        self.assertListEqual(self.tb1.overlapping(24, 30), [])
+        self.assertListEqual(self.tb1.overlapping(1, 3), [(0,1)])
+        return
+
+    def test_contains(self):
+        self.assertNotIn((0,1), self.tb0)
+        self.assertIn((10,2), self.tb1)
+        self.assertIn((10,5), self.tb1)
+        self.assertNotIn((10,3), self.tb1)
+        return
+
+    #==========================================================================
+    # 変更メソッド
+    #==========================================================================
+    def test_add(self):
+        self.assertTrue(self.tb0.add(5, 1))
+        self.assertTrue(self.tb0.add(1, 1))
+        self.assertFalse(self.tb0.add(5, 1))
+        self.assertListEqual(list(self.tb0), [(1,1), (5,1)])
+        self.tb0 += [(3,1), (1,1)]
+        self.assertListEqual(list(self.tb0), [(1,1), (3,1), (5,1)])
+        return
+
+    def test_remove_between(self):
+        self.assertEqual(self.tb1.remove_between(3, 10), 1)
+        self.assertListEqual(list(self.tb1), [(0,1), (10,2), (10,5)])
+        self.assertEqual(self.tb1.last(), 15)
+        self.assertEqual(self.tb1.total(), 8)
+        self.assertEqual(self.tb1.remove_between(10), 2)
+        self.assertListEqual(list(self.tb1), [(0,1)])
+        return
+
+    def test_remove(self):
+        self.assertTrue(self.tb1.remove(10, 5))
+        self.assertFalse(self.tb1.remove(10, 5))
+        self.assertFalse(self.tb1.remove(10, 3))
+        self.assertListEqual(list(self.tb1), [(0,1), (3,20), (10,2)])
+        self.assertEqual(self.tb1.last(), 23)
+        self.assertEqual(self.tb1.total(), 23)
+        return
+
+    def test_merge(self):
+        self.assertEqual(Timetable.merge(self.tb0, self.tb0), [])
+        self.assertEqual(Timetable.merge(self.tb0, self.tb1), self.tb1)
+        self.assertEqual(Timetable.merge(self.tb1, self.tb0), self.tb1)
+
+        # 重複を除いて整列したまま併合される事を確認する
+        tb = Timetable.merge(self.tb1, Timetable([(3,20), (5,1), (30,1)]))
+        self.assertListEqual(list(tb),
+                [(0,1), (3,20), (5,1), (10,2), (10,5), (30,1)])
+        self.assertEqual(tb.last(), 31)
+        self.assertEqual(tb.total(), 30)
+
+        # 重なりが無い場合
+        tb = Timetable.merge(self.tb1, Timetable([(30,1)]))
+        self.assertListEqual(list(tb), [(0,1), (3,20), (10,2), (10,5), (30,1)])
+        self.assertListEqual(list(self.tb1), [(0,1), (3,20), (10,2), (10,5)])
+        return
+
+    def test_copy(self):
+        tb = self.tb1.copy()
+        self.assertEqual(tb, self.tb1)
+        tb.add(100, 1)
+        self.assertNotEqual(tb, self.tb1)
+        return
+
+    def test_share(self):
+        # 共有したタイムテーブルはどちらも変更でき、変更した側だけが配列を
+        # コピーする事を確認する
+        tb = self.tb1.share()
+        self.assertIsNot(tb, self.tb1)
+        self.assertIs(tb._starts, self.tb1._starts)
+        self.assertTrue(tb.shared())
+        self.assertTrue(self.tb1.shared())
+        tb.add(100, 1)
+        self.assertFalse(tb.shared())
+        self.assertEqual(len(tb), 5)
+        self.assertEqual(len(self.tb1), 4)
+        self.tb1.remove_between(0, 10)
+        self.assertEqual(len(self.tb1), 2)
+        self.assertEqual(len(tb), 5)
+
+        # 何も変わらなければ配列をコピーしない
+        tb = self.tb1.share()
+        self.assertFalse(tb.add(10, 2))
+        self.assertFalse(tb.remove(0, 1))
+        self.assertEqual(tb.remove_between(0, 10), 0)
+        self.assertIs(tb._starts, self.tb1._starts)
+
+        # +=は自身に追加する
+        ret = tb
+        tb += [(100, 1)]
+        self.assertIs(tb, ret)
+        self.assertEqual(len(tb), 3)
+        self.assertEqual(len(self.tb1), 2)
+        self.assertFalse(self.tb1.copy().shared())
+        self.assertFalse(pickle.loads(pickle.dumps(self.tb1)).shared())
+        return
+
+    def test_pickle(self):
+        tb = pickle.loads(pickle.dumps(self.tb1))
+        self.assertEqual(tb, self.tb1)
+        self.assertEqual(tb.last(), 23)
+
+        # 集計値も保存した値がそのまま復元される
+        tb = Timetable((1400000000 + 3600 * i, 1800 + i) for i in range(100))
+        ret = pickle.loads(pickle.dumps(tb))
+        self.assertEqual(ret, tb)
+        self.assertEqual(ret.stats(), tb.stats())
+
+        # 整数のリストや配列のまま保存していたものも読み込める
+        for state in [(self.tb1._starts.tolist(), self.tb1._secs.tolist()),
+                      (self.tb1._starts, self.tb1._secs)]:
+            tb = Timetable.__new__(Timetable)
+            tb.__setstate__(state)
+            self.assertEqual(tb, self.tb1)
+            self.assertEqual(tb.last(), 23)
+        return
+
+if __name__ == '__main__':
+    print(datetime.datetime.now())
+    unittest.main()
@@ -0,0 +1,125 @@
+#!python3
+#-*- encoding:utf-8 -*-
+
+import sys, os, shutil, datetime, unittest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_DIR = os.path.abspath(os.path.join(THIS_DIR, '..', '..'))
+sys.path.append(HOME_DIR)
+
+from lib.core.Tasktory import Tasktory
+from lib.core.Manager import Manager
+from lib.core.TreeLoader import TreeLoader
+
+class TestTreeLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.root = '/Users/taku/tmp/test/work'
+        self.profile = '.tasktory'
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+
+        # 保存直後のプロファイルもキャッシュを信用する
+        self.racy = Manager.MANIFEST_RACY
+        Manager.MANIFEST_RACY = -1
+
+        self.t0 = Tasktory('', 1)
+        self.t1 = Tasktory('00.あ', 2)
+        self.t2 = Tasktory('01.か', 3)
+        self.t21 = Tasktory('02.き', 4)
+        self.t0.append(self.t1)
+        self.t0.append(self.t2)
+        self.t2.append(self.t21)
+        for node in self.t0:
+            Manager.put(self.root, node, self.profile)
+        os.makedirs(os.path.join(self.root, 'notask'))
+        return
+
+    def tearDown(self):
+        Manager.MANIFEST_RACY = self.racy
+
+        # ROOT以下のディレクトリ、ファイルを一掃する
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        return
+
+    def names(self, tree):
+        return sorted(n.path() for n in tree)
+
+    #==========================================================================
+    # load
+    #==========================================================================
+    def test_load(self):
+        # get_tree、listtaskと同じ結果になる事を確認する
+        loader = TreeLoader(self.root, self.profile)
+        tree = loader.load()
+        self.assertListEqual(self.names(tree),
+                self.names(Manager.get_tree(self.root, self.profile)))
+        self.assertSetEqual(loader.paths,
+                Manager.listtask(self.root, self.profile))
+        self.assertEqual(tree.find('/01.か/02.き').deadline, 4)
+
+        # 返したツリーを変更してもキャッシュは変わらない
+        tree.find('/01.か').deadline = 30
+        tree.find('/01.か').add_time(0, 1)
+        tree = loader.load()
+        self.assertEqual(tree.find('/01.か').deadline, 3)
+        self.assertEqual(tree.find('/01.か').total_time(), 0)
+
+        # 変更したプロファイル、追加、削除したタスクトリを反映する
+        self.t21.deadline = 40
+        Manager.put(self.root, self.t21, self.profile)
+        t3 = Tasktory('notask', 5)
+        self.t0.append(t3)
+        Manager.put(self.root, t3, self.profile)
+        shutil.rmtree(os.path.join(self.root, '00.あ'))
+        tree = loader.load()
+        self.assertEqual(tree.find('/01.か/02.き').deadline, 40)
+        self.assertListEqual(self.names(tree),
+                ['/', '/01.か', '/01.か/02.き', '/notask'])
+        self.assertSetEqual(loader.paths,
+                Manager.listtask(self.root, self.profile))
+
+        # ルートがタスクトリでなければNoneを返す
+        self.assertIsNone(TreeLoader('/Users/taku', self.profile).load())
+        return
+
+    def test_load_workers(self):
+        # 並列に読み込んでも同じツリー（子の順序を含む）になる事を確認する
+        for i in range(20):
+            Manager.put(self.root, Tasktory('{:02}'.format(i), i), self.profile)
+        expected = [(n.path(), n.deadline)
+                for n in Manager.get_tree(self.root, self.profile)]
+        for workers in (1, 4, 16):
+            tree = TreeLoader(self.root, self.profile, workers=workers).load()
+            self.assertListEqual([(n.path(), n.deadline) for n in tree],
+                    expected)
+            tree = Manager.get_tree(self.root, self.profile, workers=workers)
+            self.assertListEqual([(n.path(), n.deadline) for n in tree],
+                    expected)
+
+        # 読み込めないプロファイルの部分木は含めない
+        with open(os.path.join(self.root, '01.か', self.profile), 'wb') as f:
+            f.write(b'broken')
+        tree = TreeLoader(self.root, self.profile, workers=4).load()
+        self.assertIsNone(tree.find('/01.か'))
+        self.assertEqual(len(tree), 22)
+        return
+
+    def test_load_manifest(self):
+        # マニフェストから次回の初回読み込みを行う
+        TreeLoader(self.root, self.profile, '.manifest').load()
+        self.assertTrue(os.path.isfile(os.path.join(self.root, '.manifest')))
+        self.t21.deadline = 40
+        Manager.put(self.root, self.t21, self.profile)
+        tree = TreeLoader(self.root, self.profile, '.manifest').load()
+        self.assertEqual(tree.find('/01.か/02.き').deadline, 40)
+        self.assertListEqual(self.names(tree),
+                self.names(Manager.get_tree(self.root, self.profile)))
+        return
+
+if __name__ == '__main__':
+    print(datetime.datetime.now())
+    unittest.main()
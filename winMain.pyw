@@ -1,14 +1,20 @@
 #!C:/python/python3.4/pythonw
 # -*- encoding:utf-8 -*-
 
-import os, datetime, configparser
+import os, datetime, functools, configparser
 from multiprocessing import Process, Pipe
 
 import win32api
 from jinja2 import Environment, FileSystemLoader
 
 from lib.core.Tasktory import Tasktory
+from lib.core.TasktoryView import TasktoryView
 from lib.core.Manager import Manager
+from lib.core.FileStorage import FileStorage
+from lib.core.SQLiteStorage import SQLiteStorage
+from lib.core.LoggedStorage import LoggedStorage
+from lib.core.Diff import Diff
+from lib.core.Overlap import Overlap
 from lib.ui.Journal import Journal
 from lib.ui.Report import Report
 from lib.ui.TrayIcon import TrayIcon
@@ -52,19 +58,62 @@ class WinMain:
         self.root = config['MAIN']['ROOT']
         self.profile_name = config['MAIN']['PROFILE_NAME']
         self.memo_name = config['MAIN']['MEMO_NAME']
+        self.manifest_name = config['MAIN'].get('MANIFEST_NAME', None)
+        self.load_workers = config['MAIN'].getint('LOAD_WORKERS', 1)
+        self.binary =\
+                config['MAIN'].get('PROFILE_FORMAT', 'pickle') == 'binary'
+        self.fsync = config['MAIN'].getboolean('PROFILE_FSYNC', False)
+        self.allow_pickle = config['MAIN'].getboolean('ALLOW_PICKLE', True)
+        self.storage_type = config['MAIN'].get('STORAGE', 'file')
+        self.database = config['MAIN'].get('DATABASE', None)
+        self.mirror = config['MAIN'].getboolean('MIRROR', True)
+        self.change_log = config['MAIN'].get('CHANGE_LOG', None)
+        self.error_log = config['MAIN'].get('ERROR_LOG', ERROR_LOG_FILE)
         self.journal_file = config['JOURNAL']['JOURNAL_FILE']
         self.infinite = int(config['JOURNAL']['INFINITE'])
         self.report_dir = config['REPORT']['REPORT_DIR']
         self.report_name_tmpl = RWTemplate(config['REPORT']['REPORT_NAME'])
         return
 
+    def open_storage(self):
+        # ディレクトリ（従来の形式）
+        files = FileStorage(self.root, self.profile_name, self.memo_name,
+                self.manifest_name, self.load_workers, self.binary,
+                self.fsync, self.allow_pickle)
+
+        # SQLite（ディレクトリは必要ならミラーとして残す）
+        storage = files
+        if self.storage_type == 'sqlite':
+            storage = SQLiteStorage(self.database,
+                    files if self.mirror else None)
+
+            # データベースが空なら、既存のディレクトリのツリーを取り込む
+            # （ルートタスクトリを作成してミラーに書き込む前に行い、
+            #   既存のプロファイルを上書きしない）
+            storage.import_from(files)
+
+        # 作業時間、ステータス、期日の変更は変更ログに追記する
+        if self.change_log is not None:
+            storage = LoggedStorage(storage, self.change_log)
+
+        return storage
+
     def initialize(self):
+        # タスクトリの保存先を開く
+        self.storage = self.open_storage()
+
         # ルートディレクトリが存在しなければ、作成する
-        if not os.path.isfile(os.path.join(self.root, self.profile_name)):
-            Manager.put(
-                    self.root,
-                    Tasktory('', self.today.toordinal() + 2*self.infinite),
-                    self.profile_name)
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+
+        # ルートタスクトリが存在しなければ、作成する
+        # （プロファイルがあるのに読み込めない場合は、既存のツリーを上書き
+        #   しないように、作成せずに起動を中止する）
+        if self.storage.get('/') is None:
+            if os.path.exists(os.path.join(self.root, self.profile_name)):
+                raise FSRootProfileUnreadableError()
+            self.storage.put(
+                    Tasktory('', self.today.toordinal() + 2*self.infinite))
 
         # ジャーナルディレクトリが存在しなければ、作成する
         journal_dir = os.path.dirname(self.journal_file)
@@ -87,7 +136,7 @@ class WinMain:
             memo = Journal.title_reg.split(memo)[0]
 
         # ファイルシステムからツリーを読み込む
-        self.tree = Manager.get_tree(self.root, self.profile_name)
+        self.tree = self.storage.get_tree()
 
         # 新しいジャーナルを書き出す
         self.write_journal(self.tree, memo)
@@ -96,7 +145,7 @@ class WinMain:
         self.jtree, self.memo = self.read_journal()
 
         # ファイルシステムの状態を読み込む
-        self.paths = Manager.listtask(self.root, self.profile_name)
+        self.paths = self.storage.listtask()
 
         return
 
@@ -243,11 +292,14 @@ class WinMain:
             raise JournalDuplicateTasktoryError()
 
         # タスクトリリストを統合してツリーにする
-        jtree = sum(tasktories[1:], tasktories[0]) if tasktories else None
+        # （各タスクトリは使い捨てなので部分木をコピーせずにマージする）
+        jtree = functools.reduce(lambda t1, t2:t1.merge(t2, True),
+                tasktories) if tasktories else None
 
-        # ツリーを診断する
-        if jtree is not None and Manager.overlap(jtree):
-            raise JournalOverlapTimetableError()
+        # ツリーを診断する（重複する作業時間の組を例外に含める）
+        if jtree is not None:
+            conflicts = list(Overlap.conflicts(jtree))
+            if conflicts: raise JournalOverlapTimetableError(conflicts)
 
         return jtree, memo
 
@@ -312,7 +364,7 @@ class WinMain:
         self.info(INFO_REPO_START)
 
         # ファイルシステムからタスクツリーを読み込む
-        tree = Manager.get_tree(self.root, self.profile_name)
+        tree = self.storage.get_tree()
 
         for name, func in reports:
             # レポートテキストを作成する
@@ -355,10 +407,14 @@ class WinMain:
 
         # ファイルシステムからツリーを読み出す
         try:
-            tree = Manager.get_tree(self.root, self.profile_name)
+            tree = self.storage.get_tree()
         except:
             raise FSReadTreeFailedError()
 
+        # 読み出した時点の状態を控えておく（変更の無いタスクトリは書き出さない）
+        # （タイムテーブルは共有するので、ツリーの大きさ分のコピーはしない）
+        old_tree = tree.deepcopy()
+
         # 読み出したツリーの内、更新対象タスクの当日の作業時間を抹消する
         start = datetime.datetime.combine(self.today, datetime.time())
         end = start + datetime.timedelta(1)
@@ -366,41 +422,44 @@ class WinMain:
         end = int(end.timestamp())
         for node in [tree.find(n.path()) for n in new_jtree]:
             if node is None: continue
-            node.timetable = [t for t in node.timetable\
-                    if not (start <= t[0] < end)]
+            node.erase_time(start, end)
 
         # マージする
+        # （読み出したツリーは使い捨てなので部分木をコピーせずにマージする）
         try:
-            new_tree = tree + new_jtree
+            new_tree = tree.merge(new_jtree.deepcopy(), True)
         except:
             TasktoryMargeFailedError()
 
         # 作業時間の重複の有無を確認する（非必須）
-        if Manager.overlap(new_tree):
-            raise TasktoryOverlapTimetableError()
-
-        # 未設定項目を補完する
-        for node in new_tree:
-            # 期日
-            if node.deadline is None:
-                node.deadline = max([n.deadline for n in node
-                    if n.deadline is not None])
-
-            # ステータス
-            if node.status is None:
-                node.status = Tasktory.OPEN
-
-            # コメント
-            if node.comments is None:
-                node.comments = ''
+        # （ジャーナルの作業時間と重なる範囲だけを調べる）
+        window = Overlap.window(new_jtree)
+        if window is not None:
+            conflicts = list(Overlap.conflicts(new_tree, *window))
+            if conflicts: raise TasktoryOverlapTimetableError(conflicts)
+
+        # 未設定項目（期日、ステータス、コメント）を補完する
+        # （期日は部分木の期日の最大値を後順の１回の走査で求める）
+        # （保存先から読み込んだタスクトリは補完済みなので、ジャーナルの
+        #   タスクトリのうち未設定項目のあるものの部分木だけを補完する）
+        for node in [new_tree.find(n.path()) for n in new_jtree]:
+            if node is None: continue
+            if None in (node.deadline, node.status, node.comments):
+                node.fill_defaults()
 
         # ファイルシステムへの書き出し開始を通知する
         self.info(INFO_FS_START)
 
-        # ファイルシステムに書き出す
+        # 変更のあったタスクトリだけをファイルシステムに書き出す
+        # （読み出した時点との差分を求め、変更のあった経路だけを調べる）
+        # （変更のあったタスクトリはパスで探し、ツリー全体は走査しない）
+        changed = Diff.paths(Diff.diff(old_tree, new_tree))
+        loaded = dict((p, old_tree.find(Diff.names(old_tree, p)))
+                for p in changed)
+        loaded = dict((p, n) for p, n in loaded.items() if n is not None)
         try:
-            for node in new_tree:
-                Manager.put(self.root, node, self.profile_name)
+            self.storage.put_many((new_tree.find(Diff.names(new_tree, p))
+                for p in sorted(changed)), loaded)
         except:
             raise FSWriteTreeFailedError()
 
@@ -421,26 +480,25 @@ class WinMain:
             if node is None:
                 self.warn(MemoPathNotFoundWarning)
                 continue
-            fullpath = node.path(self.root)
-            if Manager.put_memo(
-                    datetime.datetime.now(), fullpath, text, self.memo_name):
+            if self.storage.put_memo(
+                    datetime.datetime.now(), node.path(), text):
                 self.info(INFO_MEMO_END)
         return
 
     def update_journal(self, force=False):
         # 現在のファイルシステムの状態を読み込む
-        new_paths = Manager.listtask(self.root, self.profile_name)
+        # （ディレクトリの走査は１回で済ませ、パスの集合はその時に集めたもの
+        #   を使う）
+        try:
+            tree = self.storage.get_tree()
+            new_paths = self.storage.listtask()
+        except:
+            raise FSReadTreeFailedError()
 
         # ファイルシステムの状態に変化が無ければ無視する
         if self.paths == new_paths and not force:
             return
 
-        # ファイルシステムからツリーを読み込む
-        try:
-            tree = Manager.get_tree(self.root, self.profile_name)
-        except:
-            raise FSReadTreeFailedError()
-
         # ジャーナルへの書き出し開始を通知する
         self.info(INFO_JNL_START)
 
@@ -466,10 +524,26 @@ class WinMain:
         return
 
     def error(self, exc):
+        # 作業時間の重複は、ポップアップに収まらないので、重複する組と
+        # そのパスをエラーログに書き出す
+        if isinstance(exc, (JournalOverlapTimetableError,
+                TasktoryOverlapTimetableError)) and exc.args:
+            self.log_error(exc.MSG, Overlap.describe(exc.args[0]))
         win32api.SendMessage(self.hwnd,
                 TrayIcon.MSG_POPUP, TrayIcon.WP_POPUP_ERROR, exc.ID)
         return
 
+    def log_error(self, msg, lines):
+        # エラーログに追記する（書き込めなくてもエラーの通知は続ける）
+        now = datetime.datetime.now().strftime('%Y/%m/%d %H:%M:%S')
+        try:
+            with open(self.error_log, 'a', encoding='utf-8') as f:
+                f.write('[{}] {}\n'.format(now, msg))
+                f.writelines('    {}\n'.format(line) for line in lines)
+        except OSError:
+            pass
+        return
+
     def block(self):
         self.conn[1].send((os.getpid(), WinMain.BLOCK))
         return
@@ -483,6 +557,9 @@ class WinMain:
         return
 
     def sync(self):
+        # 保存先が保持しているツリーを破棄して、読み直させる
+        self.storage.refresh()
+
         # ファイルシステムを更新する
         self.update_filesystem(force=True)
 
@@ -496,13 +573,12 @@ class WinMain:
             env = Environment(loader=FileSystemLoader(TMPL_DIR))
             tmpl = env.get_template(SUMMARY_TMPL_FILE_NAME)
 
-            # ツリーを加工する
-            tree = self.tree.deepcopy()
-            for node in tree:
-                setattr(node, 'deadline_str', datetime.date.fromordinal(
-                    node.deadline).strftime('%Y/%m/%d'))
-                setattr(node, 'rest_days',
-                    node.deadline - self.today.toordinal())
+            # 表示用の属性を持つビューを作成する（ツリーはコピーしない）
+            today = self.today.toordinal()
+            tree = TasktoryView(self.tree,
+                    deadline_str=lambda t:datetime.date.fromordinal(
+                        t.deadline).strftime('%Y/%m/%d'),
+                    rest_days=lambda t:t.deadline - today)
 
             # レンダリング
             html = tmpl.render(tree=tree)
@@ -574,6 +650,7 @@ class WinMain:
                 elif ret[0] == self.fs_monitor.pid:
                     self.block()
                     try:
+                        self.storage.refresh()
                         self.update_journal()
                     except TasktoryError as e:
                         self.error(e)
@@ -599,6 +676,9 @@ class WinMain:
             self.jnl_monitor.terminate()
             self.fs_monitor.terminate()
             for conn in self.conn: conn.close()
+
+            # 保存先を閉じる（実行中の変更ログの反映を待つ）
+            self.storage.close()
         return
 
 if __name__ == '__main__':